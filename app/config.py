@@ -1,15 +1,135 @@
 import os
 from functools import lru_cache
+from typing import List
 
 from pydantic import BaseSettings
 
 STAGING = "STAGING"
 DEV = "DEV"
 PROD = "PROD"
+TEST = "TEST"
 _ENVIRON = os.getenv("ENVIRON")
 
 
-class DevSettings(BaseSettings):
+class CommonSettings(BaseSettings):
+    # Database connection pool, per engine and per worker process
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_ECHO: bool = False
+
+    # Password hashing process pool
+    HASHER_WORKERS: int = os.cpu_count() or 1
+    HASHER_MAX_PENDING: int = 64
+
+    # Passwords are hashed with `HASH_SCHEME` (`bcrypt`, or `argon2` with
+    # argon2-cffi installed) at `HASH_ROUNDS`, the passlib default if unset.
+    # With `HASH_CALIBRATE` the rounds are picked at startup for a hash to
+    # take about `HASH_TARGET_SECONDS` on this CPU, as
+    # `python -m app.v1.hashing` does offline: once per host, by `prestart.sh`
+    # or the first worker, the others read `HASH_CALIBRATION_FILE`. Weaker
+    # hashes are upgraded on login
+    HASH_SCHEME: str = "bcrypt"
+    HASH_ROUNDS: int | None = None
+    HASH_CALIBRATE: bool = False
+    HASH_TARGET_SECONDS: float = 0.25
+    HASH_CALIBRATION_FILE: str = "/tmp/worthtrust-hash-calibration.json"
+
+    # Serve the APIs with `asyncpg`, or with the sync driver on the threadpool
+    DB_ASYNC: bool = True
+
+    # Email outbox worker
+    OUTBOX_WORKER_ENABLED: bool = True
+    OUTBOX_BATCH_SIZE: int = 50
+    OUTBOX_POLL_INTERVAL: float = 1.0
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_RETRY_BASE_DELAY: float = 5.0
+    OUTBOX_RETRY_MAX_DELAY: float = 3600.0
+    # Seconds a worker has to send the batch it claimed, before another
+    # worker claims its messages again
+    OUTBOX_LEASE: float = 300.0
+
+    # Pooled SMTP connections
+    MAIL_POOL_SIZE: int = 4
+    MAIL_IDLE_TIMEOUT: float = 60.0
+    MAIL_HEALTH_CHECK_INTERVAL: float = 15.0
+
+    # Authenticated users identity cache
+    USER_CACHE_ENABLED: bool = True
+    USER_CACHE_SIZE: int = 10_000
+    USER_CACHE_TTL: float = 60.0
+
+    # Bulk user import, rows hashed and inserted per batch
+    USER_IMPORT_BATCH_SIZE: int = 500
+
+    # Rows fetched per round trip by the streaming exports
+    EXPORT_BATCH_SIZE: int = 1000
+
+    # Rate limits of `/token` and `/register`, per `RATE_LIMIT_WINDOW` seconds.
+    # The `memory` backend limits each worker process, `database` all of them.
+    # Login attempts are limited per IP, and failed logins per username
+    # whatever the IP.
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_WINDOW: float = 60.0
+    RATE_LIMIT_PER_IP: int = 60
+    RATE_LIMIT_PER_USERNAME: int = 10
+    RATE_LIMIT_REGISTER_PER_IP: int = 10
+
+    # Reverse proxies (addresses or networks) whose `X-Forwarded-For` header
+    # is trusted to tell the client IP, e.g. traefik's docker network
+    TRUSTED_PROXIES: List[str] = []
+
+    # Per route request and SQL metrics, scraped from `/internal/metrics`
+    METRICS_ENABLED: bool = True
+
+    # Bearer token of the `/internal` endpoints (metrics, cache and pools
+    # statistics), which are disabled without one
+    INTERNAL_TOKEN: str = ""
+
+    # Development SQL profiler: logs likely N+1 patterns, executed at least
+    # `QUERY_PROFILER_REPEAT_THRESHOLD` times in a request, and statements
+    # slower than `QUERY_PROFILER_SLOW_THRESHOLD` seconds
+    QUERY_PROFILER_ENABLED: bool = False
+    QUERY_PROFILER_REPEAT_THRESHOLD: int = 5
+    QUERY_PROFILER_SLOW_THRESHOLD: float = 0.1
+
+    # Stateless access tokens: authenticated requests are served from the
+    # token claims, revocations are replayed from `token_revocations` every
+    # `TOKEN_REVOCATION_REFRESH_INTERVAL` seconds
+    STATELESS_TOKENS: bool = False
+    TOKEN_REVOCATION_REFRESH_INTERVAL: float = 5.0
+
+    # Read replicas serving the read-only endpoints, load balanced. A client
+    # reads from the primary for `DB_REPLICA_PIN_SECONDS` after a write
+    DB_REPLICA_URIS: List[str] = []
+    DB_REPLICA_PIN_SECONDS: float = 5.0
+
+    # Transactions failing on a serialization failure or a deadlock are run
+    # again up to `TRANSACTION_MAX_RETRIES` times, after a jittered backoff
+    # growing from `TRANSACTION_RETRY_BASE_DELAY` up to
+    # `TRANSACTION_RETRY_MAX_DELAY` seconds
+    TRANSACTION_MAX_RETRIES: int = 3
+    TRANSACTION_RETRY_BASE_DELAY: float = 0.01
+    TRANSACTION_RETRY_MAX_DELAY: float = 0.5
+
+    # `Idempotency-Key` of `/register`: responses are replayed for
+    # `IDEMPOTENCY_KEY_TTL` seconds, the last `IDEMPOTENCY_CACHE_SIZE` ones
+    # from memory. Duplicates wait up to `IDEMPOTENCY_WAIT` seconds for the
+    # first request, taken over after `IDEMPOTENCY_LEASE` seconds if its
+    # worker died
+    IDEMPOTENCY_KEY_TTL: float = 86_400.0
+    IDEMPOTENCY_CACHE_SIZE: int = 10_000
+    IDEMPOTENCY_WAIT: float = 10.0
+    IDEMPOTENCY_LEASE: float = 30.0
+
+
+class DevSettings(CommonSettings):
+    DB_ECHO: bool = True
+    QUERY_PROFILER_ENABLED: bool = True
+
     DB_USER: str
     DB_NAME: str
     DB_PSW: str
@@ -39,7 +159,7 @@ class DevSettings(BaseSettings):
         return cls.DB_URI
 
 
-class StagingSettings(BaseSettings):
+class StagingSettings(CommonSettings):
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
     POSTGRES_DB: str
@@ -73,8 +193,21 @@ class Prodsettings(BaseSettings):
         env_file = "prodenv.file"
 
 
-class TestSettings(BaseSettings):
-    pass
+class TestSettings(CommonSettings):
+    SECRET_KEY: str = "worthtrust-test-secret"
+    ALGORITHM: str = "HS256"
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+
+    EMAIL_HOST: str = "localhost"
+    EMAIL_PORT: int = 8025
+    EMAIL_USERNAME: str = "worthtrust"
+    EMAIL_PASSWORD: str = "worthtrust"
+    EMAIL_FROM: str = "noreply@worthtrust.io"
+
+    DB_URI: str = "postgresql://postgres@localhost:5432/worthtrust_test"
+
+    HASHER_WORKERS: int = 0
+    OUTBOX_WORKER_ENABLED: bool = False
 
 
 @lru_cache
@@ -85,6 +218,8 @@ def get_settings():
         return StagingSettings()
     elif _ENVIRON == PROD:
         return Prodsettings()
+    elif _ENVIRON == TEST:
+        return TestSettings()
 
 
 _settings = get_settings()
@@ -0,0 +1,25 @@
+from typing import Optional
+
+from pydantic import BaseModel, Field, StrictBool, StrictInt, StrictStr
+
+from .user import CompanySchema
+from .useraccess import UserPublic
+
+
+class BaseApplication(BaseModel):
+    n_process_steps: StrictInt = Field(alias="n_process_steps")
+    n_steps_performed: StrictInt = Field(alias="n_steps_performed")
+    joboffer_location: StrictStr = Field(alias="joboffer_location")
+    hired: Optional[StrictBool] = Field(alias="hired")
+
+    class Config:
+        orm_mode = True
+        allow_population_by_field_name = True
+
+
+class UserApplication(BaseApplication):
+    company: CompanySchema
+
+
+class CompanyApplicant(BaseApplication):
+    user: UserPublic
@@ -0,0 +1,24 @@
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from pydantic import BaseModel, Field, StrictInt, StrictStr
+
+from .user import CompanySchema
+
+
+class CompanyPage(BaseModel):
+    items: List[CompanySchema] = Field(alias="items")
+    # opaque position of the last item, to pass back for the next page
+    next_cursor: Optional[StrictStr] = Field(alias="next_cursor")
+
+
+class CompanyStatsSchema(BaseModel):
+    company_guid: UUID = Field(alias="company_guid")
+    applicants: StrictInt = Field(alias="applicants")
+    hired: StrictInt = Field(alias="hired")
+    hire_rate: float = Field(alias="hire_rate")
+    avg_process_steps: float = Field(alias="avg_process_steps")
+    avg_steps_performed: float = Field(alias="avg_steps_performed")
+    # steps performed over steps announced, across all applications
+    steps_completion_rate: float = Field(alias="steps_completion_rate")
+    applicants_by_location: Dict[str, StrictInt] = Field(alias="applicants_by_location")
@@ -17,6 +17,17 @@ class UserMe(BaseModel):
         orm_mode = True
 
 
+class UserPublic(BaseModel):
+    """
+    User as shown to the other users: no personal data.
+    """
+
+    username: StrictStr = Field(alias="username")
+
+    class Config:
+        orm_mode = True
+
+
 class Token(BaseModel):
     access_token: StrictStr
     token_type: StrictStr
@@ -1,13 +1,25 @@
 from datetime import datetime
-from typing import List
+from typing import Any, Dict, List
 from uuid import UUID, uuid4
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import (
+    JSON,
+    BigInteger,
+    ForeignKey,
+    Index,
+    LargeBinary,
+    Text,
+    false,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from ..settings import Base
 
 
+# Relationships are never lazy loaded: queries pick their loader strategy
+# (`joinedload`, `selectinload`) explicitly, instead of one query per row.
+
+
 class Application(Base):
     __tablename__ = "applications"
 
@@ -21,9 +33,13 @@ class Application(Base):
     hired: Mapped[bool] = mapped_column(nullable=True, default=False)
 
     # association between Application -> User
-    user: Mapped["User"] = relationship(back_populates="applications")
+    user: Mapped["User"] = relationship(
+        back_populates="applications", lazy="raise_on_sql"
+    )
     # association between Company -> User
-    company: Mapped["Company"] = relationship(back_populates="applications")
+    company: Mapped["Company"] = relationship(
+        back_populates="applications", lazy="raise_on_sql"
+    )
 
 
 class User(Base):
@@ -39,16 +55,35 @@ class User(Base):
     disabled: Mapped[bool] = mapped_column(nullable=False, default=False)
     username: Mapped[str] = mapped_column(nullable=False, unique=True)
     auth_x_token: Mapped[str] = mapped_column(nullable=False)
-    updated_at: Mapped[datetime] = mapped_column(nullable=False)
+    # sha256 of `auth_x_token`, used to look verification links up
+    auth_x_token_digest: Mapped[bytes] = mapped_column(
+        LargeBinary(32), nullable=True, unique=True
+    )
+    # bumped by every ORM update, `GET /user` derives its ETag from it
+    updated_at: Mapped[datetime] = mapped_column(nullable=False, onupdate=datetime.now)
     created_at: Mapped[datetime] = mapped_column(nullable=False)
     verified: Mapped[bool] = mapped_column(nullable=False, default=False)
+    # bumped to revoke every access token issued so far (logout, disable)
+    token_version: Mapped[int] = mapped_column(
+        nullable=False, default=0, server_default="0"
+    )
+    # allowed to the endpoints reading or writing every user's data
+    is_admin: Mapped[bool] = mapped_column(
+        nullable=False, default=False, server_default=false()
+    )
 
-    # many-to-many relationship to Company, bypassing the `Application` class
+    # many-to-many relationship to Company, bypassing the `Application` class;
+    # read only, applications are written through `Application`
     companies: Mapped[List["Company"]] = relationship(
-        secondary="applications", back_populates="users"
+        secondary="applications",
+        back_populates="users",
+        lazy="raise_on_sql",
+        viewonly=True,
     )
     # association between User -> Application -> Company
-    applications: Mapped[List["Application"]] = relationship(back_populates="user")
+    applications: Mapped[List["Application"]] = relationship(
+        back_populates="user", lazy="raise_on_sql"
+    )
 
 
 class Company(Base):
@@ -60,10 +95,149 @@ class Company(Base):
     name: Mapped[str] = mapped_column(nullable=False)
     location: Mapped[str] = mapped_column(nullable=False)
     linkedin_link: Mapped[str] = mapped_column(nullable=False, unique=True)
+    # incremented by every ORM update, company ETags derive from it
+    version: Mapped[int] = mapped_column(nullable=False, server_default="1")
 
-    # many-to-many relationship to User, bypassing the `Application` class
+    # many-to-many relationship to User, bypassing the `Application` class;
+    # read only, applications are written through `Application`
     users: Mapped[List["User"]] = relationship(
-        secondary="applications", back_populates="companies"
+        secondary="applications",
+        back_populates="companies",
+        lazy="raise_on_sql",
+        viewonly=True,
     )
     # association between Company -> Application -> User
-    applications: Mapped[List["Application"]] = relationship(back_populates="company")
+    applications: Mapped[List["Application"]] = relationship(
+        back_populates="company", lazy="raise_on_sql"
+    )
+
+    # search pages are ordered by (name, guid): `location` filters and keyset
+    # pagination walk btree indexes, substring matches on `name` the trigrams
+    __table_args__ = (
+        Index(
+            "ix_companies_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+        Index("ix_companies_name_guid", "name", "guid"),
+        Index("ix_companies_location_name_guid", "location", "name", "guid"),
+    )
+    __mapper_args__ = {"version_id_col": version}
+
+
+class CompanyStats(Base):
+    """
+    Running totals of the applications to a company, maintained on every
+    flush that inserts, updates or deletes an `Application`.
+    """
+
+    __tablename__ = "company_stats"
+
+    company_guid: Mapped[UUID] = mapped_column(
+        ForeignKey("companies.guid"), primary_key=True
+    )
+    applicants: Mapped[int] = mapped_column(nullable=False, default=0)
+    hired: Mapped[int] = mapped_column(nullable=False, default=0)
+    total_process_steps: Mapped[int] = mapped_column(nullable=False, default=0)
+    total_steps_performed: Mapped[int] = mapped_column(nullable=False, default=0)
+
+
+class CompanyLocationStats(Base):
+    __tablename__ = "company_location_stats"
+
+    company_guid: Mapped[UUID] = mapped_column(
+        ForeignKey("companies.guid"), primary_key=True
+    )
+    joboffer_location: Mapped[str] = mapped_column(primary_key=True)
+    applicants: Mapped[int] = mapped_column(nullable=False, default=0)
+
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+
+    PENDING = "pending"
+    # claimed by a worker until `next_attempt_at`, then claimable again
+    SENDING = "sending"
+    SENT = "sent"
+    DEAD = "dead"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    recipient: Mapped[str] = mapped_column(nullable=False)
+    subject: Mapped[str] = mapped_column(nullable=False)
+    template_name: Mapped[str] = mapped_column(nullable=False)
+    context: Mapped[Dict[str, Any]] = mapped_column(JSON, nullable=False)
+    status: Mapped[str] = mapped_column(nullable=False, default=PENDING)
+    attempts: Mapped[int] = mapped_column(nullable=False, default=0)
+    last_error: Mapped[str] = mapped_column(Text, nullable=True)
+    next_attempt_at: Mapped[datetime] = mapped_column(nullable=False)
+    created_at: Mapped[datetime] = mapped_column(nullable=False)
+    sent_at: Mapped[datetime] = mapped_column(nullable=True)
+
+    # only pending and claimed messages are polled, keep the index to those
+    __table_args__ = (
+        Index(
+            "ix_email_outbox_pending",
+            "next_attempt_at",
+            postgresql_where=status.in_([PENDING, SENDING]),
+        ),
+    )
+
+
+class RateLimitHit(Base):
+    """
+    Requests counted per rate limit key and fixed window (`slot`), shared by
+    every worker: the limiter weighs the previous window into a sliding one.
+    """
+
+    __tablename__ = "rate_limit_hits"
+
+    key: Mapped[str] = mapped_column(primary_key=True)
+    slot: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    hits: Mapped[int] = mapped_column(nullable=False)
+
+    # expired windows are deleted by slot
+    __table_args__ = (Index("ix_rate_limit_hits_slot", "slot"),)
+
+
+class TokenRevocation(Base):
+    """
+    Access tokens of `username` with a version lower than `token_version`
+    are revoked. Rows are replayed by the workers serving stateless tokens,
+    and deleted once every token they revoke has expired.
+    """
+
+    __tablename__ = "token_revocations"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    username: Mapped[str] = mapped_column(nullable=False)
+    token_version: Mapped[int] = mapped_column(nullable=False)
+    created_at: Mapped[datetime] = mapped_column(nullable=False)
+
+    # replayed and expired by creation time
+    __table_args__ = (Index("ix_token_revocations_created_at", "created_at"),)
+
+
+class IdempotencyKey(Base):
+    """
+    Request identified by a client `Idempotency-Key`: `pending` while the
+    first one is served, then `done` with the response to replay to the
+    duplicates. Rows are deleted once `expires_at` is past.
+    """
+
+    __tablename__ = "idempotency_keys"
+
+    PENDING = "pending"
+    DONE = "done"
+
+    key: Mapped[str] = mapped_column(primary_key=True)
+    fingerprint: Mapped[str] = mapped_column(nullable=False)
+    status: Mapped[str] = mapped_column(nullable=False, default=PENDING)
+    status_code: Mapped[int] = mapped_column(nullable=True)
+    body: Mapped[bytes] = mapped_column(LargeBinary, nullable=True)
+    media_type: Mapped[str] = mapped_column(nullable=True)
+    created_at: Mapped[datetime] = mapped_column(nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(nullable=False)
+
+    # expired keys are deleted by expiry time
+    __table_args__ = (Index("ix_idempotency_keys_expires_at", "expires_at"),)
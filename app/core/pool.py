@@ -0,0 +1,97 @@
+from threading import Lock
+from time import perf_counter
+from typing import Any, Dict
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolMetrics:
+    """
+    Counters of a connection pool since it was created.
+    """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.checkins = 0
+        self.overflow_events = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._lock = Lock()
+
+    def record_checkout(self, wait: float, overflowed: bool) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.overflow_events += overflowed
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+
+    def record_timeout(self, wait: float) -> None:
+        with self._lock:
+            self.timeouts += 1
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+
+    def record_checkin(self) -> None:
+        with self._lock:
+            self.checkins += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "overflow_events": self.overflow_events,
+            "timeouts": self.timeouts,
+            "wait_seconds_total": self.wait_seconds_total,
+            "wait_seconds_max": self.wait_seconds_max,
+            "wait_seconds_avg": (
+                self.wait_seconds_total / self.checkouts if self.checkouts else 0.0
+            ),
+        }
+
+
+class _InstrumentedPool:
+    """
+    Time how long callers wait for a connection, and count the checkouts
+    served beyond `pool_size` (overflow) or failing with a pool timeout.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self) -> Any:
+        start = perf_counter()
+        overflow = self._overflow
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_timeout(perf_counter() - start)
+            raise
+        self.metrics.record_checkout(
+            perf_counter() - start, self._overflow > max(overflow, 0)
+        )
+        return connection
+
+    def _do_return_conn(self, record: Any) -> None:
+        self.metrics.record_checkin()
+        super()._do_return_conn(record)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pool_size": self.size(),
+            "max_overflow": self._max_overflow,
+            "checked_out": self.checkedout(),
+            "idle": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            **self.metrics.as_dict(),
+        }
+
+
+class InstrumentedQueuePool(_InstrumentedPool, QueuePool):
+    pass
+
+
+class InstrumentedAsyncAdaptedQueuePool(_InstrumentedPool, AsyncAdaptedQueuePool):
+    pass
@@ -1,17 +1,294 @@
+import itertools
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, List, Sequence, Type
+
 from sqlalchemy import create_engine
-from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.engine import Engine, Result, Row, make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import Session, SessionTransaction, declarative_base, sessionmaker
+from sqlalchemy.pool import Pool
+from starlette.concurrency import run_in_threadpool
 
 from ..config import _settings
+from .pool import InstrumentedAsyncAdaptedQueuePool, InstrumentedQueuePool
+
+
+def _engine_options(poolclass: Type[Pool]) -> Dict[str, Any]:
+    return {
+        "echo": _settings.DB_ECHO,
+        "poolclass": poolclass,
+        "pool_size": _settings.DB_POOL_SIZE,
+        "max_overflow": _settings.DB_MAX_OVERFLOW,
+        "pool_timeout": _settings.DB_POOL_TIMEOUT,
+        "pool_recycle": _settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": _settings.DB_POOL_PRE_PING,
+    }
+
 
-# Create session
-engine = create_engine(url=_settings.DB_URI, echo=True)
-SessionLocal: Session = sessionmaker(autocommit=False, autoflush=True, bind=engine)
 Base = declarative_base()
 
+# Sessions get bound to their engine when it is first created
+SessionLocal: Session = sessionmaker(autocommit=False, autoflush=True)
+AsyncSessionLocal: AsyncSession = async_sessionmaker(
+    autocommit=False, autoflush=True, expire_on_commit=False
+)
+_engines: Dict[str, Any] = {}
+
+
+def get_engine() -> Engine:
+    """
+    Sync engine, created on first use: importing the app needs no database.
+    """
+    if "sync" not in _engines:
+        _engines["sync"] = create_engine(
+            url=_settings.DB_URI, **_engine_options(InstrumentedQueuePool)
+        )
+        SessionLocal.configure(bind=_engines["sync"])
+    return _engines["sync"]
+
+
+def get_async_engine() -> AsyncEngine:
+    """
+    `asyncpg` engine, created on first use.
+    """
+    if "async" not in _engines:
+        _engines["async"] = create_async_engine(
+            url=make_url(_settings.DB_URI).set(drivername="postgresql+asyncpg"),
+            **_engine_options(InstrumentedAsyncAdaptedQueuePool),
+        )
+        AsyncSessionLocal.configure(bind=_engines["async"])
+    return _engines["async"]
+
+
+def get_replica_engines() -> List[Engine]:
+    """
+    Sync engines of the `DB_REPLICA_URIS` read replicas, created on first use.
+    """
+    if "sync_replicas" not in _engines:
+        _engines["sync_replicas"] = [
+            create_engine(url=uri, **_engine_options(InstrumentedQueuePool))
+            for uri in _settings.DB_REPLICA_URIS
+        ]
+    return _engines["sync_replicas"]
+
+
+def get_async_replica_engines() -> List[AsyncEngine]:
+    """
+    `asyncpg` engines of the read replicas, created on first use.
+    """
+    if "async_replicas" not in _engines:
+        _engines["async_replicas"] = [
+            create_async_engine(
+                url=make_url(uri).set(drivername="postgresql+asyncpg"),
+                **_engine_options(InstrumentedAsyncAdaptedQueuePool),
+            )
+            for uri in _settings.DB_REPLICA_URIS
+        ]
+    return _engines["async_replicas"]
+
+
+def created_engines() -> Dict[str, Any]:
+    """
+    Engines this worker created so far, by kind, without creating any.
+    """
+    return dict(_engines)
+
+
+def init_engines() -> None:
+    get_engine()
+    get_async_engine()
+    get_replica_engines()
+    get_async_replica_engines()
+
+
+async def dispose_engines() -> None:
+    if "async" in _engines:
+        await _engines.pop("async").dispose()
+    if "sync" in _engines:
+        _engines.pop("sync").dispose()
+    for engine in _engines.pop("async_replicas", []):
+        await engine.dispose()
+    for engine in _engines.pop("sync_replicas", []):
+        engine.dispose()
+
+
+# Set for the requests allowed to read from a replica, see
+# `app.v1.replicas.read_only`.
+replica_reads: ContextVar[bool] = ContextVar("replica_reads", default=False)
+# `session.info` flag of the sessions bound to a replica
+ON_REPLICA = "on_replica"
+_rotation = itertools.count()
+
+
+def pick_replica(engines: Sequence[Any]) -> Any | None:
+    """
+    Replica engine with the fewest connections checked out, ties broken
+    round robin.
+
+    Args:
+        :engines (Sequence[Any]): Replica engines, sync or async.
+
+    Returns:
+        Any | None: Engine, `None` without replicas.
+    """
+    if not engines:
+        return None
+    start = next(_rotation) % len(engines)
+    rotated = [*engines[start:], *engines[:start]]
+    return min(rotated, key=lambda engine: engine.pool.checkedout())
+
+
+def _replica_bind(engines: Callable[[], Sequence[Any]]) -> Dict[str, Any]:
+    # session options, bound to a replica when the request may read from one
+    replica = pick_replica(engines()) if replica_reads.get() else None
+    return {} if replica is None else {"bind": replica, "info": {ON_REPLICA: True}}
+
 
 def get_db() -> Session:
+    get_engine()
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+class ThreadedResult:
+    """
+    `AsyncResult` look-alike over a sync `Result`, fetching on the threadpool.
+    """
+
+    def __init__(self, result: Result):
+        self.result = result
+
+    async def partitions(self, size: int | None = None) -> AsyncIterator[Sequence[Row]]:
+        while True:
+            partition = await run_in_threadpool(self.result.fetchmany, size)
+            if not partition:
+                return
+            yield partition
+
+    async def close(self) -> None:
+        await run_in_threadpool(self.result.close)
+
+
+class ThreadedTransaction:
+    """
+    `AsyncSessionTransaction` look-alike over a sync `SessionTransaction`.
+    """
+
+    def __init__(self, transaction: SessionTransaction):
+        self.transaction = transaction
+
+    async def commit(self) -> None:
+        await run_in_threadpool(self.transaction.commit)
+
+    async def rollback(self) -> None:
+        await run_in_threadpool(self.transaction.rollback)
+
+
+class ThreadedSession:
+    """
+    `AsyncSession` look-alike backed by a sync `Session`.
+
+    Every database round trip is dispatched to the threadpool, which is what
+    FastAPI does for sync dependencies. Handlers written against `AsyncSession`
+    run unchanged on top of it, so the sync driver can be benchmarked against
+    `asyncpg` by flipping `DB_ASYNC`.
+    """
+
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.sync_session, name)
+
+    async def __aenter__(self) -> "ThreadedSession":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.close()
+
+    async def run_sync(self, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+    async def execute(self, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self.sync_session.execute, *args, **kwargs)
+
+    async def stream(self, *args: Any, **kwargs: Any) -> ThreadedResult:
+        result = await run_in_threadpool(self.sync_session.execute, *args, **kwargs)
+        return ThreadedResult(result)
+
+    async def scalar(self, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self.sync_session.scalar, *args, **kwargs)
+
+    async def scalars(self, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self.sync_session.scalars, *args, **kwargs)
+
+    async def get(self, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self.sync_session.get, *args, **kwargs)
+
+    async def refresh(self, *args: Any, **kwargs: Any) -> None:
+        await run_in_threadpool(self.sync_session.refresh, *args, **kwargs)
+
+    async def merge(self, instance: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self.sync_session.merge, instance, **kwargs)
+
+    async def delete(self, instance: Any) -> None:
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def connection(self, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self.sync_session.connection, *args, **kwargs)
+
+    async def begin_nested(self) -> ThreadedTransaction:
+        nested = await run_in_threadpool(self.sync_session.begin_nested)
+        return ThreadedTransaction(nested)
+
+    async def flush(self, *args: Any, **kwargs: Any) -> None:
+        await run_in_threadpool(self.sync_session.flush, *args, **kwargs)
+
+    async def commit(self) -> None:
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self) -> None:
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self) -> None:
+        await run_in_threadpool(self.sync_session.close)
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    get_async_engine()
+    async with AsyncSessionLocal(**_replica_bind(get_async_replica_engines)) as db:
+        yield db
+
+
+async def get_threaded_db() -> AsyncIterator[ThreadedSession]:
+    get_engine()
+    session = SessionLocal(expire_on_commit=False, **_replica_bind(get_replica_engines))
+    async with ThreadedSession(session) as db:
+        yield db
+
+
+def new_session() -> AsyncSession:
+    """
+    Open a session outside of a request (e.g. background workers),
+    honouring `DB_ASYNC` like `get_session` does.
+    """
+    if _settings.DB_ASYNC:
+        get_async_engine()
+        return AsyncSessionLocal()
+    get_engine()
+    return ThreadedSession(SessionLocal(expire_on_commit=False))
+
+
+# Session dependency used across the APIs: `asyncpg` by default,
+# sync driver on the threadpool when `DB_ASYNC` is disabled.
+get_session: Callable[[], AsyncIterator[AsyncSession]] = (
+    get_async_db if _settings.DB_ASYNC else get_threaded_db
+)
@@ -1,12 +1,15 @@
 import uvicorn
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 
-from app.v1.main import app
+from app.v1.main import app, lifespan
 
 worthtrust = FastAPI(
     title="Worth Trust APIs",
     description="Worth Trust",
     version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 worthtrust.mount("/v1", app)
 
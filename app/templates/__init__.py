@@ -0,0 +1,83 @@
+import re
+from typing import Any, Dict, FrozenSet, List, Tuple
+
+from jinja2 import Environment, PackageLoader, meta, select_autoescape
+from jinja2.environment import Template
+from markupsafe import escape
+
+env = Environment(
+    loader=PackageLoader("app", "templates"),
+    autoescape=select_autoescape(["html", "xml"]),
+)
+
+
+def _variables(name: str) -> FrozenSet[str]:
+    """
+    Variables used by template `name` and by the templates
+    it extends or includes.
+    """
+    source, _, _ = env.loader.get_source(env, name)
+    ast = env.parse(source)
+    names = set(meta.find_undeclared_variables(ast))
+    for referenced in meta.find_referenced_templates(ast):
+        if referenced is not None:
+            names |= _variables(referenced)
+    return frozenset(names)
+
+
+class PrecompiledTemplate:
+    """
+    Template rendered once, with its variables replaced by markers.
+
+    The static parts (layout, inlined includes) are kept as plain strings and
+    rendering only escapes and splices the per message values in between, as
+    Jinja's autoescape would. This holds for templates interpolating their
+    variables verbatim (`{{ url }}`): when a marker does not survive the
+    pre-render, e.g. because a filter changed it, the template falls back to
+    a regular Jinja render.
+    """
+
+    def __init__(self, template: Template, variables: FrozenSet[str]):
+        self.template = template
+        self.variables = variables
+        self._parts: List[Tuple[str, str]] | None = None
+        self._tail = ""
+
+        html = template.render(**{v: f"\x00{v}\x00" for v in variables})
+        chunks = re.split("\x00([^\x00]+)\x00", html)
+        *parts, tail = chunks
+        pairs = list(zip(parts[::2], parts[1::2]))
+        if {v for _, v in pairs} == set(variables) and "\x00" not in "".join(
+            parts[::2] + [tail]
+        ):
+            self._parts = pairs
+            self._tail = tail
+
+    @property
+    def precompiled(self) -> bool:
+        return self._parts is not None
+
+    def render(self, **context: Any) -> str:
+        if self._parts is None:
+            return self.template.render(**context)
+        html = []
+        for static, variable in self._parts:
+            html.append(static)
+            html.append(escape(context.get(variable, "")))
+        html.append(self._tail)
+        return "".join(html)
+
+
+def load_templates() -> Dict[str, PrecompiledTemplate]:
+    """
+    Compile and pre-render every template under `app/templates`.
+    """
+    return {
+        name.removesuffix(".html"): PrecompiledTemplate(
+            env.get_template(name), _variables(name)
+        )
+        for name in env.list_templates(extensions=["html"])
+    }
+
+
+templates = load_templates()
@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from app.core.models.database import User
+
+
+def make_user(username: str = "JODOE", **fields) -> User:
+    """
+    `User` JO DOE, with an email and a verification token derived from
+    `username`.
+
+    Args:
+        :username (str): Username, unique per database.
+        :fields: Columns to set instead of the defaults.
+
+    Returns:
+        :User: Transient user.
+    """
+    columns = {
+        "name": "JO",
+        "surname": "DOE",
+        "email": f"{username.lower()}@worthtrust.io",
+        "hashed_psw": "hashed",
+        "username": username,
+        "auth_x_token": f"verification-{username}",
+        "updated_at": datetime(2023, 5, 1),
+        "created_at": datetime(2023, 5, 1),
+    }
+    return User(**{**columns, **fields})
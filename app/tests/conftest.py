@@ -1 +1,146 @@
-# TODO: Add conf
+import os
+from pathlib import Path
+from typing import AsyncIterator, Callable, ContextManager, Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+from pytest_postgresql import factories
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from postgres_binaries import find_pg_ctl
+from smtp_standin import SMTPStandIn
+
+# Select `TestSettings` before any `app` module reads the configuration
+os.environ.setdefault("ENVIRON", "TEST")
+
+
+PG_CTL = find_pg_ctl()
+
+ROOT = Path(__file__).parents[2]
+
+postgresql_proc = factories.postgresql_proc(executable=PG_CTL, port=None)
+postgresql_replica_proc = factories.postgresql_proc(executable=PG_CTL, port=None)
+
+
+@pytest.fixture
+def smtp_server(monkeypatch: pytest.MonkeyPatch) -> Iterator[SMTPStandIn]:
+    """
+    Local SMTP stand-in, wired into the email settings.
+    """
+    from app.config import _settings
+
+    server = SMTPStandIn().start()
+    monkeypatch.setattr(_settings, "EMAIL_HOST", server.host)
+    monkeypatch.setattr(_settings, "EMAIL_PORT", server.port)
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def sqlite_engine() -> Iterator[Engine]:
+    """
+    In-memory SQLite database with the whole schema, shared across threads
+    so that it can back a `ThreadedSession`.
+    """
+    from app.core.settings import Base
+
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def sqlite_sessions(sqlite_engine: Engine) -> Callable[[], Session]:
+    return sessionmaker(bind=sqlite_engine, expire_on_commit=False)
+
+
+@pytest.fixture
+def api_sessions(sqlite_sessions: Callable[[], Session]) -> Callable[[], Session]:
+    """
+    Sessions served to the app by `api_client`. Modules override it to
+    serve another database.
+    """
+    return sqlite_sessions
+
+
+@pytest.fixture
+def api_client(api_sessions: Callable[[], Session]) -> Iterator[TestClient]:
+    """
+    `TestClient` of the app, serving `get_session` from `api_sessions` on
+    the threadpool. Every dependency override, including those the test
+    sets, is cleared on teardown.
+    """
+    from app.core.settings import ThreadedSession, get_session
+    from app.v1.main import app
+
+    async def _session() -> AsyncIterator[ThreadedSession]:
+        async with ThreadedSession(api_sessions()) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = _session
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def query_budget() -> Callable[..., ContextManager]:
+    """
+    `with query_budget(2): ...` fails the test when the block executes more
+    than 2 SQL statements, or repeats one of them like an N+1 would.
+    """
+    from app.v1.profiler import query_budget
+
+    return query_budget
+
+
+def _database(request: pytest.FixtureRequest, proc_fixture: str) -> Iterator[str]:
+    if PG_CTL is None:
+        pytest.skip("PostgreSQL server binaries (pg_ctl) not found")
+    from alembic import command
+    from alembic.config import Config
+    from pytest_postgresql.janitor import DatabaseJanitor
+
+    proc = request.getfixturevalue(proc_fixture)
+    url = f"postgresql://{proc.user}@{proc.host}:{proc.port}/worthtrust"
+    with DatabaseJanitor(
+        user=proc.user,
+        host=proc.host,
+        port=proc.port,
+        dbname="worthtrust",
+        version=proc.version,
+        password=proc.password,
+    ):
+        engine = create_engine(url)
+        config = Config(str(ROOT / "alembic.ini"))
+        config.set_main_option("script_location", str(ROOT / "migrations"))
+        with engine.begin() as connection:
+            config.attributes["connection"] = connection
+            command.upgrade(config, "head")
+        engine.dispose()
+        yield url
+
+
+@pytest.fixture(scope="session")
+def postgres_url(request: pytest.FixtureRequest) -> Iterator[str]:
+    """
+    Database migrated to `head` on a throwaway PostgreSQL server, started
+    with pytest-postgresql. Skipped where the server binaries are not
+    installed.
+    """
+    yield from _database(request, "postgresql_proc")
+
+
+@pytest.fixture(scope="session")
+def postgres_replica_url(request: pytest.FixtureRequest) -> Iterator[str]:
+    """
+    Same as `postgres_url`, on a second server standing in for a replica.
+    """
+    yield from _database(request, "postgresql_replica_proc")
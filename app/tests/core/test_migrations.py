@@ -0,0 +1,80 @@
+import hashlib
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, inspect, text
+
+from app.core.models import database  # noqa: F401
+from app.core.settings import Base
+
+ROOT = Path(__file__).parents[3]
+
+
+def _migrate(engine, revision: str, downgrade: bool = False) -> None:
+    config = Config(str(ROOT / "alembic.ini"))
+    config.set_main_option("script_location", str(ROOT / "migrations"))
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        (command.downgrade if downgrade else command.upgrade)(config, revision)
+
+
+def test_migrations_match_models(tmp_path: Path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    _migrate(engine, "head")
+    with engine.connect() as connection:
+        diff = compare_metadata(MigrationContext.configure(connection), Base.metadata)
+    assert diff == []
+    engine.dispose()
+
+
+def test_baseline_databases_upgrade(tmp_path: Path):
+    # the tables `create_all` made before the schema had revisions
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    _migrate(engine, "0001")
+    assert set(inspect(engine).get_table_names()) == {
+        "alembic_version",
+        "users",
+        "companies",
+        "applications",
+    }
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                "INSERT INTO users (guid, name, surname, email, hashed_psw, "
+                "disabled, username, auth_x_token, updated_at, created_at, "
+                "verified) VALUES ('00000000000000000000000000000001', 'JO', "
+                "'DOE', 'jo@worthtrust.io', 'x', 0, 'JODOE', 'token', "
+                "'2023-01-01', '2023-01-01', 0)"
+            )
+        )
+    _migrate(engine, "head")
+    with engine.connect() as connection:
+        row = connection.execute(
+            text("SELECT username, auth_x_token_digest FROM users")
+        ).one()
+    # the verification link already sent still matches
+    assert row == ("JODOE", hashlib.sha256(b"token").digest())
+    _migrate(engine, "base", downgrade=True)
+    assert inspect(engine).get_table_names() == ["alembic_version"]
+    engine.dispose()
+
+
+def test_import_does_not_connect():
+    # In a fresh interpreter: no engine is created until the app starts
+    code = (
+        "import app.main\n"
+        "from app.core import settings\n"
+        "assert settings._engines == {}, settings._engines\n"
+    )
+    subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        check=True,
+        env={**os.environ, "ENVIRON": "TEST"},
+    )
@@ -0,0 +1,35 @@
+import pytest
+from sqlalchemy import create_engine, exc
+
+from app.core.pool import InstrumentedQueuePool
+
+
+def test_pool_stats_track_overflow_and_timeouts() -> None:
+    engine = create_engine(
+        "sqlite://",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.05,
+    )
+    first = engine.connect()
+    second = engine.connect()
+    stats = engine.pool.stats()
+    assert stats["checked_out"] == 2
+    assert stats["overflow"] == 1
+    assert stats["overflow_events"] == 1
+
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    stats = engine.pool.stats()
+    assert stats["timeouts"] == 1
+    assert stats["wait_seconds_max"] >= 0.05
+
+    first.close()
+    second.close()
+    stats = engine.pool.stats()
+    assert stats["checked_out"] == 0
+    assert stats["idle"] == 1
+    assert stats["checkouts"] == 2
+    assert stats["checkins"] == 2
+    engine.dispose()
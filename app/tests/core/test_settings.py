@@ -0,0 +1,32 @@
+import asyncio
+
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.settings import ThreadedSession
+
+
+def test_threaded_session_round_trip() -> None:
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    SessionLocal = sessionmaker(bind=engine)
+
+    async def _run():
+        async with ThreadedSession(SessionLocal()) as session:
+            await session.execute(text("CREATE TABLE t (v INTEGER)"))
+            await session.execute(text("INSERT INTO t VALUES (1), (2)"))
+            await session.commit()
+            total = await session.scalar(text("SELECT SUM(v) FROM t"))
+            values = (
+                await session.scalars(select(text("v")).select_from(text("t")))
+            ).all()
+            return total, values, session.in_transaction()
+
+    total, values, in_transaction = asyncio.run(_run())
+    assert total == 3
+    assert values == [1, 2]
+    assert in_transaction is True
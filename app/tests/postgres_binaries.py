@@ -0,0 +1,19 @@
+import os
+import shutil
+import subprocess
+from pathlib import Path
+
+
+def find_pg_ctl() -> str | None:
+    """
+    Locate the `pg_ctl` of the local PostgreSQL server binaries, on the
+    `PATH` or in the `pg_config --bindir` directory.
+
+    Returns:
+        str | None: Path of `pg_ctl`, `None` when it is not installed.
+    """
+    pg_ctl = shutil.which("pg_ctl")
+    if pg_ctl is None and shutil.which("pg_config"):
+        bindir = subprocess.check_output(["pg_config", "--bindir"], text=True)
+        pg_ctl = str(Path(bindir.strip()) / "pg_ctl")
+    return pg_ctl if pg_ctl and os.path.exists(pg_ctl) else None
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+from typing import Dict, List
+
+
+class SMTPStandIn:
+    """
+    Minimal SMTP server in the spirit of `aiosmtpd`'s `Controller`.
+
+    It serves on its own event loop thread, accepts any `AUTH PLAIN`
+    credentials and records every delivered message. Setting `fail`
+    rejects `MAIL FROM` with a transient `451` error. `disconnections`
+    counts the sessions ended by the client.
+    """
+
+    def __init__(self, host: str = "127.0.0.1"):
+        self.host = host
+        self.port = 0
+        self.fail = False
+        self.connections = 0
+        self.disconnections = 0
+        self.messages: List[Dict] = []
+
+    def start(self) -> "SMTPStandIn":
+        ready = threading.Event()
+        self.loop = asyncio.new_event_loop()
+
+        def _serve() -> None:
+            asyncio.set_event_loop(self.loop)
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, 0)
+            )
+            self.port = self.server.sockets[0].getsockname()[1]
+            ready.set()
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=_serve, daemon=True)
+        self.thread.start()
+        ready.wait()
+        return self
+
+    def stop(self) -> None:
+        async def _shutdown() -> None:
+            self.server.close()
+            for task in asyncio.all_tasks():
+                if task is not asyncio.current_task():
+                    task.cancel()
+
+        asyncio.run_coroutine_threadsafe(_shutdown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self.connections += 1
+        writer.write(b"220 worthtrust.test ESMTP stand-in\r\n")
+        envelope: Dict = {}
+        while line := await reader.readline():
+            verb = line[:4].upper()
+            if verb == b"EHLO":
+                writer.write(
+                    b"250-worthtrust.test\r\n250-AUTH PLAIN\r\n250 8BITMIME\r\n"
+                )
+            elif verb == b"HELO":
+                writer.write(b"250 worthtrust.test\r\n")
+            elif verb == b"AUTH":
+                writer.write(b"235 2.7.0 Authentication successful\r\n")
+            elif verb == b"MAIL":
+                if self.fail:
+                    writer.write(b"451 4.3.0 Mail server temporarily unavailable\r\n")
+                else:
+                    envelope = {"from": line[10:].strip().decode(), "to": []}
+                    writer.write(b"250 OK\r\n")
+            elif verb == b"RCPT":
+                envelope["to"].append(line[8:].strip().decode())
+                writer.write(b"250 OK\r\n")
+            elif verb == b"DATA":
+                writer.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                await writer.drain()
+                data = bytearray()
+                while (chunk := await reader.readline()) != b".\r\n":
+                    data += chunk
+                self.messages.append({**envelope, "data": data.decode()})
+                writer.write(b"250 OK: queued\r\n")
+            elif verb in (b"RSET", b"NOOP"):
+                writer.write(b"250 OK\r\n")
+            elif verb == b"QUIT":
+                writer.write(b"221 Bye\r\n")
+                await writer.drain()
+                break
+            else:
+                writer.write(b"502 Command not implemented\r\n")
+            await writer.drain()
+        writer.close()
+        self.disconnections += 1
@@ -0,0 +1,38 @@
+import pytest
+
+from app.templates import PrecompiledTemplate, env, templates
+
+
+def test_all_templates_are_precompiled() -> None:
+    assert set(templates) == {"_styles", "base", "verification"}
+    assert all(template.precompiled for template in templates.values())
+    assert templates["verification"].variables == {"url", "first_name", "subject"}
+
+
+@pytest.mark.parametrize(
+    "context",
+    [
+        {
+            "url": "http://test/verifyemail/abc",
+            "first_name": "JO",
+            "subject": "WorthTrust email verification",
+        },
+        {
+            "url": 'http://test/?a=1&b="2"',
+            "first_name": "<script>alert('x')</script>",
+            "subject": "Tom & Jerry",
+        },
+        {"url": "http://test/verifyemail/abc"},
+    ],
+)
+def test_precompiled_render_matches_jinja(context: dict) -> None:
+    expected = env.get_template("verification.html").render(**context)
+    assert templates["verification"].render(**context) == expected
+
+
+def test_filtered_variables_fall_back_to_jinja() -> None:
+    template = PrecompiledTemplate(
+        env.from_string("<p>{{ first_name | upper }}</p>"), frozenset({"first_name"})
+    )
+    assert not template.precompiled
+    assert template.render(first_name="jo") == "<p>JO</p>"
@@ -0,0 +1,25 @@
+import asyncio
+
+import pytest
+
+from app.config import _settings
+from benchmarks import api_suite
+
+
+def test_api_suite(postgres_url: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    # Every endpoint of the benchmark suite, end to end on PostgreSQL
+    monkeypatch.setattr(_settings, "DB_URI", postgres_url)
+    monkeypatch.setattr(_settings, "RATE_LIMIT_ENABLED", False)
+    api_suite.prepare(postgres_url, users=20, companies=5, applications=3)
+    results = asyncio.run(api_suite.run(20, requests=10, concurrency=4, companies=5))
+
+    assert set(results["endpoints"]) == {
+        "register",
+        "token",
+        "get_user",
+        "verify_email",
+        "disable_user",
+    }
+    for name, summary in results["endpoints"].items():
+        assert summary["errors"] == 0, (name, summary["status_codes"])
+        assert summary["count"] == 10
@@ -0,0 +1,77 @@
+from typing import List, Tuple
+
+import pytest
+from sqlalchemy import event
+
+from app.core.models.database import Application, Company, User
+from app.tests.builders import make_user
+from app.v1.dependencies import get_current_active_user
+from app.v1.main import app
+
+
+def _seed(sessions, n: int) -> Tuple[User, Company]:
+    """
+    One company applied to by `n` users, the first of which applied to
+    `n` companies.
+    """
+    with sessions() as session:
+        users = [make_user(f"JODOE{i}") for i in range(n)]
+        companies = [
+            Company(
+                name=f"Company {i}",
+                location="MILAN",
+                linkedin_link=f"https://linkedin.com/company/{i}",
+            )
+            for i in range(n)
+        ]
+        session.add_all(users + companies)
+        session.flush()
+        session.add_all(
+            Application(
+                user_guid=users[0].guid,
+                company_guid=company.guid,
+                n_process_steps=3,
+                n_steps_performed=1,
+                joboffer_location="MILAN",
+            )
+            for company in companies
+        )
+        session.add_all(
+            Application(
+                user_guid=user.guid,
+                company_guid=companies[0].guid,
+                n_process_steps=3,
+                n_steps_performed=1,
+                joboffer_location="MILAN",
+            )
+            for user in users[1:]
+        )
+        session.commit()
+        return users[0], companies[0]
+
+
+@pytest.mark.parametrize("n", [1, 10, 50])
+def test_listings_query_count_is_fixed(
+    api_client, sqlite_engine, sqlite_sessions, n
+) -> None:
+    user, company = _seed(sqlite_sessions, n)
+    statements: List[str] = []
+    app.dependency_overrides[get_current_active_user] = lambda: user
+    event.listen(
+        sqlite_engine, "before_cursor_execute", lambda *a: statements.append(a[2])
+    )
+    applications = api_client.get("/user/applications").json()
+    assert len(statements) == 1
+    assert len(applications) == n
+    assert {a["company"]["company_name"] for a in applications} == {
+        f"Company {i}" for i in range(n)
+    }
+
+    statements.clear()
+    applicants = api_client.get(f"/company/{company.guid}/applicants").json()
+    assert len(statements) == 2
+    assert len(applicants) == n
+    assert {a["user"]["username"] for a in applicants} == {
+        f"JODOE{i}" for i in range(n)
+    }
+    assert all(set(a["user"]) == {"username"} for a in applicants)
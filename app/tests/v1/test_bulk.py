@@ -0,0 +1,145 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from typing import AsyncIterator, List
+
+from jose import jwt
+from sqlalchemy import func, select
+
+from app.core.models.database import EmailOutbox, User
+from app.core.settings import ThreadedSession
+from app.tests.builders import make_user
+from app.v1 import bulk
+from app.v1.bulk import CSV, JSONL, MAX_BATCH_SIZE, UserImport, read_rows
+from app.v1.dependencies import get_current_active_user, token_digest
+from app.v1.main import app
+
+
+def _row(n: int, email: str | None = None) -> dict:
+    return {
+        "user_name": "jo",
+        "user_surname": f"doe{n}",
+        "user_email": email or f"jo{n}@worthtrust.io",
+        "user_psw": "password",
+    }
+
+
+async def _chunks(data: bytes, size: int = 7) -> AsyncIterator[bytes]:
+    for start in range(0, len(data), size):
+        yield data[start : start + size]
+
+
+def _read(data: bytes, fmt: str) -> List:
+    async def _run():
+        return [row async for row in read_rows(_chunks(data), fmt)]
+
+    return asyncio.run(_run())
+
+
+def test_read_rows_across_chunks() -> None:
+    csv_rows = _read(
+        'user_name,user_surname\r\nJo,"Doe, Jr"\r\n\r\nAl\r\nÉlo,Ré'.encode(), CSV
+    )
+    assert csv_rows == [
+        (1, {"user_name": "Jo", "user_surname": "Doe, Jr"}),
+        (2, "Expected 2 fields, got 1"),
+        (3, {"user_name": "Élo", "user_surname": "Ré"}),
+    ]
+    # quoted newlines and quotes, split across chunks
+    multiline = _read(b'a,b\n"x\n\ny",1\n"say ""hi""",2\n', CSV)
+    assert multiline == [
+        (1, {"a": "x\n\ny", "b": "1"}),
+        (2, {"a": 'say "hi"', "b": "2"}),
+    ]
+    jsonl_rows = _read(b'{"a": 1}\n[1]\n{nope\n', JSONL)
+    assert jsonl_rows[0] == (1, {"a": 1})
+    assert jsonl_rows[1] == (2, "Expected an object")
+    assert jsonl_rows[2][1].startswith("Invalid JSON")
+
+
+def _import(sessions, rows: List[dict], batch_size: int) -> dict:
+    upload = "\n".join(json.dumps(row) for row in rows).encode()
+
+    async def _run():
+        async with ThreadedSession(sessions()) as session:
+            request = SimpleNamespace(base_url="http://worthtrust/")
+            return await UserImport(session, request, batch_size=batch_size).run(
+                _chunks(upload), JSONL
+            )
+
+    return asyncio.run(_run())
+
+
+def test_import_reports_duplicates_without_aborting(sqlite_sessions) -> None:
+    with sqlite_sessions() as session:
+        session.add(make_user(email="taken@worthtrust.io"))
+        session.commit()
+    rows = [_row(n) for n in range(5)]
+    rows[1] = _row(1, "taken@worthtrust.io")
+    rows[3] = _row(3, "jo0@worthtrust.io")
+    rows[4]["user_email"] = "not an email"
+
+    assert UserImport(None, None, batch_size=10**6).batch_size == MAX_BATCH_SIZE
+    assert MAX_BATCH_SIZE * len(User.__table__.columns) <= 32767
+    report = _import(sqlite_sessions, rows, batch_size=2)
+    assert (report["rows"], report["imported"], report["failed"]) == (5, 2, 3)
+    assert [error["row"] for error in report["errors"]] == [2, 4, 5]
+    assert report["errors"][0]["error"] == "Email already registered"
+    assert report["errors"][1]["error"] == "Email already registered"
+    assert report["errors"][2]["error"].startswith("user_email")
+    with sqlite_sessions() as session:
+        assert session.scalar(select(func.count()).select_from(User)) == 3
+        assert session.scalar(select(func.count()).select_from(EmailOutbox)) == 2
+
+
+def test_import_retries_username_collisions(sqlite_sessions, monkeypatch) -> None:
+    with sqlite_sessions() as session:
+        session.add(make_user("TAKEN"))
+        session.commit()
+    # both rows draw the taken username, then the first one draws it again
+    names = iter(["TAKEN", "TAKEN", "TAKEN", "FRESH1", "FRESH2"])
+    monkeypatch.setattr(bulk, "generate_username", lambda: next(names))
+    report = _import(sqlite_sessions, [_row(0), _row(1)], batch_size=2)
+    assert (report["imported"], report["errors"]) == (2, [])
+    with sqlite_sessions() as session:
+        users = session.scalars(select(User).where(User.username != "TAKEN")).all()
+        assert {user.username: user.email for user in users} == {
+            "FRESH1": "jo1@worthtrust.io",
+            "FRESH2": "jo0@worthtrust.io",
+        }
+        # the verification tokens follow the new usernames
+        assert all(
+            jwt.get_unverified_claims(user.auth_x_token)["sub"] == user.username
+            and user.auth_x_token_digest == token_digest(user.auth_x_token)
+            for user in users
+        )
+
+    monkeypatch.setattr(bulk, "generate_username", lambda: "TAKEN")
+    report = _import(sqlite_sessions, [_row(2)], batch_size=2)
+    assert report["imported"] == 0
+    assert report["errors"] == [
+        {"row": 1, "error": "Could not generate a unique username"}
+    ]
+
+
+def test_import_endpoint(api_client) -> None:
+    user = make_user(disabled=False, is_admin=False)
+    app.dependency_overrides[get_current_active_user] = lambda: user
+    response = api_client.post(
+        "/users/import", content="", headers={"Content-Type": "text/csv"}
+    )
+    assert response.status_code == 403
+    user.is_admin = True
+    header = ",".join(_row(0))
+    lines = [",".join(_row(n).values()) for n in range(3)]
+    response = api_client.post(
+        "/users/import",
+        content="\n".join([header, *lines]),
+        headers={"Content-Type": "text/csv"},
+    )
+    assert response.json()["imported"] == 3
+    assert response.json()["rows_per_second"] > 0
+    response = api_client.post(
+        "/users/import", content="{}", headers={"Content-Type": "text/plain"}
+    )
+    assert response.status_code == 415
@@ -0,0 +1,72 @@
+import asyncio
+
+from sqlalchemy import event, select
+
+from app.core.models.database import User
+from app.core.settings import ThreadedSession
+from app.tests.builders import make_user
+from app.v1.cache import TTLCache, cache_user, cached_user, user_cache
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_ttl_cache_expires_entries() -> None:
+    timer = FakeTimer()
+    cache = TTLCache(maxsize=10, ttl=5, timer=timer)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    timer.now = 5
+    assert cache.get("a") is None
+    assert len(cache) == 0
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_ttl_cache_evicts_least_recently_used() -> None:
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+    cache.invalidate("a")
+    assert cache.get("a") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_cached_user_is_attached_without_querying(
+    sqlite_engine, sqlite_sessions
+) -> None:
+    statements = []
+
+    with sqlite_sessions() as session:
+        user = make_user()
+        session.add(user)
+        session.commit()
+        cache_user(user)
+
+    async def _run():
+        async with ThreadedSession(sqlite_sessions()) as session:
+            user = await cached_user(session, "JODOE")
+            user.disabled = True
+            await session.commit()
+
+    event.listen(
+        sqlite_engine, "before_cursor_execute", lambda *a: statements.append(a[2])
+    )
+    asyncio.run(_run())
+    assert len(statements) == 1
+    assert statements[0].startswith("UPDATE users SET disabled")
+
+    with sqlite_sessions() as session:
+        assert session.scalar(select(User.disabled)) is True
+    user_cache.clear()
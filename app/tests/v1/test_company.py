@@ -0,0 +1,61 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.models.database import Company
+from app.v1.dependencies import get_current_active_user
+from app.v1.main import app
+
+CITIES = ["MILAN", "ROME", "TURIN"]
+
+
+@pytest.fixture
+def client(api_client, sqlite_sessions) -> TestClient:
+    with sqlite_sessions() as session:
+        session.add_all(
+            Company(
+                name=f"Company {n % 7} {n:03}",
+                location=CITIES[n % len(CITIES)],
+                linkedin_link=f"https://linkedin.com/company/{n}",
+            )
+            for n in range(60)
+        )
+        session.commit()
+    app.dependency_overrides[get_current_active_user] = lambda: None
+    return api_client
+
+
+def _walk(client: TestClient, **params) -> list:
+    names, cursor = [], ""
+    while True:
+        page = client.get(
+            "/companies", params={**params, "limit": 7, "cursor": cursor}
+        ).json()
+        assert len(page["items"]) <= 7
+        names += [company["company_name"] for company in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return names
+
+
+def test_keyset_pages_cover_the_search_once(client: TestClient) -> None:
+    every = _walk(client)
+    assert every == sorted(every) and len(every) == 60
+    in_rome = _walk(client, name="company 3", location="ROME")
+    assert in_rome == [
+        f"Company 3 {n:03}" for n in range(60) if n % 7 == 3 and n % 3 == 1
+    ]
+    assert _walk(client, name="%") == []
+
+
+def test_create_and_get_company(client: TestClient) -> None:
+    form = {
+        "company_name": "WorthTrust",
+        "company_location": "MILAN",
+        "company_linkedin_link": "https://linkedin.com/company/worthtrust",
+    }
+    created = client.post("/company", json=form)
+    assert created.status_code == 201
+    fetched = client.get(f"/company/{created.json()['company_guid']}")
+    assert fetched.json() == created.json()
+    assert client.post("/company", json=form).status_code == 409
+    assert client.get("/companies", params={"cursor": "nope"}).status_code == 400
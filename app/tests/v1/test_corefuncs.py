@@ -0,0 +1,29 @@
+import asyncio
+
+from sqlalchemy import select
+
+from app.core.models.database import User
+from app.core.settings import ThreadedSession
+from app.tests.builders import make_user
+from app.v1 import corefuncs
+from app.v1.dependencies import token_digest
+
+
+def test_verify_user_marks_once(sqlite_sessions) -> None:
+    with sqlite_sessions() as session:
+        session.add(
+            make_user(auth_x_token="token", auth_x_token_digest=token_digest("token"))
+        )
+        session.commit()
+
+    async def _verify(token: str):
+        async with ThreadedSession(sqlite_sessions()) as session:
+            username = await corefuncs.verify_user(token_digest(token), session)
+            await session.commit()
+            return username
+
+    assert asyncio.run(_verify("unknown")) is None
+    assert asyncio.run(_verify("token")) == "JODOE"
+    assert asyncio.run(_verify("token")) is None
+    with sqlite_sessions() as session:
+        assert session.scalar(select(User.verified)) is True
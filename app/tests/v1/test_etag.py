@@ -0,0 +1,60 @@
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import event
+
+from app.core.models.database import Company
+from app.tests.builders import make_user
+from app.v1.dependencies import get_current_active_user
+from app.v1.main import app
+
+
+def test_user_etag(api_client) -> None:
+    user = make_user()
+    app.dependency_overrides[get_current_active_user] = lambda: user
+    first = api_client.get("/user")
+    etag = first.headers["ETag"]
+    assert first.json()["username"] == "JODOE"
+
+    cached = api_client.get("/user", headers={"If-None-Match": f'W/"x", {etag}'})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["ETag"] == etag
+
+    user.updated_at = datetime(2023, 5, 2)
+    changed = api_client.get("/user", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_company_etag_reads_only_the_version(
+    api_client, sqlite_engine, sqlite_sessions
+) -> None:
+    with sqlite_sessions() as session:
+        company = Company(
+            name="WorthTrust",
+            location="MILAN",
+            linkedin_link="https://linkedin.com/company/worthtrust",
+        )
+        session.add(company)
+        session.commit()
+
+    statements: List[str] = []
+    etag = api_client.get(f"/company/{company.guid}").headers["ETag"]
+    event.listen(
+        sqlite_engine, "before_cursor_execute", lambda *a: statements.append(a[2])
+    )
+    cached = api_client.get(f"/company/{company.guid}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert len(statements) == 1
+    assert statements[0].startswith("SELECT companies.version")
+
+    with sqlite_sessions() as session:
+        session.get(Company, company.guid).location = "ROME"
+        session.commit()
+    changed = api_client.get(
+        f"/company/{company.guid}", headers={"If-None-Match": etag}
+    )
+    assert changed.status_code == 200
+    assert changed.json()["company_location"] == "ROME"
+    assert changed.headers["ETag"] != etag
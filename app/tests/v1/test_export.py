@@ -0,0 +1,128 @@
+import asyncio
+import csv
+import json
+import resource
+from pathlib import Path
+from typing import Callable, Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.settings import Base
+from app.tests.builders import make_user
+from app.v1.dependencies import get_current_active_user, get_current_admin_user
+from app.v1.main import app
+
+# `side` users applying to `side` companies each
+SEED = [
+    """
+    WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < :side)
+    INSERT INTO users (guid, name, surname, email, hashed_psw, disabled,
+        username, auth_x_token, updated_at, created_at, verified)
+    SELECT printf('%032x', i), 'JO', 'DOE', 'jo' || i || '@worthtrust.io', 'x', 0,
+        'JODOE' || i, 'token' || i, '2023-01-01', '2023-01-01', 1 FROM n
+    """,
+    """
+    WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < :side)
+    INSERT INTO companies (guid, name, location, linkedin_link)
+    SELECT printf('%032x', i), 'Company ' || i, 'MILAN', 'link' || i FROM n
+    """,
+    """
+    INSERT INTO applications (user_guid, company_guid, n_process_steps,
+        n_steps_performed, joboffer_location, hired)
+    SELECT users.guid, companies.guid, 3, 1, 'MILAN', 0 FROM users, companies
+    """,
+]
+
+
+def _max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@pytest.fixture
+def api_sessions(tmp_path: Path) -> Iterator[Callable[[], Session]]:
+    # on disk, so that the tables do not live in the process memory
+    engine = create_engine(f"sqlite:///{tmp_path / 'export.db'}")
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def export_client(api_client, api_sessions) -> Callable[[int], TestClient]:
+    def _client(side: int) -> TestClient:
+        with api_sessions() as session:
+            for statement in SEED:
+                session.execute(text(statement), {"side": side})
+            session.commit()
+        app.dependency_overrides[get_current_admin_user] = lambda: None
+        return api_client
+
+    return _client
+
+
+def test_export_formats(export_client) -> None:
+    client = export_client(1)
+    response = client.get("/applications/export", params={"format": "csv"})
+    assert response.headers["content-type"].startswith("text/csv")
+    header, row = csv.reader(response.text.splitlines())
+    record = dict(zip(header, row))
+    assert record["username"] == "JODOE1" and record["company_name"] == "Company 1"
+
+    response = client.get("/applications/export")
+    (line,) = response.text.splitlines()
+    record = json.loads(line)
+    assert record["n_process_steps"] == 3 and record["hired"] is False
+
+
+def test_export_needs_an_admin(export_client) -> None:
+    client = export_client(1)
+    del app.dependency_overrides[get_current_admin_user]
+    user = make_user("JODOE1", disabled=False, is_admin=False)
+    app.dependency_overrides[get_current_active_user] = lambda: user
+    assert client.get("/applications/export").status_code == 403
+
+    user.is_admin = True
+    assert client.get("/applications/export").status_code == 200
+
+
+def test_export_memory_stays_flat(export_client) -> None:
+    export_client(1000)
+    received = {"rows": 0, "size": 0}
+
+    # drive the ASGI app directly: `TestClient` buffers whole responses
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def _receive():
+        if requests:
+            return requests.pop()
+        # the client stays connected until the response ends
+        await asyncio.Event().wait()
+
+    async def _send(message):
+        if message["type"] == "http.response.body":
+            received["size"] += len(message.get("body", b""))
+            received["rows"] += message.get("body", b"").count(b"\n")
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/applications/export",
+        "raw_path": b"/applications/export",
+        "root_path": "",
+        "query_string": b"format=csv",
+        "headers": [],
+        "client": ("test", 0),
+        "server": ("test", 80),
+    }
+    before = _max_rss_mb()
+    asyncio.run(app(scope, _receive, _send))
+    assert received["rows"] == 1_000_000 + 1
+    # the export is far bigger than the growth of the peak RSS
+    assert received["size"] / 2**20 > 100
+    assert _max_rss_mb() - before < 50
@@ -0,0 +1,147 @@
+import asyncio
+
+import pytest
+from fastapi.exceptions import HTTPException
+from sqlalchemy import select
+
+from app.core.models.database import User
+from app.core.settings import ThreadedSession
+from app.tests.builders import make_user
+from app.v1 import dependencies, hashing
+from app.v1.dependencies import authenticate_user
+from app.v1.hashing import (
+    Calibration,
+    PasswordHasher,
+    calibrate,
+    hash_seconds,
+    make_context,
+    publish,
+    shared_calibration,
+)
+
+
+@pytest.mark.parametrize("max_workers", [0, 2])
+def test_hash_and_verify(max_workers: int) -> None:
+    hasher = PasswordHasher(max_workers=max_workers, max_pending=4)
+
+    async def _run():
+        hashed = await hasher.hash("s3cret")
+        return (
+            hashed,
+            await hasher.verify("s3cret", hashed),
+            await hasher.verify("wrong", hashed),
+        )
+
+    try:
+        hashed, valid, invalid = asyncio.run(_run())
+    finally:
+        hasher.shutdown()
+    assert hashed.startswith("$2b$")
+    assert valid is True
+    assert invalid is False
+    assert hasher.pending == 0
+
+
+def test_saturated_hasher_rejects() -> None:
+    hasher = PasswordHasher(max_workers=1, max_pending=1)
+
+    async def _run():
+        return await asyncio.gather(
+            hasher.hash("first"), hasher.hash("second"), return_exceptions=True
+        )
+
+    try:
+        first, second = asyncio.run(_run())
+    finally:
+        hasher.shutdown()
+    assert isinstance(first, str)
+    assert isinstance(second, HTTPException)
+    assert second.status_code == 503
+    assert second.headers == {"Retry-After": "1"}
+
+
+def test_hash_many_keeps_order() -> None:
+    hasher = PasswordHasher(max_workers=2, max_pending=2)
+    passwords = [f"s3cret-{n}" for n in range(5)]
+
+    async def _run():
+        hashed = await hasher.hash_many(passwords)
+        return [await hasher.verify(p, h) for p, h in zip(passwords, hashed)]
+
+    try:
+        assert asyncio.run(_run()) == [True] * 5
+    finally:
+        hasher.shutdown()
+
+
+def test_calibrate() -> None:
+    # below the floor on any CPU
+    calibration = calibrate(target=0.001, samples=1)
+    assert (calibration.scheme, calibration.rounds) == ("bcrypt", 10)
+    assert calibration.seconds > 0
+
+    publish(calibration)
+    labels = (("scheme", "bcrypt"), ("rounds", "10"))
+    assert hash_seconds.value(labels) == calibration.seconds
+
+    context = make_context("bcrypt", 11)
+    assert context.needs_update(make_context("bcrypt", 10).hash("s3cret"))
+    assert not context.needs_update(context.hash("s3cret"))
+    assert not context.needs_update(make_context("bcrypt", 12).hash("s3cret"))
+    with pytest.raises(ValueError):
+        make_context("md5_crypt")
+
+
+def test_shared_calibration(tmp_path, monkeypatch) -> None:
+    path = str(tmp_path / "calibration.json")
+    calibrations = []
+
+    def _calibrate(target: float, scheme: str) -> Calibration:
+        calibrations.append(target)
+        return Calibration(scheme, 10 + len(calibrations), target)
+
+    monkeypatch.setattr(hashing, "calibrate", _calibrate)
+    # the first worker calibrates, the others read its result
+    first = shared_calibration(path, 0.25)
+    assert shared_calibration(path, 0.25) == first == Calibration("bcrypt", 11, 0.25)
+    assert shared_calibration(path, 0.5).rounds == 12
+    assert shared_calibration(path, 0.5, refresh=True).rounds == 13
+    assert calibrations == [0.25, 0.5, 0.5]
+
+
+def test_login_upgrades_weaker_hashes(sqlite_sessions, monkeypatch) -> None:
+    with sqlite_sessions() as session:
+        session.add(make_user(hashed_psw=make_context("bcrypt", 10).hash("s3cret")))
+        session.commit()
+    hasher = PasswordHasher(max_workers=0, max_pending=4)
+    monkeypatch.setattr(hashing, "pwd_context", hashing.pwd_context)
+    monkeypatch.setattr(dependencies, "hasher", hasher)
+    monkeypatch.setattr(
+        dependencies, "new_session", lambda: ThreadedSession(sqlite_sessions())
+    )
+    invalidated = []
+
+    async def _invalidate(session, username: str) -> None:
+        invalidated.append(username)
+
+    monkeypatch.setattr(dependencies, "invalidate_user", _invalidate)
+    hasher.configure("bcrypt", 11)
+
+    async def _login(password: str):
+        async with ThreadedSession(sqlite_sessions()) as session:
+            user = await authenticate_user(session, "JODOE", password)
+        await asyncio.gather(*dependencies.pending_rehashes)
+        return user
+
+    assert asyncio.run(_login("wrong")) is False
+    with sqlite_sessions() as session:
+        assert session.scalar(select(User.hashed_psw)).startswith("$2b$10$")
+
+    # responded with the old hash, upgraded right after
+    assert asyncio.run(_login("s3cret")).hashed_psw.startswith("$2b$10$")
+    with sqlite_sessions() as session:
+        hashed = session.scalar(select(User.hashed_psw))
+    assert hashed.startswith("$2b$11$")
+    assert asyncio.run(_login("s3cret")).hashed_psw == hashed
+    # the cached user with the old hash is evicted once
+    assert invalidated == ["JODOE"]
@@ -0,0 +1,163 @@
+import asyncio
+from typing import Callable
+
+import httpx
+import pytest
+from fastapi import Request, Response
+from fastapi.exceptions import HTTPException
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.config import _settings
+from app.core.models.database import IdempotencyKey, User
+from app.core.settings import Base, ThreadedSession
+from app.v1.idempotency import REPLAYED_HEADER, IdempotencyStore
+from app.v1.main import app
+from app.v1.routers import user as user_router
+
+FORM = {
+    "user_name": "jo",
+    "user_surname": "doe",
+    "user_email": "jo@worthtrust.io",
+    "user_psw": "s3cret-password",
+}
+
+
+@pytest.fixture
+def sessions(tmp_path) -> Callable:
+    # a file, so that concurrent requests each get their own connection
+    engine = create_engine(f"sqlite:///{tmp_path / 'idempotency.db'}")
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine, expire_on_commit=False)
+    engine.dispose()
+
+
+@pytest.fixture
+def api_sessions(sessions) -> Callable:
+    # `register` requests go through `api_client` for its session override
+    return sessions
+
+
+def _store(sessions, **options) -> IdempotencyStore:
+    options = {"ttl": 60, "lease": 30, "wait": 5, "cache_size": 10, **options}
+    return IdempotencyStore(
+        session_factory=lambda: ThreadedSession(sessions()), poll=0.01, **options
+    )
+
+
+def _request(key: str, body: bytes = b"{}") -> Request:
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/register",
+        "headers": [(b"idempotency-key", key.encode())],
+    }
+    return Request(scope, receive)
+
+
+async def _serve(store: IdempotencyStore, sessions, key: str, served: list) -> Response:
+    async with store.request(_request(key), "register") as attempt:
+        if attempt.replay is not None:
+            return attempt.replay
+        served.append(key)
+        await asyncio.sleep(0.05)
+        response = Response(b"created", status_code=201)
+        async with ThreadedSession(sessions()) as session:
+            await attempt.complete(response, session)
+            await session.commit()
+        return response
+
+
+@pytest.fixture
+def register(api_client, sessions, monkeypatch: pytest.MonkeyPatch) -> Callable:
+    hashed = []
+    hash_password = user_router.corefuncs.hasher.hash
+
+    async def _hash(password: str) -> str:
+        hashed.append(password)
+        return await hash_password(password)
+
+    monkeypatch.setattr(_settings, "RATE_LIMIT_ENABLED", False)
+    monkeypatch.setattr(user_router.corefuncs.hasher, "hash", _hash)
+    monkeypatch.setattr(user_router, "idempotency_keys", _store(sessions))
+
+    async def _register(keys: list, form: dict = FORM) -> list:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            return await asyncio.gather(
+                *(
+                    c.post("/register", json=form, headers={"Idempotency-Key": key})
+                    for key in keys
+                )
+            )
+
+    return _register, hashed
+
+
+def test_register_duplicates_are_served_once(register, sessions) -> None:
+    _register, hashed = register
+    # concurrent duplicates wait for the first request
+    responses = asyncio.run(_register(["retry-1", "retry-1", "retry-1"]))
+    assert [r.status_code for r in responses] == [201, 201, 201]
+    assert len({r.content for r in responses}) == 1
+    assert sum(REPLAYED_HEADER in r.headers for r in responses) == 2
+    assert len(hashed) == 1
+
+    # later retries are replayed from memory
+    (replayed,) = asyncio.run(_register(["retry-1"]))
+    assert replayed.headers[REPLAYED_HEADER] == "true"
+    assert replayed.json() == responses[0].json()
+
+    (mismatch,) = asyncio.run(_register(["retry-1"], {**FORM, "user_name": "max"}))
+    assert mismatch.status_code == 422
+
+    # a failed request releases its key
+    (duplicate_email,) = asyncio.run(_register(["retry-2"]))
+    assert duplicate_email.status_code == 409
+    with sessions() as session:
+        assert session.scalar(select(func.count()).select_from(User)) == 1
+        keys = session.scalars(select(IdempotencyKey.key)).all()
+    assert keys == ["register:retry-1"]
+
+
+def test_duplicates_across_workers(sessions) -> None:
+    first, second = _store(sessions), _store(sessions)
+    served = []
+
+    async def _run():
+        return await asyncio.gather(
+            _serve(first, sessions, "k", served),
+            _serve(second, sessions, "k", served),
+        )
+
+    responses = asyncio.run(_run())
+    assert served == ["k"]
+    assert [r.body for r in responses] == [b"created", b"created"]
+    # either worker may win the claim
+    assert sorted(REPLAYED_HEADER in r.headers for r in responses) == [False, True]
+
+
+def test_stale_keys_are_taken_over(sessions) -> None:
+    served = []
+    expired = _store(sessions, ttl=0)
+    asyncio.run(_serve(expired, sessions, "k", served))
+    expired.cache.clear()
+    asyncio.run(_serve(expired, sessions, "k", served))
+    assert served == ["k", "k"]
+
+    # the first worker died serving the key
+    abandoned = _store(sessions, lease=0)
+
+    async def _takeover():
+        attempt = await abandoned.claim("register:gone", "fingerprint")
+        taken = await _store(sessions, lease=0).claim("register:gone", "fingerprint")
+        async with ThreadedSession(sessions()) as session:
+            with pytest.raises(HTTPException) as e:
+                await attempt.complete(Response(b"late"), session)
+            assert e.value.status_code == 409
+            await taken.complete(Response(b"served"), session)
+
+    asyncio.run(_takeover())
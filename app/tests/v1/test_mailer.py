@@ -0,0 +1,74 @@
+import asyncio
+import time
+from email.message import EmailMessage
+
+from app.v1.mailer import MailClient, mail_config
+
+
+def _message(i: int) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = "WorthTrust <noreply@worthtrust.io>"
+    message["To"] = f"user{i}@worthtrust.io"
+    message["Subject"] = f"message {i}"
+    message.set_content("<p>Hi</p>", subtype="html")
+    return message
+
+
+def test_connections_are_reused(smtp_server) -> None:
+    client = MailClient(mail_config(), pool_size=2)
+
+    async def _run():
+        await client.send(_message(0))
+        await client.send(_message(1))
+        errors = await client.send_many([_message(i) for i in range(2, 6)])
+        await client.close()
+        return errors
+
+    assert asyncio.run(_run()) == [None] * 4
+    assert len(smtp_server.messages) == 6
+    assert smtp_server.connections == 1
+
+
+def test_idle_connections_expire(smtp_server) -> None:
+    client = MailClient(mail_config(), idle_timeout=0)
+
+    async def _run():
+        await client.send(_message(0))
+        await asyncio.sleep(0.01)
+        await client.send(_message(1))
+        await client.close()
+
+    asyncio.run(_run())
+    assert smtp_server.connections == 2
+
+
+def test_refused_messages_do_not_stop_the_batch(smtp_server) -> None:
+    client = MailClient(mail_config())
+
+    async def _run():
+        errors = await client.send_many([_message(0)])
+        smtp_server.fail = True
+        errors += await client.send_many([_message(1)])
+        smtp_server.fail = False
+        errors += await client.send_many([_message(2)])
+        await client.close()
+        return errors
+
+    ok, refused, ok_again = asyncio.run(_run())
+    assert ok is None and ok_again is None
+    assert refused.code == 451
+    assert smtp_server.connections == 1
+
+
+def test_connections_of_another_loop_are_closed(smtp_server) -> None:
+    client = MailClient(mail_config())
+    asyncio.run(client.send(_message(0)))
+    # a new loop can't reuse the connection, it is closed instead of leaked
+    asyncio.run(client.send(_message(1)))
+    for _ in range(100):
+        if smtp_server.disconnections:
+            break
+        time.sleep(0.01)
+    assert smtp_server.connections == 2
+    assert smtp_server.disconnections == 1
+    asyncio.run(client.close())
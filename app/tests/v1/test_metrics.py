@@ -0,0 +1,95 @@
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import _settings
+from app.core import settings
+from app.core.models.database import Company
+from app.v1.main import app
+from app.v1.middlware import (
+    Histogram,
+    db_queries,
+    request_duration,
+    responses_total,
+)
+
+
+def test_histogram_render() -> None:
+    histogram = Histogram("latency_seconds", "Latency.", (0.1, 1.0))
+    labels = (("route", '/a"b'),)
+    histogram.observe(0.05, labels)
+    histogram.observe(0.5, labels)
+    histogram.observe(5, labels)
+
+    assert histogram.render() == [
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/a\\"b",le="0.1"} 1',
+        'latency_seconds_bucket{route="/a\\"b",le="1.0"} 2',
+        'latency_seconds_bucket{route="/a\\"b",le="+Inf"} 3',
+        'latency_seconds_sum{route="/a\\"b"} 5.55',
+        'latency_seconds_count{route="/a\\"b"} 3',
+    ]
+
+
+@pytest.fixture
+def internal_headers(monkeypatch: pytest.MonkeyPatch) -> dict:
+    monkeypatch.setattr(_settings, "INTERNAL_TOKEN", "internal-secret")
+    return {"Authorization": "Bearer internal-secret"}
+
+
+def test_internal_endpoints_need_the_token(
+    internal_headers, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "_engines", {})
+    client = TestClient(app)
+    for path in ("/internal/metrics", "/internal/cache", "/internal/pool"):
+        assert client.get(path).status_code == 401
+        wrong = {"Authorization": "Bearer guess"}
+        assert client.get(path, headers=wrong).status_code == 401
+        assert client.get(path, headers=internal_headers).status_code == 200
+
+    # reporting the pools creates no engine
+    pools = client.get("/internal/pool", headers=internal_headers).json()
+    assert pools == {"sync": None, "async": None, "replicas": {"sync": [], "async": []}}
+    assert settings._engines == {}
+
+    monkeypatch.setattr(_settings, "INTERNAL_TOKEN", "")
+    assert client.get("/internal/metrics", headers=internal_headers).status_code == 404
+
+
+def test_request_metrics(api_client, sqlite_sessions, internal_headers) -> None:
+    with sqlite_sessions() as session:
+        company = Company(
+            name="WorthTrust",
+            location="MILAN",
+            linkedin_link="https://linkedin.com/company/worthtrust",
+        )
+        session.add(company)
+        session.commit()
+
+    route = (("method", "GET"), ("route", "/company/{guid}"))
+    unmatched = (("method", "GET"), ("route", "unmatched"))
+    before = request_duration.count(route)
+    queries = db_queries.count(route)
+    assert api_client.get(f"/company/{company.guid}").status_code == 200
+    assert api_client.get(f"/company/{uuid4()}").status_code == 404
+    assert api_client.get("/nowhere").status_code == 404
+    metrics = api_client.get("/internal/metrics", headers=internal_headers)
+
+    assert request_duration.count(route) == before + 2
+    assert responses_total.value(route + (("status", "200"),)) >= 1
+    assert responses_total.value(route + (("status", "404"),)) >= 1
+    assert responses_total.value(unmatched + (("status", "404"),)) >= 1
+    # Both lookups ran their `SELECT`, none was attributed to other routes.
+    assert db_queries.count(route) == queries + 2
+    assert db_queries._values[route][1][0] >= 2
+
+    assert metrics.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE http_request_duration_seconds histogram" in metrics.text
+    assert (
+        'http_request_duration_seconds_count{method="GET",route="/company/{guid}"}'
+        in metrics.text
+    )
+    assert "http_requests_in_flight 1" in metrics.text
@@ -0,0 +1,141 @@
+import asyncio
+from datetime import datetime
+from email import message_from_string
+from typing import Callable
+
+import pytest
+from sqlalchemy import select
+
+from app.core.models.database import EmailOutbox
+from app.core.settings import ThreadedSession
+from app.v1.mailer import MailClient, mail_config
+from app.v1.outbox import OutboxWorker
+
+
+@pytest.fixture
+def outbox_sessions(sqlite_sessions) -> Callable[[], ThreadedSession]:
+    return lambda: ThreadedSession(sqlite_sessions())
+
+
+def _queue(session_factory: Callable, n: int) -> None:
+    with session_factory().sync_session as session:
+        for i in range(n):
+            session.add(
+                EmailOutbox(
+                    recipient=f"user{i}@worthtrust.io",
+                    subject="WorthTrust email verification",
+                    template_name="verification",
+                    context={"url": f"http://test/verifyemail/{i}", "first_name": "JO"},
+                    created_at=datetime.now(),
+                    next_attempt_at=datetime.now(),
+                )
+            )
+        session.commit()
+
+
+def _messages(session_factory: Callable) -> list:
+    with session_factory().sync_session as session:
+        return session.scalars(select(EmailOutbox).order_by(EmailOutbox.id)).all()
+
+
+def test_drain_delivers_pending_messages(outbox_sessions, smtp_server) -> None:
+    _queue(outbox_sessions, 3)
+    worker = OutboxWorker(
+        session_factory=outbox_sessions,
+        client=MailClient(mail_config()),
+        batch_size=2,
+    )
+
+    assert asyncio.run(worker.drain_once()) == 2
+    assert asyncio.run(worker.drain_once()) == 1
+    assert asyncio.run(worker.drain_once()) == 0
+
+    assert [m.status for m in _messages(outbox_sessions)] == [EmailOutbox.SENT] * 3
+    assert [m["to"] for m in smtp_server.messages] == [
+        [f"<user{i}@worthtrust.io>"] for i in range(3)
+    ]
+    (html,) = [
+        part.get_payload(decode=True).decode()
+        for part in message_from_string(smtp_server.messages[0]["data"]).walk()
+        if part.get_content_type() == "text/html"
+    ]
+    assert 'href="http://test/verifyemail/0"' in html
+
+
+def test_failed_delivery_backs_off_then_dead_letters(
+    outbox_sessions, smtp_server
+) -> None:
+    _queue(outbox_sessions, 1)
+    smtp_server.fail = True
+    worker = OutboxWorker(
+        session_factory=outbox_sessions,
+        client=MailClient(mail_config()),
+        max_attempts=2,
+    )
+
+    assert asyncio.run(worker.drain_once()) == 1
+    (message,) = _messages(outbox_sessions)
+    assert message.status == EmailOutbox.PENDING
+    assert message.attempts == 1
+    assert message.next_attempt_at > datetime.now()
+    # not due yet
+    assert asyncio.run(worker.drain_once()) == 0
+
+    with outbox_sessions().sync_session as session:
+        session.get(EmailOutbox, message.id).next_attempt_at = datetime.now()
+        session.commit()
+    assert asyncio.run(worker.drain_once()) == 1
+    (message,) = _messages(outbox_sessions)
+    assert message.status == EmailOutbox.DEAD
+    assert message.attempts == 2
+    assert "451" in message.last_error
+    assert smtp_server.messages == []
+
+
+class DroppingClient:
+    """
+    Client losing its connection after the first message of each batch.
+    """
+
+    def __init__(self, on_send: Callable | None = None):
+        self.on_send = on_send
+        self.sent = []
+
+    async def send_many(self, messages: list) -> list:
+        if self.on_send is not None:
+            await self.on_send()
+        self.sent.append(messages[0]["To"])
+        return [None] + [ConnectionResetError()] * (len(messages) - 1)
+
+
+def test_messages_are_claimed_then_recorded_one_by_one(outbox_sessions) -> None:
+    _queue(outbox_sessions, 2)
+    idle = OutboxWorker(session_factory=outbox_sessions, client=DroppingClient())
+    claimed = []
+
+    async def _while_sending() -> None:
+        # the claim is committed: another worker finds nothing to send
+        claimed.extend(m.status for m in _messages(outbox_sessions))
+        claimed.append(await idle.drain_once())
+
+    client = DroppingClient(on_send=_while_sending)
+    worker = OutboxWorker(session_factory=outbox_sessions, client=client)
+    assert asyncio.run(worker.drain_once()) == 2
+    assert claimed == [EmailOutbox.SENDING, EmailOutbox.SENDING, 0]
+
+    # the message accepted before the connection dropped is not sent again
+    sent, failed = _messages(outbox_sessions)
+    assert (sent.status, failed.status) == (EmailOutbox.SENT, EmailOutbox.PENDING)
+    assert "ConnectionResetError" in failed.last_error
+    assert client.sent == ["user0@worthtrust.io"]
+
+
+def test_expired_leases_are_claimed_again(outbox_sessions) -> None:
+    _queue(outbox_sessions, 1)
+    # the worker died after claiming the message
+    asyncio.run(OutboxWorker(session_factory=outbox_sessions, lease=0).claim())
+    client = DroppingClient()
+    worker = OutboxWorker(session_factory=outbox_sessions, client=client)
+    assert asyncio.run(worker.drain_once()) == 1
+    (message,) = _messages(outbox_sessions)
+    assert (message.status, message.attempts) == (EmailOutbox.SENT, 2)
@@ -0,0 +1,91 @@
+import logging
+from typing import Dict
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+
+from app.core.models.database import Company
+from app.v1.middlware import QueryProfilerMiddleware
+from app.v1.profiler import QueryBudgetExceeded, install, normalize
+
+
+@pytest.fixture
+def companies(sqlite_sessions) -> list:
+    with sqlite_sessions() as session:
+        companies = [
+            Company(
+                name=f"Company {n}",
+                location="MILAN",
+                linkedin_link=f"https://linkedin.com/company/{n}",
+            )
+            for n in range(6)
+        ]
+        session.add_all(companies)
+        session.commit()
+    return [company.guid for company in companies]
+
+
+def test_normalize() -> None:
+    assert normalize("SELECT *\n  FROM t WHERE id IN (?, ?, ?)") == (
+        "SELECT * FROM t WHERE id IN (...)"
+    )
+    assert normalize("SELECT * FROM t WHERE id IN ($1, $2)") == (
+        "SELECT * FROM t WHERE id IN (...)"
+    )
+    assert normalize("SELECT * FROM t WHERE id = (?)") == (
+        "SELECT * FROM t WHERE id = (?)"
+    )
+
+
+def test_budget_flags_n_plus_one(sqlite_sessions, companies, query_budget) -> None:
+    with pytest.raises(QueryBudgetExceeded, match="likely N\\+1") as error:
+        with query_budget(10):
+            with sqlite_sessions() as session:
+                for guid in companies:
+                    session.get(Company, guid)
+    assert "6x SELECT" in str(error.value)
+
+    with query_budget(1) as profile:
+        with sqlite_sessions() as session:
+            session.scalars(select(Company).where(Company.guid.in_(companies))).all()
+    assert profile.count == 1
+
+
+def test_budget_exceeded(sqlite_sessions, companies, query_budget) -> None:
+    with pytest.raises(QueryBudgetExceeded, match="2 statements executed, budget is 1"):
+        with query_budget(1):
+            with sqlite_sessions() as session:
+                session.scalars(select(Company)).all()
+                session.scalars(select(Company.name)).all()
+
+
+def test_middleware_logs_per_request(
+    sqlite_sessions, companies, caplog: pytest.LogCaptureFixture
+) -> None:
+    def _lookups(n: int) -> int:
+        with sqlite_sessions() as session:
+            for guid in companies[:n]:
+                session.get(Company, guid)
+        return n
+
+    app = FastAPI()
+
+    @app.get("/lookups/{n}")
+    async def lookups(n: int) -> Dict[str, int]:
+        return {"lookups": await run_in_threadpool(_lookups, n)}
+
+    install()
+    app.add_middleware(QueryProfilerMiddleware)
+    client = TestClient(app)
+    with caplog.at_level(logging.WARNING, logger="app.v1.profiler"):
+        client.get("/lookups/2")
+        assert not caplog.records
+        client.get("/lookups/6")
+
+    (record,) = caplog.records
+    assert record.getMessage().startswith(
+        "GET /lookups/{n}: statement executed 6 times, likely N+1: SELECT"
+    )
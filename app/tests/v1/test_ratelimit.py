@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+from fastapi import Request
+from fastapi.testclient import TestClient
+
+from app.config import _settings
+from app.core.settings import ThreadedSession
+from app.v1 import dependencies, ratelimit
+from app.v1.main import app
+from app.v1.ratelimit import SlidingWindowLimiter, TokenBucketLimiter
+
+
+class Clock:
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_token_bucket() -> None:
+    clock = Clock()
+    limiter = TokenBucketLimiter(limit=2, window=10, timer=clock)
+
+    async def _hits(key: str, n: int):
+        return [await limiter.hit(key) for _ in range(n)]
+
+    assert asyncio.run(_hits("a", 3)) == [0, 0, 5.0]
+    assert asyncio.run(_hits("b", 1)) == [0]
+    clock.now = 5
+    assert asyncio.run(_hits("a", 2)) == [0, 5.0]
+
+
+def test_sliding_window_shared_through_the_database(sqlite_sessions) -> None:
+    clock = Clock(100.0)
+
+    def _factory():
+        return ThreadedSession(sqlite_sessions())
+
+    # two workers sharing the table
+    workers = [
+        SlidingWindowLimiter(limit=3, window=10, session_factory=_factory, timer=clock)
+        for _ in range(2)
+    ]
+
+    async def _hits():
+        return [await workers[i % 2].hit("ip:1.2.3.4") for i in range(4)]
+
+    assert asyncio.run(_hits())[:3] == [0, 0, 0]
+    # checks do not count
+    assert asyncio.run(workers[0].check("ip:5.6.7.8")) == 0
+    assert asyncio.run(workers[1].check("ip:5.6.7.8")) == 0
+    assert asyncio.run(workers[0].check("ip:1.2.3.4")) > 0
+    clock.now = 115.0
+    # the previous window still weighs half: 4 * 0.5 + 1 <= 3
+    assert asyncio.run(workers[0].hit("ip:1.2.3.4")) == 0
+    assert asyncio.run(workers[1].hit("ip:1.2.3.4")) > 0
+    clock.now = 200.0
+    assert asyncio.run(workers[1].hit("ip:1.2.3.4")) == 0
+
+
+@pytest.fixture
+def strict_limits(monkeypatch: pytest.MonkeyPatch):
+    for name in ("ip", "username", "register"):
+        monkeypatch.setitem(
+            ratelimit.limiters, name, TokenBucketLimiter(limit=1, window=60)
+        )
+
+
+def test_rejected_before_hashing(strict_limits, monkeypatch) -> None:
+    async def _fail(*args):
+        raise AssertionError("hashed a rejected request")
+
+    monkeypatch.setattr("app.v1.hashing.hasher.verify", _fail)
+    monkeypatch.setattr("app.v1.hashing.hasher.hash", _fail)
+    client = TestClient(app)
+
+    # failed logins from any IP lock the username
+    asyncio.run(ratelimit.count_failed_login("JODOE"))
+    response = client.post("/token", data={"username": "JODOE", "password": "pw"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "60"
+
+    asyncio.run(ratelimit.limiters["register"].hit("register:testclient"))
+    response = client.post(
+        "/register",
+        json={
+            "user_name": "jo",
+            "user_surname": "doe",
+            "user_email": "jo@worthtrust.io",
+            "user_psw": "s3cret",
+        },
+    )
+    assert response.status_code == 429
+
+
+def test_only_failed_logins_count(strict_limits, api_client, monkeypatch) -> None:
+    outcomes = []
+
+    async def _authenticate(session, username: str, password: str):
+        outcomes.append(password)
+        return False
+
+    monkeypatch.setattr(dependencies, "authenticate_user", _authenticate)
+    monkeypatch.setitem(
+        ratelimit.limiters, "ip", TokenBucketLimiter(limit=10, window=60)
+    )
+    # checking the username does not spend its token...
+    assert asyncio.run(ratelimit.limiters["username"].check("username:JO")) == 0
+    response = api_client.post("/token", data={"username": "JO", "password": "wrong"})
+    assert response.status_code == 401
+    # ...the failure does, and locks it out from any IP
+    response = api_client.post("/token", data={"username": "JO", "password": "pw"})
+    assert response.status_code == 429
+    assert outcomes == ["wrong"]
+    # the other usernames are not affected
+    response = api_client.post("/token", data={"username": "AL", "password": "wrong"})
+    assert response.status_code == 401
+
+
+@pytest.mark.parametrize(
+    "peer, forwarded, client",
+    [
+        # direct clients cannot forge their address
+        ("203.0.113.7", "198.51.100.1", "203.0.113.7"),
+        # behind the proxy, the hop it appended
+        ("172.28.0.2", "198.51.100.1", "198.51.100.1"),
+        ("172.28.0.2", "10.9.9.9, 198.51.100.1", "198.51.100.1"),
+        # chained trusted proxies are skipped
+        ("172.28.0.2", "198.51.100.1, 172.28.0.3", "198.51.100.1"),
+        ("172.28.0.2", "", "172.28.0.2"),
+    ],
+)
+def test_client_ip(peer, forwarded, client, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(_settings, "TRUSTED_PROXIES", ["172.28.0.0/16"])
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    request = Request({"type": "http", "client": (peer, 1234), "headers": headers})
+    assert ratelimit._client_ip(request) == client
@@ -0,0 +1,120 @@
+from typing import Iterator, Tuple
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.config import _settings
+from app.core import settings
+from app.core.settings import Base, get_session, get_threaded_db, pick_replica
+from app.tests.builders import make_user
+from app.v1.dependencies import create_access_token
+from app.v1.cache import user_cache
+from app.v1.main import app
+from app.v1.replicas import PIN_COOKIE
+
+
+class FakePool:
+    def __init__(self, checked_out: int):
+        self.checked_out = checked_out
+
+    def checkedout(self) -> int:
+        return self.checked_out
+
+
+class FakeEngine:
+    def __init__(self, checked_out: int):
+        self.pool = FakePool(checked_out)
+
+
+def test_pick_replica() -> None:
+    assert pick_replica([]) is None
+
+    idle, busy = FakeEngine(0), FakeEngine(3)
+    assert {pick_replica([busy, idle]) for _ in range(4)} == {idle}
+
+    first, second = FakeEngine(1), FakeEngine(1)
+    picked = [pick_replica([first, second]) for _ in range(4)]
+    assert picked.count(first) == picked.count(second) == 2
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def databases(
+    request: pytest.FixtureRequest, tmp_path, monkeypatch: pytest.MonkeyPatch
+) -> Iterator[Tuple[str, str]]:
+    if request.param == "postgresql":
+        # two servers: writes on the primary never reach the stand-in replica
+        yield (
+            request.getfixturevalue("postgres_url"),
+            request.getfixturevalue("postgres_replica_url"),
+        )
+        return
+    urls = (
+        f"sqlite:///{tmp_path / 'primary.db'}",
+        f"sqlite:///{tmp_path / 'replica.db'}",
+    )
+    for url in urls:
+        engine = create_engine(url)
+        Base.metadata.create_all(engine)
+        engine.dispose()
+    # the sync driver, as with `DB_ASYNC` disabled
+    monkeypatch.setattr(_settings, "DB_ASYNC", False)
+    app.dependency_overrides[get_session] = get_threaded_db
+    yield urls
+    app.dependency_overrides.clear()
+
+
+def test_read_replica_routing(databases, monkeypatch: pytest.MonkeyPatch) -> None:
+    primary, replica = databases
+    guid = uuid4()
+    username = f"JO{guid.hex[:8].upper()}"
+    for url, name in ((primary, "PRIMARY"), (replica, "REPLICA")):
+        engine = create_engine(url)
+        with Session(engine) as session:
+            session.add(make_user(username, guid=guid, name=name))
+            session.commit()
+        engine.dispose()
+
+    monkeypatch.setattr(_settings, "DB_URI", primary)
+    monkeypatch.setattr(_settings, "DB_REPLICA_URIS", [replica])
+    monkeypatch.setattr(_settings, "USER_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "_engines", {})
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': username})}"}
+
+    with TestClient(app) as client:
+        assert client.get("/user", headers=headers).json()["name"] == "REPLICA"
+
+        created = client.post(
+            "/company",
+            headers=headers,
+            json={
+                "company_name": "WorthTrust",
+                "company_location": "MILAN",
+                "company_linkedin_link": f"https://linkedin.com/company/{guid}",
+            },
+        )
+        assert created.status_code == 201
+        assert PIN_COOKIE in created.cookies
+        company = created.json()["company_guid"]
+
+        # pinned to the primary: the client reads its own writes
+        assert client.get("/user", headers=headers).json()["name"] == "PRIMARY"
+        assert client.get(f"/company/{company}").status_code == 200
+        # endpoints not marked read-only always use the primary
+        assert client.get("/verifyemail/unknown").status_code == 401
+
+        client.cookies.clear()
+        assert client.get("/user", headers=headers).json()["name"] == "REPLICA"
+        assert client.get(f"/company/{company}").status_code == 404
+
+    # rows read on a replica may predate an invalidation: read-only requests
+    # fill the cache from the primary, then serve the user from it
+    monkeypatch.setattr(_settings, "USER_CACHE_ENABLED", True)
+    user_cache.clear()
+    client = TestClient(app)
+    assert client.get("/user", headers=headers).json()["name"] == "PRIMARY"
+    assert user_cache.get(username)["name"] == "PRIMARY"
+    assert client.get("/user", headers=headers).json()["name"] == "PRIMARY"
+    user_cache.clear()
@@ -0,0 +1,38 @@
+import json
+from uuid import uuid4
+
+from fastapi.encoders import jsonable_encoder
+
+from app.core.datamodels.application import UserApplication
+from app.core.datamodels.useraccess import UserMe
+from app.core.models.database import Application, Company
+from app.tests.builders import make_user
+from app.v1.main import app
+from app.v1.responses import orm_dict, orm_response
+
+
+def _same_as_response_model(obj, model) -> None:
+    expected = jsonable_encoder(model.from_orm(obj))
+    assert json.loads(orm_response(obj, model).body) == expected
+    assert list(orm_dict(obj, model)) == list(expected)
+
+
+def test_fast_path_matches_response_model() -> None:
+    user = make_user(guid=uuid4())
+    _same_as_response_model(user, UserMe)
+
+    company = Company(
+        guid=uuid4(), name="WorthTrust", location="MILAN", linkedin_link="link"
+    )
+    application = Application(
+        company=company,
+        n_process_steps=4,
+        n_steps_performed=2,
+        joboffer_location="MILAN",
+        hired=None,
+    )
+    _same_as_response_model(application, UserApplication)
+
+
+def test_orjson_is_the_default_response_class() -> None:
+    assert app.router.default_response_class.__name__ == "ORJSONResponse"
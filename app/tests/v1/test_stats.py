@@ -0,0 +1,179 @@
+import asyncio
+import random
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.models.database import (
+    Application,
+    Company,
+    CompanyLocationStats,
+    CompanyStats,
+)
+from app.core.settings import ThreadedSession
+from app.tests.builders import make_user
+from app.v1 import stats
+
+LOCATIONS = ["MILAN", "ROME", "REMOTE"]
+
+
+def _stored(session):
+    companies = {
+        row.company_guid: (
+            row.applicants,
+            row.hired,
+            row.total_process_steps,
+            row.total_steps_performed,
+        )
+        for row in session.scalars(select(CompanyStats))
+        if row.applicants
+    }
+    locations = {
+        (row.company_guid, row.joboffer_location): row.applicants
+        for row in session.scalars(select(CompanyLocationStats))
+        if row.applicants
+    }
+    return companies, locations
+
+
+def _aggregated(session):
+    companies = {
+        guid: tuple(totals)
+        for guid, *totals in session.execute(stats.company_aggregate())
+    }
+    locations = {
+        (guid, location): count
+        for guid, location, count in session.execute(stats.location_aggregate())
+    }
+    return companies, locations
+
+
+def _seed(session):
+    users = [make_user(f"JODOE{i}") for i in range(8)]
+    companies = [
+        Company(
+            name=f"Company {i}",
+            location="MILAN",
+            linkedin_link=f"https://linkedin.com/company/{i}",
+        )
+        for i in range(3)
+    ]
+    session.add_all(users + companies)
+    session.commit()
+    return [u.guid for u in users], [c.guid for c in companies]
+
+
+def test_stats_match_full_aggregate(sqlite_sessions) -> None:
+    rng = random.Random(14)
+    with sqlite_sessions() as session:
+        users, companies = _seed(session)
+
+    for _ in range(40):
+        with sqlite_sessions() as session:
+            existing = list(session.scalars(select(Application)))
+            for _ in range(rng.randint(1, 4)):
+                action = rng.random()
+                if action < 0.5 or not existing:
+                    user, company = rng.choice(users), rng.choice(companies)
+                    if session.get(Application, (user, company)) is None:
+                        steps = rng.randint(1, 6)
+                        session.add(
+                            Application(
+                                user_guid=user,
+                                company_guid=company,
+                                n_process_steps=steps,
+                                n_steps_performed=rng.randint(0, steps),
+                                joboffer_location=rng.choice(LOCATIONS),
+                                hired=rng.choice([True, False, None]),
+                            )
+                        )
+                        session.flush()
+                elif action < 0.85:
+                    application = rng.choice(existing)
+                    application.hired = rng.choice([True, False])
+                    application.n_steps_performed = rng.randint(
+                        0, application.n_process_steps
+                    )
+                    application.joboffer_location = rng.choice(LOCATIONS)
+                    session.flush()
+                else:
+                    application = existing.pop(rng.randrange(len(existing)))
+                    session.delete(application)
+                    session.flush()
+            if rng.random() < 0.2:
+                session.rollback()
+            else:
+                session.commit()
+
+    with sqlite_sessions() as session:
+        aggregated = _aggregated(session)
+        assert aggregated[0]
+        assert _stored(session) == aggregated
+
+        # drift the stats, then rebuild them
+        session.execute(delete(CompanyStats))
+        session.commit()
+
+    async def _rebuild():
+        async with ThreadedSession(sqlite_sessions()) as session:
+            await stats.rebuild(session)
+
+    asyncio.run(_rebuild())
+    with sqlite_sessions() as session:
+        assert _stored(session) == aggregated
+
+
+def test_stats_of_expired_applications(sqlite_engine) -> None:
+    # the default sessions expire every instance on commit
+    sessions = sessionmaker(bind=sqlite_engine)
+    with sessions() as session:
+        users, companies = _seed(session)
+        application = Application(
+            user_guid=users[0],
+            company_guid=companies[0],
+            n_process_steps=4,
+            n_steps_performed=1,
+            joboffer_location="MILAN",
+            hired=True,
+        )
+        session.add(application)
+        session.commit()
+
+        # old values not loaded before the update
+        application.hired = True
+        application.n_steps_performed = 2
+        application.joboffer_location = "ROME"
+        session.commit()
+        assert _stored(session) == _aggregated(session)
+        assert _stored(session)[0] == {companies[0]: (1, 1, 4, 2)}
+
+        session.delete(application)
+        session.commit()
+        assert _stored(session) == _aggregated(session) == ({}, {})
+
+
+def test_stats_endpoint(api_client, sqlite_sessions) -> None:
+    with sqlite_sessions() as session:
+        users, companies = _seed(session)
+        session.add_all(
+            Application(
+                user_guid=user,
+                company_guid=companies[0],
+                n_process_steps=4,
+                n_steps_performed=i % 2 * 2 + 1,
+                joboffer_location=LOCATIONS[i % 2],
+                hired=i == 0,
+            )
+            for i, user in enumerate(users[:4])
+        )
+        session.commit()
+
+    body = api_client.get(f"/company/{companies[0]}/stats").json()
+    assert body["applicants"] == 4 and body["hired"] == 1
+    assert body["hire_rate"] == 0.25
+    assert body["avg_steps_performed"] == 2.0
+    assert body["steps_completion_rate"] == 0.5
+    assert body["applicants_by_location"] == {"MILAN": 2, "ROME": 2}
+    assert api_client.get(f"/company/{companies[1]}/stats").json()["applicants"] == 0
+    missing = "00000000-0000-0000-0000-000000000000"
+    assert api_client.get(f"/company/{missing}/stats").status_code == 404
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import _settings
+from app.core.models.database import User
+from app.core.settings import ThreadedSession
+from app.tests.builders import make_user
+from app.v1 import dependencies, tokens
+from app.v1.dependencies import create_access_token
+from app.v1.hashing import pwd_context
+from app.v1.tokens import RevocationSet, token_claims
+
+PASSWORD = "secret-password"
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 1_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_revocation_set() -> None:
+    timer = FakeTimer()
+    revoked = RevocationSet(lifetime=60, timer=timer)
+    revoked.revoke("JODOE", 2, timer.now)
+    revoked.revoke("JODOE", 1, timer.now)
+
+    assert revoked.is_revoked("JODOE", 1)
+    assert not revoked.is_revoked("JODOE", 2)
+    assert not revoked.is_revoked("MAROSSI", 0)
+
+    timer.now += 61
+    revoked.prune()
+    assert len(revoked) == 0
+
+
+@pytest.fixture
+def client(api_client, sqlite_sessions, monkeypatch: pytest.MonkeyPatch) -> TestClient:
+    # `pg_notify` invalidations need PostgreSQL
+    monkeypatch.setattr(_settings, "USER_CACHE_ENABLED", False)
+    revoked = RevocationSet(lifetime=_settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+    monkeypatch.setattr(tokens, "revocations", revoked)
+    monkeypatch.setattr(dependencies, "revocations", revoked)
+    with sqlite_sessions() as session:
+        session.add(make_user(hashed_psw=pwd_context.hash(PASSWORD)))
+        session.commit()
+    return api_client
+
+
+def _login(client: TestClient) -> dict:
+    response = client.post("/token", data={"username": "JODOE", "password": PASSWORD})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_stateless_tokens(
+    client, sqlite_sessions, monkeypatch: pytest.MonkeyPatch, query_budget
+) -> None:
+    monkeypatch.setattr(_settings, "STATELESS_TOKENS", True)
+    asyncio.run(tokens.revocations.refresh(ThreadedSession(sqlite_sessions())))
+    headers = _login(client)
+
+    with query_budget(0):
+        response = client.get("/user", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["username"] == "JODOE"
+    assert "ETag" in response.headers
+
+    assert client.post("/logout", headers=headers).status_code == 202
+    # revoked on this worker as soon as committed...
+    assert client.get("/user", headers=headers).status_code == 401
+    # ...and on the others once they refresh
+    other = RevocationSet(lifetime=60)
+    asyncio.run(other.refresh(ThreadedSession(sqlite_sessions())))
+    assert other.is_revoked("JODOE", 0)
+    assert not other.is_revoked("JODOE", 1)
+
+    headers = _login(client)
+    assert client.get("/user", headers=headers).status_code == 200
+    assert client.delete("/user/disable", headers=headers).status_code == 202
+    assert client.get("/user", headers=headers).status_code == 401
+    with sqlite_sessions() as session:
+        user = session.query(User).filter_by(username="JODOE").one()
+        assert (user.disabled, user.token_version) == (True, 2)
+
+
+def test_database_tokens_honour_revocations(client) -> None:
+    headers = _login(client)
+    assert client.get("/user", headers=headers).status_code == 200
+    assert client.post("/logout", headers=headers).status_code == 202
+    assert client.get("/user", headers=headers).status_code == 401
+
+    # tokens issued before versioning carry no `ver` claim
+    legacy = create_access_token({"sub": "JODOE"})
+    response = client.get("/user", headers={"Authorization": f"Bearer {legacy}"})
+    assert response.status_code == 200
+
+    user = User(username="JODOE", token_version=1)
+    assert token_claims(user) == {"sub": "JODOE", "ver": 1}
@@ -0,0 +1,232 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
+
+import pytest
+from fastapi.exceptions import HTTPException
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.models.database import User
+from app.core.settings import Base, ThreadedSession
+from app.tests.builders import make_user
+from app.v1.utils import (
+    manage_transaction,
+    retry_reason,
+    savepoint,
+    transaction_exhausted,
+    transaction_retries,
+)
+
+
+class DriverError(Exception):
+    def __init__(self, message: str = "", sqlstate: str | None = None):
+        super().__init__(message)
+        self.sqlstate = sqlstate
+
+
+def _conflict() -> OperationalError:
+    return OperationalError("UPDATE users", {}, DriverError("conflict", "40001"))
+
+
+def test_retry_reason() -> None:
+    assert retry_reason(_conflict()) == "serialization_failure"
+    deadlock = DriverError("deadlock")
+    deadlock.pgcode = "40P01"
+    assert retry_reason(OperationalError("", {}, deadlock)) == "deadlock"
+    locked = OperationalError("", {}, DriverError("database is locked"))
+    assert retry_reason(locked) == "locked"
+    assert retry_reason(IntegrityError("", {}, DriverError("dup", "23505"))) is None
+    assert retry_reason(ValueError()) is None
+
+
+def test_async_retries(sqlite_sessions) -> None:
+    with sqlite_sessions() as session:
+        session.add(make_user("JODOE"))
+        session.commit()
+    failures = {"bump": 2, "give_up": 10}
+
+    async def bump(session: ThreadedSession, user: User, name: str) -> int:
+        user.token_version += 1
+        if failures[name]:
+            failures[name] -= 1
+            await session.flush()
+            raise _conflict()
+        return user.token_version
+
+    async def _run(handler, name: str) -> int:
+        session = ThreadedSession(sqlite_sessions())
+        user = await session.scalar(select(User).filter_by(username="JODOE"))
+        return await handler(session=session, user=user, name=name)
+
+    retried = manage_transaction(bump, base_delay=0.001)
+    labels = (("handler", "bump"), ("reason", "serialization_failure"))
+    before = transaction_retries.value(labels)
+    # the failed attempts are rolled back and the user reloaded
+    assert asyncio.run(_run(retried, "bump")) == 1
+    assert transaction_retries.value(labels) == before + 2
+
+    exhausted = manage_transaction(bump, retries=1, base_delay=0.001)
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(_run(exhausted, "give_up"))
+    assert e.value.status_code == 503
+    assert transaction_exhausted.value((("handler", "bump"),)) >= 1
+    with sqlite_sessions() as session:
+        assert session.scalar(select(User.token_version)) == 1
+
+
+def test_errors_are_not_retried(sqlite_sessions) -> None:
+    calls = []
+
+    @manage_transaction(base_delay=0.001)
+    def create(session: Session, username: str) -> None:
+        calls.append(username)
+        session.add(make_user(username))
+
+    create(session=sqlite_sessions(), username="JODOE")
+    with pytest.raises(HTTPException) as e:
+        create(session=sqlite_sessions(), username="JODOE")
+    assert e.value.status_code == 409
+    assert calls == ["JODOE", "JODOE"]
+
+
+def test_savepoint(sqlite_sessions) -> None:
+    @manage_transaction
+    async def create(session: ThreadedSession, usernames: list) -> list:
+        created = []
+        for username in usernames:
+            try:
+                async with savepoint(session):
+                    session.add(make_user(username))
+                    await session.flush()
+            except IntegrityError:
+                continue
+            created.append(username)
+        return created
+
+    usernames = ["JODOE", "JODOE", "MAROSSI"]
+    created = asyncio.run(
+        create(session=ThreadedSession(sqlite_sessions()), usernames=usernames)
+    )
+    assert created == ["JODOE", "MAROSSI"]
+    with sqlite_sessions() as session:
+        assert session.scalars(select(User.username)).all() == ["JODOE", "MAROSSI"]
+
+
+def test_locked_database_is_retried(tmp_path) -> None:
+    """
+    Without a busy timeout SQLite fails a write right away while another
+    connection holds the lock: the transaction runs again once it is gone.
+    """
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'locked.db'}", connect_args={"timeout": 0}
+    )
+    Base.metadata.create_all(engine)
+    sessions = sessionmaker(bind=engine)
+    with sessions() as session:
+        session.add(make_user("LOCKED"))
+        session.commit()
+    blocker = engine.connect()
+    blocker.exec_driver_sql("BEGIN IMMEDIATE")
+    attempts = []
+
+    @manage_transaction(base_delay=0.001)
+    def bump(session: Session) -> None:
+        attempts.append(len(attempts))
+        try:
+            session.execute(update(User).values(token_version=User.token_version + 1))
+        except OperationalError:
+            # the lock goes away before the retry
+            blocker.rollback()
+            raise
+
+    labels = (("handler", "bump"), ("reason", "locked"))
+    before = transaction_retries.value(labels)
+    bump(session=sessions())
+    assert attempts == [0, 1]
+    assert transaction_retries.value(labels) == before + 1
+    with sessions() as session:
+        assert session.scalar(select(User.token_version)) == 1
+    blocker.close()
+    engine.dispose()
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def database_url(request: pytest.FixtureRequest, tmp_path) -> Iterator[str]:
+    if request.param == "postgresql":
+        yield request.getfixturevalue("postgres_url")
+        return
+    url = f"sqlite:///{tmp_path / 'stress.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    yield url
+
+
+def test_concurrent_updates(database_url: str) -> None:
+    """
+    Workers bumping the same row at once: PostgreSQL fails the losers with
+    serialization failures, SQLite makes them wait for the lock. Every bump
+    must land exactly once.
+    """
+    sqlite = database_url.startswith("sqlite")
+    workers, bumps = 4, 10
+    # busy timeout: SQLite writers queue up for the lock
+    engine = create_engine(
+        database_url,
+        connect_args={"timeout": 5} if sqlite else {},
+        pool_size=workers,
+    )
+    sessions = sessionmaker(bind=engine)
+    with sessions() as session:
+        session.add(make_user("STRESS"))
+        session.commit()
+
+    barrier = threading.Barrier(workers)
+
+    # a transaction only fails when another bump commits, so the budget
+    # covers every bump that can get in first
+    @manage_transaction(
+        isolation_level=None if sqlite else "REPEATABLE READ",
+        retries=workers * bumps,
+        base_delay=0.001,
+        max_delay=0.01,
+    )
+    def bump(session: Session, rendezvous: list) -> None:
+        session.scalar(select(User.token_version).filter_by(username="STRESS"))
+        if rendezvous:
+            # the first round takes its snapshots before anyone updates
+            rendezvous.pop().wait(timeout=10)
+        session.execute(
+            update(User)
+            .where(User.username == "STRESS")
+            .values(token_version=User.token_version + 1)
+        )
+
+    labels = (("handler", "bump"), ("reason", "serialization_failure"))
+    before = transaction_retries.value(labels)
+    with ThreadPoolExecutor(workers) as pool:
+        futures = [
+            pool.submit(bump, session=sessions(), rendezvous=[barrier])
+            for _ in range(workers)
+        ]
+        for future in futures:
+            future.result()
+        futures = [
+            pool.submit(bump, session=sessions(), rendezvous=[])
+            for _ in range(workers * (bumps - 1))
+        ]
+        for future in futures:
+            future.result()
+
+    with sessions() as session:
+        version = session.scalar(
+            select(User.token_version).filter_by(username="STRESS")
+        )
+    engine.dispose()
+    assert version == workers * bumps
+    if not sqlite:
+        # all but one of the first round lost
+        assert transaction_retries.value(labels) >= before + workers - 1
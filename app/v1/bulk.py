@@ -0,0 +1,274 @@
+import codecs
+import csv
+import json
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Tuple
+from uuid import uuid4
+
+from fastapi import Request
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import _settings
+from ..core.datamodels.user import BaseUser
+from ..core.models.database import User
+from .corefuncs import generate_username
+from .dependencies import Email, create_access_token, token_digest
+from .hashing import hasher
+from .utils import dialect_insert
+
+CSV = "csv"
+JSONL = "jsonl"
+
+# Content types accepted by the import, and the format they carry
+IMPORT_FORMATS = {
+    "text/csv": CSV,
+    "application/jsonl": JSONL,
+    "application/x-ndjson": JSONL,
+}
+
+# Bind parameters asyncpg accepts per statement: a batch is inserted as one
+# multi-row `INSERT`, one parameter per column and row
+MAX_QUERY_PARAMETERS = 32767
+MAX_BATCH_SIZE = MAX_QUERY_PARAMETERS // len(User.__table__.columns)
+
+# Inserts of a batch whose rows clash on their generated username only
+USERNAME_ATTEMPTS = 5
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+class _LineFeed(deque):
+    # lines handed to a `csv.reader` as they stream in
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self:
+            raise StopIteration
+        return self.popleft()
+
+
+async def _csv_records(lines: AsyncIterator[str]) -> AsyncIterator[List[str]]:
+    # a quoted field may hold newlines: a record is complete once its quotes
+    # are balanced, then parsed by a single `csv.reader` over the stream
+    feed = _LineFeed()
+    reader = csv.reader(feed)
+    quotes = 0
+    async for line in lines:
+        if not quotes and not line.strip():
+            continue
+        feed.append(line + "\n")
+        quotes += line.count('"')
+        if quotes % 2 == 0:
+            quotes = 0
+            yield next(reader)
+    if feed:
+        yield next(reader)
+
+
+async def read_rows(
+    chunks: AsyncIterator[bytes], fmt: str
+) -> AsyncIterator[Tuple[int, Dict[str, Any] | str]]:
+    """
+    Parse an upload as it streams in, one record per line: CSV with a
+    header line, its quoted fields may span lines, or JSON Lines. Blank
+    lines are skipped.
+
+    Args:
+        :chunks (AsyncIterator[bytes]): Raw upload.
+        :fmt (str): `CSV` or `JSONL`.
+
+    Returns:
+        AsyncIterator[Tuple[int, Dict[str, Any] | str]]: Row number and
+        record, or the parsing error of the row.
+    """
+    number = 0
+    if fmt == CSV:
+        header = None
+        async for values in _csv_records(_lines(chunks)):
+            if header is None:
+                header = values
+                continue
+            number += 1
+            if len(values) != len(header):
+                yield number, f"Expected {len(header)} fields, got {len(values)}"
+            else:
+                yield number, dict(zip(header, values))
+        return
+    async for line in _lines(chunks):
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield number, f"Invalid JSON: {e}"
+            continue
+        yield number, record if isinstance(record, dict) else "Expected an object"
+
+
+def _with_username(row: Dict[str, Any]) -> Dict[str, Any]:
+    # a newly generated username, and the verification token naming it
+    username = generate_username()
+    access_token = create_access_token({"sub": username})
+    return {
+        **row,
+        "username": username,
+        "auth_x_token": access_token,
+        "auth_x_token_digest": token_digest(access_token),
+    }
+
+
+class UserImport:
+    """
+    Bulk registration of users, as one transaction per batch of rows.
+
+    Each batch hashes its passwords across the hasher process pool, then
+    inserts every valid row with a single `INSERT ... ON CONFLICT DO NOTHING
+    RETURNING`: rows whose `email` is taken, by existing users or within the
+    upload, are reported instead of aborting the batch. Rows clashing on
+    their generated `username` only are inserted again with a new one.
+    A verification email is queued for every imported user. Batches are
+    capped at `MAX_BATCH_SIZE` rows, the most a single `INSERT` can bind.
+    """
+
+    def __init__(
+        self,
+        session: AsyncSession,
+        request: Request,
+        batch_size: int = _settings.USER_IMPORT_BATCH_SIZE,
+    ):
+        self.session = session
+        self.request = request
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+        self.imported = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    def _error(self, row: int, error: str) -> None:
+        self.errors.append({"row": row, "error": error})
+
+    async def _insert(self, batch: List[Tuple[int, BaseUser]]) -> None:
+        hashed = await hasher.hash_many([user.hashed_psw for _, user in batch])
+        now = datetime.now()
+        pending = [
+            (
+                number,
+                _with_username(
+                    {
+                        "guid": uuid4(),
+                        "name": user.name.upper(),
+                        "surname": user.surname.upper(),
+                        "email": user.email,
+                        "hashed_psw": hashed_psw,
+                        "disabled": False,
+                        "updated_at": now,
+                        "created_at": now,
+                        "verified": False,
+                    }
+                ),
+            )
+            for (number, user), hashed_psw in zip(batch, hashed)
+        ]
+
+        insert = dialect_insert(self.session.bind.dialect.name)
+        imported = []
+        for _ in range(USERNAME_ATTEMPTS):
+            rows = [row for _, row in pending]
+            inserted = set(
+                await self.session.scalars(
+                    insert(User)
+                    .values(rows)
+                    .on_conflict_do_nothing()
+                    .returning(User.guid)
+                )
+            )
+            imported += [row for row in rows if row["guid"] in inserted]
+            rejected = [
+                (number, row) for number, row in pending if row["guid"] not in inserted
+            ]
+            if not rejected:
+                pending = []
+                break
+            taken = set(
+                await self.session.scalars(
+                    select(User.email).where(
+                        User.email.in_([row["email"] for _, row in rejected])
+                    )
+                )
+            )
+            pending = []
+            for number, row in rejected:
+                if row["email"] in taken:
+                    self._error(number, "Email already registered")
+                else:
+                    # only the generated username clashed: draw another one
+                    pending.append((number, _with_username(row)))
+            if not pending:
+                break
+        for number, _ in pending:
+            self._error(number, "Could not generate a unique username")
+
+        for row in imported:
+            Email(User(**row), self.request).queue_verification_code(self.session)
+        await self.session.commit()
+        self.imported += len(imported)
+
+    async def run(self, chunks: AsyncIterator[bytes], fmt: str) -> Dict[str, Any]:
+        """
+        Import the users of an upload.
+
+        Args:
+            :chunks (AsyncIterator[bytes]): Raw upload.
+            :fmt (str): `CSV` or `JSONL`.
+
+        Returns:
+            Dict[str, Any]: Imported count, per row errors and throughput.
+        """
+        start = time.perf_counter()
+        rows = 0
+        batch: List[Tuple[int, BaseUser]] = []
+        async for number, record in read_rows(chunks, fmt):
+            rows += 1
+            if isinstance(record, str):
+                self._error(number, record)
+                continue
+            try:
+                batch.append((number, BaseUser(**record)))
+            except ValidationError as e:
+                self._error(
+                    number,
+                    "; ".join(
+                        f"{'.'.join(map(str, error['loc']))}: {error['msg']}"
+                        for error in e.errors()
+                    ),
+                )
+                continue
+            if len(batch) >= self.batch_size:
+                await self._insert(batch)
+                batch = []
+        if batch:
+            await self._insert(batch)
+        elapsed = time.perf_counter() - start
+        return {
+            "rows": rows,
+            "imported": self.imported,
+            "failed": len(self.errors),
+            "errors": sorted(self.errors, key=lambda error: error["row"]),
+            "elapsed_seconds": elapsed,
+            "rows_per_second": rows / elapsed if elapsed else 0.0,
+        }
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Callable, Dict, Hashable
+
+import asyncpg
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+from ..config import _settings
+from ..core.models.database import User
+
+logger = logging.getLogger(__name__)
+
+USER_CACHE_CHANNEL = "user_cache"
+
+
+class TTLCache:
+    """
+    Bounded LRU mapping whose entries expire `ttl` seconds after being set.
+    """
+
+    def __init__(
+        self, maxsize: int, ttl: float, timer: Callable[[], float] = monotonic
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= self.timer():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (self.timer() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+# username -> column values of the `users` row
+user_cache = TTLCache(maxsize=_settings.USER_CACHE_SIZE, ttl=_settings.USER_CACHE_TTL)
+
+
+def cache_user(user: User) -> None:
+    if _settings.USER_CACHE_ENABLED:
+        user_cache.set(
+            user.username,
+            {
+                attr.key: getattr(user, attr.key)
+                for attr in User.__mapper__.column_attrs
+            },
+        )
+
+
+async def cached_user(session: AsyncSession, username: str) -> User | None:
+    """
+    Rebuild the cached `User`, attached to `session` without querying it:
+    changes made to it are flushed as for a loaded row.
+    """
+    if not _settings.USER_CACHE_ENABLED:
+        return None
+    values = user_cache.get(username)
+    if values is None:
+        return None
+    user = User(**values)
+    make_transient_to_detached(user)
+    return await session.merge(user, load=False)
+
+
+async def invalidate_user(session: AsyncSession, username: str) -> None:
+    """
+    Drop `username` from the cache of this process, and from the ones of the
+    other workers once the transaction of `session` commits.
+    """
+    user_cache.invalidate(username)
+    if _settings.USER_CACHE_ENABLED:
+        await session.execute(select(func.pg_notify(USER_CACHE_CHANNEL, username)))
+
+
+class UserCacheListener:
+    """
+    `LISTEN` for invalidations sent by any worker and evict them locally.
+
+    While the connection is down notifications are lost, so the cache is
+    cleared whenever it drops, then the listener reconnects.
+    """
+
+    def __init__(self, dsn: str = _settings.DB_URI, retry_delay: float = 5.0):
+        self.dsn = dsn
+        self.retry_delay = retry_delay
+
+    def _on_notification(self, connection, pid, channel: str, username: str) -> None:
+        user_cache.invalidate(username)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                connection = await asyncpg.connect(self.dsn)
+            except (OSError, asyncpg.PostgresError):
+                logger.exception("User cache listener could not connect")
+                await asyncio.sleep(self.retry_delay)
+                continue
+            closed = asyncio.get_running_loop().create_future()
+            connection.add_termination_listener(
+                lambda _: closed.done() or closed.set_result(None)
+            )
+            try:
+                await connection.add_listener(USER_CACHE_CHANNEL, self._on_notification)
+                await closed
+            finally:
+                user_cache.clear()
+                await connection.close()
+            logger.warning("User cache listener disconnected, reconnecting")
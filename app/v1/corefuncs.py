@@ -1,60 +1,226 @@
 import random
 import string
 from datetime import datetime
+from typing import List, Tuple
+from uuid import UUID
 
-from sqlalchemy.orm import Session
+from fastapi.exceptions import HTTPException
+from sqlalchemy import select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
 from starlette import status
 
-from ..core.datamodels.user import BaseUser, BaseUserUsername
-from ..core.models.database import User
-from .dependencies import create_access_token, pwd_context
+from ..core.datamodels.user import BaseCompany, BaseUser
+from ..core.models.database import Application, Company, User
+from .cache import invalidate_user
+from .dependencies import create_access_token, token_digest
+from .hashing import hasher
+from .tokens import revoke_tokens
+from .utils import decode_cursor, encode_cursor
 
 
-def create_new_user(user: BaseUser, session: Session) -> BaseUserUsername:
+def generate_username(
+    size: int = 10, chars: str = string.ascii_uppercase + string.digits
+) -> str:
+    return "".join(random.choice(chars) for _ in range(size))
+
+
+async def create_new_user(user: BaseUser, session: AsyncSession) -> User:
     """
     Insert new user into `users` table.
 
+    The ORM row is built straight from the validated form: the response is
+    serialized from it, without intermediate models.
+
     Args:
         user (BaseUser): User model body.
-        session (Session): SQLAlchemy transaction session.
+        session (AsyncSession): SQLAlchemy transaction session.
 
     Returns:
         User: new user created.
     """
+    now = datetime.now()
+    username = generate_username()
+    access_token = create_access_token({"sub": username})
+    new_user = User(
+        name=user.name.upper(),
+        surname=user.surname.upper(),
+        email=user.email,
+        hashed_psw=await hasher.hash(user.hashed_psw),
+        disabled=False,
+        username=username,
+        auth_x_token=access_token,
+        auth_x_token_digest=token_digest(access_token),
+        updated_at=now,
+        created_at=now,
+        verified=False,
+    )
+    session.add(new_user)
+    await session.flush()
+    return new_user
+
+
+async def verify_user(access_token_digest: bytes, session: AsyncSession) -> str | None:
+    """
+    Mark as verified the unverified user owning the verification token,
+    with a single `UPDATE ... RETURNING` on the indexed token digest.
 
-    def _username_generator(
-        size: int = 10, chars: str = string.ascii_uppercase + string.digits
-    ) -> str:
-        return "".join(random.choice(chars) for _ in range(size))
+    Args:
+        :access_token_digest (bytes): Digest of the verification token.
+        :session (AsyncSession): SQLAlchemy transaction session.
 
-    user: BaseUserUsername = BaseUserUsername(
-        **dict(user),
-        username=_username_generator(),
-        updated_at=datetime.now(),
-        created_at=datetime.now(),
-        auth_x_token=None,
-        verified=False
+    Returns:
+        str | None: Username of the verified user, if any.
+    """
+    return await session.scalar(
+        update(User)
+        .where(
+            User.auth_x_token_digest == access_token_digest,
+            User.verified.is_(False),
+        )
+        .values(verified=True, updated_at=datetime.now())
+        .returning(User.username)
     )
-    user.name = user.name.upper()
-    user.surname = user.surname.upper()
-    user.hashed_psw = pwd_context.hash(user.hashed_psw)
-    access_token = create_access_token({"sub": user.username})
-    user.auth_x_token = access_token
-    session.add(User(**dict(user)))
-    session.flush()
-    return user
 
 
-def disable_user(user: User) -> status.HTTP_202_ACCEPTED:
+async def disable_user(user: User, session: AsyncSession) -> status.HTTP_202_ACCEPTED:
     """
     Disable user.
 
     Args:
         :user (User): Current active user to make inactive.
+        :session (AsyncSession): SQLAlchemy transaction session.
 
     Returns:
         status.HTTP_202_ACCEPTED: Accepted.
     """
     user.disabled = True
+    await revoke_tokens(user, session)
+    await invalidate_user(session, user.username)
     return status.HTTP_202_ACCEPTED
+
+
+async def logout_user(user: User, session: AsyncSession) -> status.HTTP_202_ACCEPTED:
+    """
+    Log `user` out of every session, revoking the access tokens issued so far.
+
+    Args:
+        :user (User): Current active user.
+        :session (AsyncSession): SQLAlchemy transaction session.
+
+    Returns:
+        status.HTTP_202_ACCEPTED: Accepted.
+    """
+    await revoke_tokens(user, session)
+    await invalidate_user(session, user.username)
     return status.HTTP_202_ACCEPTED
+
+
+async def create_company(company: BaseCompany, session: AsyncSession) -> Company:
+    """
+    Insert new company into `companies` table.
+
+    Args:
+        :company (BaseCompany): Company model body.
+        :session (AsyncSession): SQLAlchemy transaction session.
+
+    Returns:
+        Company: new company created.
+    """
+    new_company = Company(**company.dict(exclude={"guid"}))
+    session.add(new_company)
+    await session.flush()
+    return new_company
+
+
+def _like_pattern(text: str) -> str:
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+async def search_companies(
+    session: AsyncSession,
+    name: str | None = None,
+    location: str | None = None,
+    limit: int = 20,
+    cursor: str | None = None,
+) -> Tuple[List[Company], str | None]:
+    """
+    Page through companies ordered by `(name, guid)`, optionally
+    matching a substring of `name` and an exact `location`.
+
+    Pages are fetched by keyset: the cursor carries the sort key of the
+    previous page's last row, so deep pages cost as much as the first one.
+
+    Args:
+        :session (AsyncSession): SQLAlchemy transaction session.
+        :name (str | None): Case insensitive substring of the name.
+        :location (str | None): Location.
+        :limit (int): Page size.
+        :cursor (str | None): `next_cursor` of the previous page.
+
+    Returns:
+        Tuple[List[Company], str | None]: Page and cursor of the next one,
+        `None` on the last page.
+    """
+    query = select(Company).order_by(Company.name, Company.guid).limit(limit + 1)
+    if name:
+        query = query.where(Company.name.ilike(_like_pattern(name), escape="\\"))
+    if location:
+        query = query.where(Company.location == location)
+    if cursor:
+        try:
+            last_name, last_guid = decode_cursor(cursor)
+            last_guid = UUID(last_guid)
+        except (TypeError, ValueError):
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, "Invalid cursor")
+        query = query.where(
+            tuple_(Company.name, Company.guid) > tuple_(last_name, last_guid)
+        )
+    companies = list(await session.scalars(query))
+    if len(companies) <= limit:
+        return companies, None
+    last = companies[limit - 1]
+    return companies[:limit], encode_cursor([last.name, str(last.guid)])
+
+
+async def user_applications(
+    user_guid: UUID, session: AsyncSession
+) -> List[Application]:
+    """
+    Applications of a user, each with its company joined in the same query.
+
+    Args:
+        :user_guid (UUID): User guid.
+        :session (AsyncSession): SQLAlchemy transaction session.
+
+    Returns:
+        List[Application]: Applications with their `company` loaded.
+    """
+    applications = await session.scalars(
+        select(Application)
+        .where(Application.user_guid == user_guid)
+        .options(joinedload(Application.company))
+    )
+    return list(applications)
+
+
+async def company_applicants(
+    company_guid: UUID, session: AsyncSession
+) -> Company | None:
+    """
+    Company with its applications and their users, loaded in two queries
+    whatever the number of applicants.
+
+    Args:
+        :company_guid (UUID): Company guid.
+        :session (AsyncSession): SQLAlchemy transaction session.
+
+    Returns:
+        Company | None: Company with `applications` and their `user` loaded.
+    """
+    return await session.get(
+        Company,
+        company_guid,
+        options=[selectinload(Company.applications).joinedload(Application.user)],
+    )
@@ -1,29 +1,38 @@
+import asyncio
+import hashlib
+import logging
 from datetime import datetime, timedelta
-from typing import Annotated
+from email.message import Message
+from email.mime.text import MIMEText
+from typing import Annotated, Any, Dict, List, Set
+from uuid import UUID
 
 from fastapi import Depends, Request
 from fastapi.exceptions import HTTPException
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from fastapi_mail import ConnectionConfig, FastMail, MessageSchema
-from jinja2 import Environment, PackageLoader, select_autoescape
-from jinja2.environment import Template
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from pydantic import EmailStr
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
 from ..config import _settings
 from ..core.datamodels.useraccess import Token, TokenData
-from ..core.models.database import User
-from ..core.settings import get_db
+from ..core.models.database import EmailOutbox, User
+from ..core.settings import ON_REPLICA, get_session, new_session
+from ..templates import templates
+from .cache import cache_user, cached_user, invalidate_user
+from .hashing import hasher
+from .mailer import mail_client
+from .ratelimit import count_failed_login
+from .tokens import revocations, token_claims, user_from_claims
+
+logger = logging.getLogger(__name__)
 
-env = Environment(
-    loader=PackageLoader("app", "templates"),
-    autoescape=select_autoescape(["html", "xml"]),
-)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# Password upgrades running after their login responded
+pending_rehashes: Set[asyncio.Task] = set()
 
 
 class Email:
@@ -40,58 +49,123 @@ class Email:
         self.request = request
         self.url = f"{self.request.base_url}verifyemail/{self.user.auth_x_token}"
 
+    @classmethod
+    def render_message(
+        cls,
+        recipients: List[EmailStr],
+        subject: str,
+        template_name: str,
+        context: Dict[str, Any],
+    ) -> Message:
+        # Generate the HTML from the precompiled template
+        html = templates[template_name].render(subject=subject, **context)
+
+        # Define the message options
+        message = MIMEText(html, "html", "utf-8")
+        message["From"] = cls._sender
+        message["To"] = ", ".join(recipients)
+        message["Subject"] = subject
+        return message
+
+    @classmethod
+    async def deliver(
+        cls,
+        recipients: List[EmailStr],
+        subject: str,
+        template_name: str,
+        context: Dict[str, Any],
+    ):
+        message = cls.render_message(recipients, subject, template_name, context)
+        # Send the email over a pooled connection
+        await mail_client.send(message)
+
     async def send_email(
         self,
         subject: str,
         template_name: str,
     ):
-        # Define the config
-        conf = ConnectionConfig(
-            MAIL_USERNAME=_settings.EMAIL_USERNAME,
-            MAIL_PASSWORD=_settings.EMAIL_PASSWORD,
-            MAIL_FROM=self._sender,
-            MAIL_PORT=_settings.EMAIL_PORT,
-            MAIL_SERVER=_settings.EMAIL_HOST,
-            MAIL_STARTTLS=False,
-            MAIL_SSL_TLS=False,
-            USE_CREDENTIALS=True,
-            VALIDATE_CERTS=True,
-        )
-        # Generate the HTML template base on the template name
-        template: Template = env.get_template(f"{template_name}.html")
-        html = template.render(url=self.url, first_name=self.user.name, subject=subject)
+        await self.deliver(self.email, subject, template_name, self.context)
 
-        # Define the message options
-        message = MessageSchema(
-            subject=subject, recipients=self.email, body=html, subtype="html"
+    def queue_email(
+        self,
+        session: AsyncSession,
+        subject: str,
+        template_name: str,
+    ) -> EmailOutbox:
+        """
+        Stage the email into the `email_outbox` table, within the transaction
+        of `session`: it is delivered by the outbox worker once committed.
+        """
+        message = EmailOutbox(
+            recipient=self.user.email,
+            subject=subject,
+            template_name=template_name,
+            context=self.context,
+            created_at=datetime.now(),
+            next_attempt_at=datetime.now(),
         )
+        session.add(message)
+        return message
 
-        # Send the email
-        fm = FastMail(conf)
-        await fm.send_message(message)
+    @property
+    def context(self) -> Dict[str, Any]:
+        return {"url": self.url, "first_name": self.user.name}
 
     async def send_verification_code(self):
         await self.send_email(self._MSG, "verification")
 
+    def queue_verification_code(self, session: AsyncSession) -> EmailOutbox:
+        return self.queue_email(session, self._MSG, "verification")
+
 
-def authenticate_user(
-    session: Session,
+async def authenticate_user(
+    session: AsyncSession,
     username: str,
     password: str,
 ) -> User:
-    user: User = get_user(session, username)
+    user: User = await get_user(session, username)
     if user is None:
         return False
-    if not pwd_context.verify(password, user.hashed_psw):
+    if not await hasher.verify(password, user.hashed_psw):
         return False
+    if hasher.needs_update(user.hashed_psw):
+        task = asyncio.create_task(
+            _rehash(user.guid, user.username, user.hashed_psw, password)
+        )
+        pending_rehashes.add(task)
+        task.add_done_callback(pending_rehashes.discard)
     return user
 
 
-def get_user(
-    session: Session,
+async def _rehash(
+    guid: UUID, username: str, hashed_password: str, password: str
+) -> None:
+    """
+    Store `password` hashed with the current scheme and rounds, unless the
+    password changed meanwhile, and evict the cached user holding the old
+    hash.
+    """
+    try:
+        rehashed = await hasher.hash(password)
+        async with new_session() as session:
+            result = await session.execute(
+                update(User)
+                .where(User.guid == guid, User.hashed_psw == hashed_password)
+                .values(hashed_psw=rehashed)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                await invalidate_user(session, username)
+            await session.commit()
+    except Exception:
+        logger.exception("Password of user %s could not be rehashed", guid)
+
+
+async def get_user(
+    session: AsyncSession,
     username: str,
 ) -> User | None:
-    user = session.query(User).filter(User.username == username).one_or_none()
+    user = await session.scalar(select(User).where(User.username == username))
     return user
 
 
@@ -111,9 +185,9 @@ def create_access_token(
     return encoded_jwt
 
 
-def get_current_user(
+async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
-    session: Session = Depends(get_db),
+    session: AsyncSession = Depends(get_session),
 ) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -130,13 +204,35 @@ def get_current_user(
         TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    user: User = get_user(session, username)
+    if _settings.STATELESS_TOKENS and revocations.ready:
+        # served from the claims, without a database round trip
+        user = user_from_claims(payload)
+        if user is not None:
+            if revocations.is_revoked(username, user.token_version):
+                raise credentials_exception
+            return await session.merge(user, load=False)
+    user: User = await cached_user(session, username)
     if user is None:
+        if session.info.get(ON_REPLICA) and _settings.USER_CACHE_ENABLED:
+            # a lagging replica may still hold a row invalidated on the
+            # primary: the cache is filled from the primary instead
+            async with new_session() as primary:
+                user = await get_user(primary, username)
+            if user is not None:
+                cache_user(user)
+                user = await session.merge(user, load=False)
+        else:
+            user = await get_user(session, username)
+            if user is not None:
+                cache_user(user)
+        if user is None:
+            raise credentials_exception
+    if payload.get("ver", user.token_version) != user.token_version:
         raise credentials_exception
     return user
 
 
-def get_current_active_user(
+async def get_current_active_user(
     current_user: Annotated[User, Depends(get_current_user)],
 ) -> User:
     if current_user.disabled:
@@ -144,25 +240,37 @@ def get_current_active_user(
     return current_user
 
 
-def verify_registered_user(
-    access_token: str,
-    session: Session = Depends(get_db),
-) -> str:
-    if session.query(User).filter(User.auth_x_token == access_token).count() == 0:
+async def get_current_admin_user(
+    current_user: Annotated[User, Depends(get_current_active_user)],
+) -> User:
+    if not current_user.is_admin:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not find existing user or user already verified",
-            headers={"WWW-Authenticate": "Bearer"},
+            status_code=status.HTTP_403_FORBIDDEN, detail="Not enough privileges"
         )
-    return access_token
+    return current_user
+
+
+def token_digest(token: str) -> bytes:
+    """
+    Fixed-size digest of a verification token, as stored and indexed
+    in `users.auth_x_token_digest`.
+    """
+    return hashlib.sha256(token.encode()).digest()
+
+
+async def verify_registered_user(
+    access_token: str,
+) -> bytes:
+    return token_digest(access_token)
 
 
-def login_for_access_token(
-    session: Session,
+async def login_for_access_token(
+    session: AsyncSession,
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
 ) -> Token:
-    user = authenticate_user(session, form_data.username, form_data.password)
+    user = await authenticate_user(session, form_data.username, form_data.password)
     if not user:
+        await count_failed_login(form_data.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -170,6 +278,6 @@ def login_for_access_token(
         )
     access_token_expires = timedelta(minutes=_settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data=token_claims(user), expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
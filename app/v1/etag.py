@@ -0,0 +1,39 @@
+import hashlib
+from typing import Any
+
+from fastapi import Request, Response
+from starlette import status
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Strong ETag of a representation, from values that change whenever it
+    does (e.g. a primary key and `updated_at` or a row version).
+
+    Returns:
+        str: Quoted entity tag.
+    """
+    digest = hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=12)
+    return f'"{digest.hexdigest()}"'
+
+
+def if_none_match(request: Request, etag: str) -> bool:
+    """
+    Whether the `If-None-Match` header of the request matches `etag`, with
+    the weak comparison RFC 9110 prescribes for it.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag for candidate in header.split(",")
+    )
+
+
+def not_modified(etag: str) -> Response:
+    """
+    `304 Not Modified`, no body is serialized.
+    """
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
@@ -0,0 +1,95 @@
+import csv
+import io
+from typing import AsyncIterator, Sequence
+
+import orjson
+from sqlalchemy import Select, String, cast, select
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import _settings
+from ..core.models.database import Application, Company, User
+
+NDJSON = "ndjson"
+CSV = "csv"
+
+MEDIA_TYPES = {NDJSON: "application/x-ndjson", CSV: "text/csv"}
+
+
+def applications_query() -> Select:
+    """
+    Flat `applications` join with the user and company of each row.
+    Guids are read as text: they are only written out, and parsing them
+    into `UUID` objects would dominate the export time.
+    """
+    return (
+        select(
+            cast(Application.user_guid, String).label("user_guid"),
+            User.username,
+            cast(Application.company_guid, String).label("company_guid"),
+            Company.name.label("company_name"),
+            Company.location.label("company_location"),
+            Application.joboffer_location,
+            Application.n_process_steps,
+            Application.n_steps_performed,
+            Application.hired,
+        )
+        .join(User, User.guid == Application.user_guid)
+        .join(Company, Company.guid == Application.company_guid)
+    )
+
+
+async def _partitions(
+    session: AsyncSession, query: Select, batch_size: int
+) -> AsyncIterator[Sequence[Row]]:
+    # `yield_per` fetches from a server-side cursor, `batch_size` rows at a time
+    result = await session.stream(query.execution_options(yield_per=batch_size))
+    try:
+        async for partition in result.partitions(batch_size):
+            yield partition
+    finally:
+        await result.close()
+
+
+async def export_rows(
+    session: AsyncSession,
+    fmt: str,
+    query: Select | None = None,
+    batch_size: int = _settings.EXPORT_BATCH_SIZE,
+) -> AsyncIterator[bytes]:
+    """
+    Encode the rows of `query` as they are fetched, one chunk per batch:
+    at most `batch_size` rows are held in memory whatever the result size.
+
+    Args:
+        :session (AsyncSession): SQLAlchemy transaction session.
+        :fmt (str): `NDJSON`, or `CSV` with a header line.
+        :query (Select | None): Exported query, the applications by default.
+        :batch_size (int): Rows per fetch and per chunk.
+
+    Returns:
+        AsyncIterator[bytes]: Encoded chunks.
+    """
+    query = applications_query() if query is None else query
+    columns = [column.name for column in query.selected_columns]
+    if fmt != CSV:
+        async for partition in _partitions(session, query, batch_size):
+            yield b"".join(
+                orjson.dumps(
+                    dict(zip(columns, row)),
+                    default=str,
+                    option=orjson.OPT_APPEND_NEWLINE,
+                )
+                for row in partition
+            )
+        return
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for partition in _partitions(session, query, batch_size):
+        writer.writerows(partition)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
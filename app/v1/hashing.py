@@ -0,0 +1,364 @@
+import argparse
+import asyncio
+import fcntl
+import json
+import logging
+import math
+import multiprocessing
+import statistics
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Callable, List, NamedTuple
+
+from fastapi.exceptions import HTTPException
+from passlib.context import CryptContext
+from passlib.registry import get_crypt_handler
+from starlette import status
+from starlette.concurrency import run_in_threadpool
+
+from ..config import _settings
+from .middlware import Gauge, registry
+
+logger = logging.getLogger(__name__)
+
+SCHEMES = ("bcrypt", "argon2")
+# Cheapest cost a calibration may pick, however slow the CPU
+MIN_ROUNDS = {"bcrypt": 10, "argon2": 2}
+
+hash_seconds = registry.register(
+    Gauge(
+        "password_hash_seconds",
+        "Time of a password hash measured by the calibration, per scheme and rounds.",
+    )
+)
+
+
+def make_context(scheme: str = "bcrypt", rounds: int | None = None) -> CryptContext:
+    """
+    Context hashing with `scheme` at `rounds`. Hashes of the other schemes,
+    or cheaper ones, still verify and are flagged by `needs_update`.
+
+    Args:
+        :scheme (str): `bcrypt` or `argon2`.
+        :rounds (int | None): bcrypt log rounds or argon2 time cost, the
+        passlib default when `None`.
+
+    Raises:
+        ValueError: Unknown scheme.
+        RuntimeError: The scheme backend is not installed.
+
+    Returns:
+        CryptContext: Password context.
+    """
+    if scheme not in SCHEMES:
+        raise ValueError(f"Unsupported password hash scheme {scheme!r}")
+    if not get_crypt_handler(scheme).has_backend():
+        raise RuntimeError(f"No backend installed for the {scheme} scheme")
+    legacy = [s for s in SCHEMES if s != scheme and get_crypt_handler(s).has_backend()]
+    options = {}
+    if rounds is not None:
+        options = {f"{scheme}__default_rounds": rounds, f"{scheme}__min_rounds": rounds}
+    return CryptContext(schemes=[scheme, *legacy], deprecated="auto", **options)
+
+
+pwd_context = make_context(_settings.HASH_SCHEME, _settings.HASH_ROUNDS)
+
+
+def _configure(scheme: str, rounds: int | None) -> None:
+    # also the initializer of the pool processes, which import the defaults
+    global pwd_context
+    pwd_context = make_context(scheme, rounds)
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _hash_many(passwords: List[str]) -> List[str]:
+    return [pwd_context.hash(password) for password in passwords]
+
+
+def _verify(password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Password hashing service.
+
+    `bcrypt` is CPU bound on purpose: running it inside an `async` handler
+    freezes the event loop for the whole hash cost. Hashes and verifications
+    are therefore submitted to a process pool, and at most `max_pending`
+    operations may be queued at once: further requests are rejected with
+    `503 Service Unavailable` instead of piling up behind the pool.
+
+    With `max_workers=0` the operations run inline on the calling thread,
+    which is only meant for tests and baseline benchmarks.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        max_pending: int,
+        scheme: str = "bcrypt",
+        rounds: int | None = None,
+    ):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.scheme = scheme
+        self.rounds = rounds
+        self._pending = 0
+        self._executor: Executor | None = None
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_configure,
+                initargs=(self.scheme, self.rounds),
+            )
+        return self._executor
+
+    async def _submit(self, fn: Callable, *args: Any) -> Any:
+        if self._pending >= self.max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Password hashing service is saturated, retry later",
+                headers={"Retry-After": "1"},
+            )
+        self._pending += 1
+        try:
+            if self.max_workers == 0:
+                return fn(*args)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, fn, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        """
+        Hash a plain password.
+
+        Args:
+            :password (str): Plain password.
+
+        Returns:
+            str: Hashed password.
+        """
+        return await self._submit(_hash, password)
+
+    async def hash_many(self, passwords: List[str]) -> List[str]:
+        """
+        Hash a batch of plain passwords, split in one chunk per worker so
+        that every core hashes in parallel. Each chunk counts as a single
+        pending operation.
+
+        Args:
+            :passwords (List[str]): Plain passwords.
+
+        Returns:
+            List[str]: Hashed passwords, in the same order.
+        """
+        if not passwords:
+            return []
+        size = -(-len(passwords) // max(self.max_workers, 1))
+        chunks = [passwords[i : i + size] for i in range(0, len(passwords), size)]
+        hashed = await asyncio.gather(
+            *(self._submit(_hash_many, chunk) for chunk in chunks)
+        )
+        return [password for chunk in hashed for password in chunk]
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """
+        Verify a plain password against its stored hash.
+
+        Args:
+            :password (str): Plain password.
+            :hashed_password (str): Stored hashed password.
+
+        Returns:
+            bool: Whether the password matches.
+        """
+        return await self._submit(_verify, password, hashed_password)
+
+    def needs_update(self, hashed_password: str) -> bool:
+        """
+        Whether a stored hash uses another scheme, or fewer rounds, than the
+        configured ones. Parses the hash only, without hashing.
+
+        Args:
+            :hashed_password (str): Stored hashed password.
+
+        Returns:
+            bool: Whether to rehash the password.
+        """
+        return pwd_context.needs_update(hashed_password)
+
+    def configure(self, scheme: str, rounds: int | None) -> None:
+        """
+        Hash with `scheme` at `rounds` from now on. The pool is replaced,
+        the operations already submitted complete on the old one.
+
+        Args:
+            :scheme (str): `bcrypt` or `argon2`.
+            :rounds (int | None): Cost, the passlib default when `None`.
+        """
+        _configure(scheme, rounds)
+        self.scheme = scheme
+        self.rounds = rounds
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+hasher = PasswordHasher(
+    max_workers=_settings.HASHER_WORKERS,
+    max_pending=_settings.HASHER_MAX_PENDING,
+    scheme=_settings.HASH_SCHEME,
+    rounds=_settings.HASH_ROUNDS,
+)
+
+
+class Calibration(NamedTuple):
+    scheme: str
+    rounds: int
+    seconds: float
+
+
+def _time_hash(scheme: str, rounds: int, samples: int) -> float:
+    handler = get_crypt_handler(scheme).using(rounds=rounds)
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        handler.hash("calibration")
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def calibrate(target: float, scheme: str = "bcrypt", samples: int = 3) -> Calibration:
+    """
+    Rounds of `scheme` for a hash to take about `target` seconds on this
+    CPU, never below `MIN_ROUNDS`. They are extrapolated from a cheap probe,
+    bcrypt doubling its time per round and argon2 growing linearly, then the
+    pick is timed.
+
+    Args:
+        :target (float): Target hash time, in seconds.
+        :scheme (str): `bcrypt` or `argon2`.
+        :samples (int): Hashes timed per measure, the median is kept.
+
+    Returns:
+        Calibration: Rounds picked and their measured hash time.
+    """
+    handler = get_crypt_handler(scheme)
+    if scheme == "bcrypt":
+        probe = MIN_ROUNDS[scheme] - 2
+        seconds = _time_hash(scheme, probe, samples)
+        rounds = probe + round(math.log2(target / seconds))
+    else:
+        probe = 1
+        seconds = _time_hash(scheme, probe, samples)
+        rounds = round(probe * target / seconds)
+    rounds = min(max(rounds, MIN_ROUNDS[scheme]), handler.max_rounds)
+    return Calibration(scheme, rounds, _time_hash(scheme, rounds, samples))
+
+
+def publish(calibration: Calibration) -> None:
+    hash_seconds.set(
+        calibration.seconds,
+        (("scheme", calibration.scheme), ("rounds", str(calibration.rounds))),
+    )
+    logger.info(
+        "Password hashes use %s at %d rounds: %.3fs",
+        calibration.scheme,
+        calibration.rounds,
+        calibration.seconds,
+    )
+
+
+def shared_calibration(
+    path: str, target: float, scheme: str = "bcrypt", refresh: bool = False
+) -> Calibration:
+    """
+    Calibration shared by the worker processes of this host through the
+    file at `path`: the first one to take its lock calibrates, the others
+    read the result it saved.
+
+    Args:
+        :path (str): Calibration file.
+        :target (float): Target hash time, in seconds.
+        :scheme (str): `bcrypt` or `argon2`.
+        :refresh (bool): Calibrate again even if a result was saved.
+
+    Returns:
+        Calibration: Rounds picked and their measured hash time.
+    """
+    with open(path, "a+") as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        file.seek(0)
+        try:
+            saved = json.loads(file.read())
+            calibration = Calibration(**saved["calibration"])
+        except (ValueError, KeyError, TypeError):
+            saved, calibration = {}, None
+        if refresh or saved.get("target") != target or calibration.scheme != scheme:
+            calibration = calibrate(target, scheme)
+            file.truncate(0)
+            json.dump({"target": target, "calibration": calibration._asdict()}, file)
+        return calibration
+
+
+async def calibrate_hasher() -> Calibration:
+    """
+    Calibrate `hasher` for `HASH_TARGET_SECONDS`, once for every worker
+    process (see `shared_calibration`), off the event loop, and publish the
+    measured hash time.
+
+    Returns:
+        Calibration: Rounds picked and their measured hash time.
+    """
+    calibration = await run_in_threadpool(
+        shared_calibration,
+        _settings.HASH_CALIBRATION_FILE,
+        _settings.HASH_TARGET_SECONDS,
+        _settings.HASH_SCHEME,
+    )
+    hasher.configure(calibration.scheme, calibration.rounds)
+    publish(calibration)
+    return calibration
+
+
+if __name__ == "__main__":
+    # Pick `HASH_ROUNDS` on the production hardware: `python -m app.v1.hashing`
+    parser = argparse.ArgumentParser(description="Calibrate the password hashes.")
+    parser.add_argument("--target", type=float, default=_settings.HASH_TARGET_SECONDS)
+    parser.add_argument("--scheme", choices=SCHEMES, default=_settings.HASH_SCHEME)
+    parser.add_argument("--samples", type=int, default=3)
+    parser.add_argument(
+        "--prestart",
+        action="store_true",
+        help="with HASH_CALIBRATE, calibrate for the workers about to start",
+    )
+    args = parser.parse_args()
+    if args.prestart:
+        if _settings.HASH_CALIBRATE:
+            calibration = shared_calibration(
+                _settings.HASH_CALIBRATION_FILE,
+                _settings.HASH_TARGET_SECONDS,
+                _settings.HASH_SCHEME,
+                refresh=True,
+            )
+            print(json.dumps(calibration._asdict()))
+    else:
+        print(json.dumps(calibrate(args.target, args.scheme, args.samples)._asdict()))
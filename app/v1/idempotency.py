@@ -0,0 +1,315 @@
+import asyncio
+import hashlib
+import logging
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Callable, Dict, NamedTuple
+
+from fastapi import Request, Response
+from fastapi.exceptions import HTTPException
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+from ..config import _settings
+from ..core.models.database import IdempotencyKey
+from ..core.settings import new_session
+from .cache import TTLCache
+from .utils import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+
+class StoredResponse(NamedTuple):
+    fingerprint: str
+    status_code: int
+    body: bytes
+    media_type: str | None
+
+    def replay(self, fingerprint: str) -> Response:
+        if fingerprint != self.fingerprint:
+            raise HTTPException(
+                status.HTTP_422_UNPROCESSABLE_ENTITY,
+                f"{IDEMPOTENCY_HEADER} already used for a different request",
+            )
+        return Response(
+            self.body,
+            self.status_code,
+            headers={REPLAYED_HEADER: "true"},
+            media_type=self.media_type,
+        )
+
+
+class IdempotentRequest:
+    """
+    Request served under an `Idempotency-Key`: `replay` holds the response
+    of the first request when this one is a duplicate, else the handler
+    serves it and records its response with `complete`.
+    """
+
+    def __init__(
+        self,
+        key: str | None = None,
+        fingerprint: str = "",
+        claimed_at: datetime | None = None,
+        replay: Response | None = None,
+    ):
+        self.key = key
+        self.fingerprint = fingerprint
+        self.claimed_at = claimed_at
+        self.replay = replay
+        self.stored: StoredResponse | None = None
+
+    async def complete(self, response: Response, session: AsyncSession) -> None:
+        """
+        Record `response` within the transaction of `session`: it is replayed
+        to the duplicates once committed, with the work it reports.
+
+        Args:
+            :response (Response): Response of the request.
+            :session (AsyncSession): SQLAlchemy transaction session.
+
+        Raises:
+            HTTPException: The key was taken over by another worker.
+        """
+        if self.key is None:
+            return
+        stored = StoredResponse(
+            self.fingerprint, response.status_code, response.body, response.media_type
+        )
+        result = await session.execute(
+            update(IdempotencyKey)
+            .where(
+                IdempotencyKey.key == self.key,
+                IdempotencyKey.status == IdempotencyKey.PENDING,
+                IdempotencyKey.created_at == self.claimed_at,
+            )
+            .values(
+                status=IdempotencyKey.DONE,
+                status_code=stored.status_code,
+                body=stored.body,
+                media_type=stored.media_type,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            raise HTTPException(
+                status.HTTP_409_CONFLICT,
+                f"{IDEMPOTENCY_HEADER} lease expired, retry later",
+            )
+        self.stored = stored
+
+
+class IdempotencyStore:
+    """
+    `Idempotency-Key` states, shared by every worker through the
+    `idempotency_keys` table and fronted by an in-memory cache of the
+    completed responses.
+
+    The first request claims the key with a single upsert, committed before
+    it is served. Duplicates replay its response once completed, waiting for
+    it up to `wait` seconds: on the same worker woken up when it settles,
+    else polling the table. A failed request releases the key, so that the
+    client can retry. Pending claims older than `lease` seconds, left by a
+    dead worker, and keys older than `ttl` seconds are taken over.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        lease: float,
+        wait: float,
+        cache_size: int,
+        session_factory: Callable[[], AsyncSession] = new_session,
+        poll: float = 0.05,
+        purge_interval: float = 60.0,
+    ):
+        self.ttl = ttl
+        self.lease = lease
+        self.wait = wait
+        self.session_factory = session_factory
+        self.poll = poll
+        self.purge_interval = purge_interval
+        self.cache = TTLCache(maxsize=cache_size, ttl=ttl)
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._purged_at = 0.0
+
+    async def _claim(
+        self, key: str, fingerprint: str
+    ) -> tuple[datetime | None, StoredResponse | None]:
+        # claim time when claimed, else the completed response if any
+        now = datetime.now()
+        values = {
+            "fingerprint": fingerprint,
+            "status": IdempotencyKey.PENDING,
+            "status_code": None,
+            "body": None,
+            "media_type": None,
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=self.ttl),
+        }
+        stored = None
+        async with self.session_factory() as session:
+            insert = dialect_insert(session.bind.dialect.name)
+            claimed = await session.scalar(
+                insert(IdempotencyKey)
+                .values(key=key, **values)
+                .on_conflict_do_update(
+                    index_elements=[IdempotencyKey.key],
+                    set_=values,
+                    where=or_(
+                        IdempotencyKey.expires_at <= now,
+                        and_(
+                            IdempotencyKey.status == IdempotencyKey.PENDING,
+                            IdempotencyKey.created_at
+                            <= now - timedelta(seconds=self.lease),
+                        ),
+                    ),
+                )
+                .returning(IdempotencyKey.key)
+            )
+            if claimed is None:
+                row = (
+                    await session.execute(
+                        select(
+                            IdempotencyKey.fingerprint,
+                            IdempotencyKey.status_code,
+                            IdempotencyKey.body,
+                            IdempotencyKey.media_type,
+                        ).where(
+                            IdempotencyKey.key == key,
+                            IdempotencyKey.status == IdempotencyKey.DONE,
+                        )
+                    )
+                ).first()
+                stored = None if row is None else StoredResponse(*row)
+            if time.time() - self._purged_at > self.purge_interval:
+                self._purged_at = time.time()
+                await session.execute(
+                    delete(IdempotencyKey).where(IdempotencyKey.expires_at < now)
+                )
+            await session.commit()
+        return (now if claimed is not None else None), stored
+
+    async def claim(self, key: str, fingerprint: str) -> IdempotentRequest:
+        """
+        Claim `key`, or wait for the request holding it.
+
+        Args:
+            :key (str): Idempotency key, scoped to the endpoint.
+            :fingerprint (str): Digest of the request body.
+
+        Raises:
+            HTTPException: The key is used for a different request, or the
+            first request is still in progress after `wait` seconds.
+
+        Returns:
+            IdempotentRequest: Claimed, or with the response to replay.
+        """
+        deadline = time.monotonic() + self.wait
+        while True:
+            stored = self.cache.get(key)
+            if stored is not None:
+                return IdempotentRequest(replay=stored.replay(fingerprint))
+            pending = self._pending.get(key)
+            if pending is None:
+                claimed_at, stored = await self._claim(key, fingerprint)
+                if claimed_at is not None:
+                    self._pending[key] = asyncio.get_running_loop().create_future()
+                    return IdempotentRequest(key, fingerprint, claimed_at)
+                if stored is not None:
+                    self.cache.set(key, stored)
+                    return IdempotentRequest(replay=stored.replay(fingerprint))
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise HTTPException(
+                    status.HTTP_409_CONFLICT,
+                    f"A request with this {IDEMPOTENCY_HEADER} is in progress",
+                    headers={"Retry-After": "1"},
+                )
+            if pending is not None:
+                await asyncio.wait({pending}, timeout=remaining)
+            else:
+                await asyncio.sleep(min(self.poll, remaining))
+
+    async def release(self, attempt: IdempotentRequest) -> None:
+        """
+        Forget the claim of a failed request, waking its duplicates up.
+        """
+        try:
+            async with self.session_factory() as session:
+                await session.execute(
+                    delete(IdempotencyKey).where(
+                        IdempotencyKey.key == attempt.key,
+                        IdempotencyKey.status == IdempotencyKey.PENDING,
+                        IdempotencyKey.created_at == attempt.claimed_at,
+                    )
+                )
+                await session.commit()
+        except Exception:
+            # taken over once the lease expires
+            logger.exception("Idempotency key %s could not be released", attempt.key)
+        finally:
+            self._settle(attempt.key)
+
+    def _settle(self, key: str) -> None:
+        pending = self._pending.pop(key, None)
+        if pending is not None and not pending.done():
+            pending.set_result(None)
+
+    @asynccontextmanager
+    async def request(
+        self, request: Request, scope: str
+    ) -> AsyncIterator[IdempotentRequest]:
+        """
+        Serve `request` at most once per `Idempotency-Key`. Without the header
+        the request is served as usual.
+
+        Args:
+            :request (Request): FastAPI Request class, its body already read.
+            :scope (str): Endpoint the keys belong to.
+
+        Raises:
+            HTTPException: Invalid key, see `claim`.
+
+        Returns:
+            IdempotentRequest: To `complete` before committing, unless it
+            holds a `replay`.
+        """
+        header = request.headers.get(IDEMPOTENCY_HEADER)
+        if header is None:
+            yield IdempotentRequest()
+            return
+        if not header or len(header) > MAX_KEY_LENGTH:
+            raise HTTPException(
+                status.HTTP_400_BAD_REQUEST,
+                f"{IDEMPOTENCY_HEADER} must be 1 to {MAX_KEY_LENGTH} characters",
+            )
+        fingerprint = hashlib.sha256(await request.body()).hexdigest()
+        attempt = await self.claim(f"{scope}:{header}", fingerprint)
+        if attempt.replay is not None:
+            yield attempt
+            return
+        try:
+            yield attempt
+        except BaseException:
+            await self.release(attempt)
+            raise
+        if attempt.stored is None:
+            await self.release(attempt)
+            return
+        self.cache.set(attempt.key, attempt.stored)
+        self._settle(attempt.key)
+
+
+idempotency_keys = IdempotencyStore(
+    ttl=_settings.IDEMPOTENCY_KEY_TTL,
+    lease=_settings.IDEMPOTENCY_LEASE,
+    wait=_settings.IDEMPOTENCY_WAIT,
+    cache_size=_settings.IDEMPOTENCY_CACHE_SIZE,
+)
@@ -0,0 +1,190 @@
+import asyncio
+import socket
+from collections import deque
+from contextlib import asynccontextmanager
+from email.message import Message
+from time import monotonic
+from typing import AsyncIterator, Deque, List, Tuple
+
+from aiosmtplib import SMTP, SMTPException, SMTPResponseException
+from fastapi_mail import ConnectionConfig
+
+from ..config import _settings
+
+
+def mail_config() -> ConnectionConfig:
+    return ConnectionConfig(
+        MAIL_USERNAME=_settings.EMAIL_USERNAME,
+        MAIL_PASSWORD=_settings.EMAIL_PASSWORD,
+        MAIL_FROM=_settings.EMAIL_FROM,
+        MAIL_FROM_NAME="WorthTrust",
+        MAIL_PORT=_settings.EMAIL_PORT,
+        MAIL_SERVER=_settings.EMAIL_HOST,
+        MAIL_STARTTLS=False,
+        MAIL_SSL_TLS=False,
+        USE_CREDENTIALS=True,
+        VALIDATE_CERTS=True,
+    )
+
+
+class MailClient:
+    """
+    Process-wide SMTP client.
+
+    Authenticated connections are kept in a small LIFO pool and reused across
+    sends instead of paying a TCP connect and an SMTP login per email.
+    Connections idle for longer than `idle_timeout` are closed, and the ones
+    idle for longer than `health_check_interval` are probed with `NOOP` before
+    being handed out again.
+
+    Connections belong to the event loop that opened them: the pool is reset
+    whenever it is used from a different loop.
+    """
+
+    def __init__(
+        self,
+        config: ConnectionConfig | None = None,
+        pool_size: int = _settings.MAIL_POOL_SIZE,
+        idle_timeout: float = _settings.MAIL_IDLE_TIMEOUT,
+        health_check_interval: float = _settings.MAIL_HEALTH_CHECK_INTERVAL,
+    ):
+        self._config = config
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self._idle: Deque[Tuple[SMTP, float]] = deque()
+        self._slots: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def config(self) -> ConnectionConfig:
+        if self._config is None:
+            self._config = mail_config()
+        return self._config
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    async def _connect(self) -> SMTP:
+        smtp = SMTP(
+            hostname=self.config.MAIL_SERVER,
+            port=self.config.MAIL_PORT,
+            use_tls=self.config.MAIL_SSL_TLS,
+            start_tls=self.config.MAIL_STARTTLS,
+            validate_certs=self.config.VALIDATE_CERTS,
+            timeout=self.config.TIMEOUT,
+        )
+        await smtp.connect()
+        if self.config.USE_CREDENTIALS:
+            await smtp.login(self.config.MAIL_USERNAME, self.config.MAIL_PASSWORD)
+        return smtp
+
+    @staticmethod
+    async def _close(smtp: SMTP) -> None:
+        try:
+            await smtp.quit()
+        except (SMTPException, OSError):
+            smtp.close()
+
+    @staticmethod
+    def _abort(smtp: SMTP) -> None:
+        # closed from outside of the loop that opened it, without `QUIT`
+        transport = smtp.transport
+        try:
+            smtp.close()
+        except RuntimeError:
+            # that loop is closed already and can't close the socket for us:
+            # end the connection, the descriptor goes with the transport
+            try:
+                transport.get_extra_info("socket").shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _bind_loop(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            while self._idle:
+                smtp, _ = self._idle.pop()
+                self._abort(smtp)
+            self._slots = asyncio.Semaphore(self.pool_size)
+            self._loop = loop
+        return self._slots
+
+    async def _acquire(self) -> SMTP:
+        while self._idle:
+            smtp, last_used = self._idle.pop()
+            idle_for = monotonic() - last_used
+            if idle_for > self.idle_timeout or not smtp.is_connected:
+                await self._close(smtp)
+                continue
+            if idle_for > self.health_check_interval:
+                try:
+                    await smtp.noop()
+                except SMTPException:
+                    smtp.close()
+                    continue
+            return smtp
+        return await self._connect()
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[SMTP]:
+        """
+        Borrow a pooled connection, opening one if none is idle.
+        A connection that raised while borrowed is dropped.
+        """
+        async with self._bind_loop():
+            smtp = await self._acquire()
+            try:
+                yield smtp
+            except BaseException:
+                smtp.close()
+                raise
+            self._idle.append((smtp, monotonic()))
+
+    async def send(self, message: Message) -> None:
+        """
+        Send one message over a pooled connection.
+        """
+        (error,) = await self.send_many([message])
+        if error is not None:
+            raise error
+
+    async def send_many(
+        self, messages: List[Message]
+    ) -> List[SMTPResponseException | None]:
+        """
+        Send several messages back to back over a single pooled connection.
+
+        A message refused by the server does not stop the batch: its error is
+        returned at the same position, `None` meaning delivered. A connection
+        failure fails the message being sent and the following ones, the ones
+        sent before it stay delivered.
+
+        Returns:
+            List[Exception | None]: Per message delivery error.
+        """
+        errors: List[Exception | None] = []
+        try:
+            async with self.connection() as smtp:
+                for message in messages:
+                    try:
+                        await smtp.send_message(message)
+                    except SMTPResponseException as e:
+                        errors.append(e)
+                        await smtp.rset()
+                    else:
+                        errors.append(None)
+        except (SMTPException, OSError) as e:
+            errors += [e] * (len(messages) - len(errors))
+        return errors
+
+    async def close(self) -> None:
+        # the connections of another loop are aborted, the others quit
+        self._bind_loop()
+        while self._idle:
+            smtp, _ = self._idle.pop()
+            await self._close(smtp)
+
+
+mail_client = MailClient()
@@ -1,19 +1,84 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+
+from ..config import _settings
+from ..core.settings import dispose_engines, init_engines
+from .cache import UserCacheListener
+from .hashing import calibrate_hasher, hasher
+from .mailer import mail_client
+from . import profiler
+from .middlware import (
+    MetricsMiddleware,
+    QueryProfilerMiddleware,
+    ReadYourWritesMiddleware,
+    instrument_engines,
+)
+from .outbox import OutboxWorker
+from .routers import application, internal, user
+from .routers.company import company
+from .tokens import RevocationRefresher
 
-from ..core.models import database
-from ..core.settings import engine
-from .routers import user
 
-database.Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Create the database engines and start the background services of the
+    APIs, then stop them on shutdown. The schema is managed by Alembic
+    (`alembic upgrade head`), as a separate deployment step.
+    Mounted apps do not run their own lifespan: the root app must reuse it.
+    """
+    init_engines()
+    if _settings.HASH_CALIBRATE:
+        await calibrate_hasher()
+    tasks = []
+    if _settings.OUTBOX_WORKER_ENABLED:
+        tasks.append(asyncio.create_task(OutboxWorker().run()))
+    if _settings.USER_CACHE_ENABLED:
+        tasks.append(asyncio.create_task(UserCacheListener().run()))
+    if _settings.STATELESS_TOKENS:
+        tasks.append(asyncio.create_task(RevocationRefresher().run()))
+    yield
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await mail_client.close()
+    hasher.shutdown()
+    await dispose_engines()
 
 
 app = FastAPI(
     title="Worth Trust APIs",
     description="Worth Trust",
     version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
+app.add_middleware(ReadYourWritesMiddleware)
+if _settings.METRICS_ENABLED:
+    instrument_engines()
+    app.add_middleware(MetricsMiddleware)
+if _settings.QUERY_PROFILER_ENABLED:
+    profiler.install()
+    app.add_middleware(QueryProfilerMiddleware)
+
 app.include_router(
     user.router,
     tags=["User"],
 )
+app.include_router(
+    company.router,
+    tags=["Company"],
+)
+app.include_router(
+    application.router,
+    tags=["Application"],
+)
+app.include_router(
+    internal.router,
+    tags=["Internal"],
+)
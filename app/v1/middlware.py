@@ -0,0 +1,343 @@
+import math
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..config import _settings
+from ..core.settings import replica_reads
+from .profiler import QueryProfile, current_profile
+from .replicas import PIN_COOKIE, SAFE_METHODS
+
+# Upper bounds, in seconds, of the latency histograms buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Label of the requests not matching any route, keeping the series bounded.
+UNMATCHED = "unmatched"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._lock = Lock()
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels: Labels = ()) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format(labels)} {_number(value)}" for labels, value in values
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels: Labels = (), amount: float = 1) -> None:
+        self.inc(labels, -amount)
+
+    def set(self, value: float, labels: Labels = ()) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    """
+    Cumulative histogram: one counter per upper bound, plus `_sum` and
+    `_count`, per label set.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Tuple[float, ...]):
+        super().__init__(name, documentation)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._values: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = ([0] * len(self.buckets), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def count(self, labels: Labels = ()) -> int:
+        entry = self._values.get(labels)
+        return sum(entry[0]) if entry else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = [(k, list(c), s[0]) for k, (c, s) in self._values.items()]
+        lines = self.header()
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = (("le", _number(bound)),)
+                lines.append(f"{self.name}_bucket{_format(labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format(labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_format(labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> Any:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """
+        Metrics in the Prometheus text exposition format (version 0.0.4).
+        """
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+requests_in_flight = registry.register(
+    Gauge("http_requests_in_flight", "Requests being served.")
+)
+request_duration = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Time to serve a request, per route.",
+        LATENCY_BUCKETS,
+    )
+)
+responses_total = registry.register(
+    Counter("http_responses_total", "Responses sent, per route and status code.")
+)
+db_queries = registry.register(
+    Histogram(
+        "http_request_db_queries",
+        "SQL statements executed while serving a request, per route.",
+        QUERY_BUCKETS,
+    )
+)
+db_duration = registry.register(
+    Histogram(
+        "http_request_db_duration_seconds",
+        "Time spent executing SQL statements while serving a request, per route.",
+        LATENCY_BUCKETS,
+    )
+)
+db_queries_total = registry.register(
+    Counter("db_queries_total", "SQL statements executed by this worker.")
+)
+db_duration_total = registry.register(
+    Counter(
+        "db_query_duration_seconds_total",
+        "Time spent executing SQL statements by this worker.",
+    )
+)
+
+
+class RequestQueries:
+    """
+    SQL statements executed on behalf of the current request.
+    """
+
+    __slots__ = ("count", "duration")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+# Copied into the threads and greenlets running the queries of a request,
+# all sharing the same `RequestQueries`.
+current_queries: ContextVar[RequestQueries | None] = ContextVar(
+    "current_queries", default=None
+)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, many):
+    context._metrics_start = perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, many):
+    elapsed = perf_counter() - context._metrics_start
+    db_queries_total.inc()
+    db_duration_total.inc(amount=elapsed)
+    queries = current_queries.get()
+    if queries is not None:
+        queries.count += 1
+        queries.duration += elapsed
+
+
+def instrument_engines() -> None:
+    """
+    Time every statement of every engine, the sync engines behind the async
+    ones included. Idempotent.
+    """
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class MetricsMiddleware:
+    """
+    Record latency, status code, number of SQL statements and database time
+    of each HTTP request, labelled with the path template of the route that
+    served it (`/company/{guid}`), and the requests in flight.
+
+    Plain ASGI middleware: responses are passed through untouched, streaming
+    ones included, and their duration runs until the last body chunk is sent.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        queries = RequestQueries()
+        token = current_queries.set(queries)
+        requests_in_flight.inc()
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = perf_counter() - start
+            requests_in_flight.dec()
+            current_queries.reset(token)
+            route = scope.get("route")
+            labels = (
+                ("method", scope["method"]),
+                ("route", route.path if route is not None else UNMATCHED),
+            )
+            request_duration.observe(elapsed, labels)
+            responses_total.inc(labels + (("status", str(status)),))
+            db_queries.observe(queries.count, labels)
+            db_duration.observe(queries.duration, labels)
+
+
+class QueryProfilerMiddleware:
+    """
+    Development aid: profile the SQL statements of each HTTP request and log
+    the likely N+1 patterns and the slow statements, with the route.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = QueryProfile()
+        token = current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_profile.reset(token)
+            route = scope.get("route")
+            path = route.path if route is not None else scope["path"]
+            profile.log(f"{scope['method']} {path}")
+
+
+class ReadYourWritesMiddleware:
+    """
+    Pin to the primary, for `DB_REPLICA_PIN_SECONDS`, the clients whose
+    request may have written: a successful request with an unsafe method.
+    The pin is a cookie, honoured by every worker; until it expires the
+    `read_only` endpoints do not read from a replica, which may lag behind.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not _settings.DB_REPLICA_URIS:
+            await self.app(scope, receive, send)
+            return
+
+        pin = scope["method"] not in SAFE_METHODS
+
+        async def send_wrapper(message: Message) -> None:
+            if pin and message["type"] == "http.response.start":
+                if message["status"] < 400:
+                    max_age = math.ceil(_settings.DB_REPLICA_PIN_SECONDS)
+                    cookie = (
+                        f"{PIN_COOKIE}=1; Max-Age={max_age}; "
+                        "Path=/; HttpOnly; SameSite=Lax"
+                    )
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"set-cookie", cookie.encode("latin-1")),
+                    ]
+            await send(message)
+
+        # requests sharing a task (e.g. an in-process client) start unrouted
+        token = replica_reads.set(False)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            replica_reads.reset(token)
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import _settings
+from ..core.models.database import EmailOutbox
+from ..core.settings import new_session
+from .dependencies import Email
+from .mailer import MailClient, mail_client
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxWorker:
+    """
+    Deliver the emails staged in `email_outbox`.
+
+    Pending messages are claimed in batches with `FOR UPDATE SKIP LOCKED`,
+    so several workers (or app processes) can drain the table concurrently.
+    The claim is a short transaction marking them as sending for `lease`
+    seconds: the batch is then sent over a single pooled SMTP connection
+    without holding any lock or database connection, and the outcome of
+    each message is recorded once done. Messages of a worker that died
+    while sending are claimed again when their lease expires.
+
+    A failed delivery is retried with an exponential, jittered backoff and
+    dead-lettered once `max_attempts` is reached.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession] = new_session,
+        client: MailClient = mail_client,
+        batch_size: int = _settings.OUTBOX_BATCH_SIZE,
+        poll_interval: float = _settings.OUTBOX_POLL_INTERVAL,
+        max_attempts: int = _settings.OUTBOX_MAX_ATTEMPTS,
+        base_delay: float = _settings.OUTBOX_RETRY_BASE_DELAY,
+        max_delay: float = _settings.OUTBOX_RETRY_MAX_DELAY,
+        lease: float = _settings.OUTBOX_LEASE,
+    ):
+        self.session_factory = session_factory
+        self.client = client
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease = lease
+
+    def backoff(self, attempts: int) -> timedelta:
+        """
+        Delay before the next attempt, after `attempts` failed ones.
+        """
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return timedelta(seconds=delay * random.uniform(0.5, 1.5))
+
+    async def claim(self) -> List[EmailOutbox]:
+        """
+        Claim a batch of due messages, pending or whose lease expired.
+
+        Returns:
+            List[EmailOutbox]: Claimed messages, detached.
+        """
+        now = datetime.now()
+        async with self.session_factory() as session:
+            messages = (
+                await session.scalars(
+                    select(EmailOutbox)
+                    .where(
+                        EmailOutbox.status.in_(
+                            [EmailOutbox.PENDING, EmailOutbox.SENDING]
+                        ),
+                        EmailOutbox.next_attempt_at <= now,
+                    )
+                    .order_by(EmailOutbox.next_attempt_at)
+                    .limit(self.batch_size)
+                    .with_for_update(skip_locked=True)
+                )
+            ).all()
+            for message in messages:
+                message.status = EmailOutbox.SENDING
+                message.attempts += 1
+                message.next_attempt_at = now + timedelta(seconds=self.lease)
+            await session.commit()
+        return messages
+
+    async def record(
+        self, messages: List[EmailOutbox], errors: List[Exception | None]
+    ) -> None:
+        """
+        Record the delivery outcome of each claimed message.
+        """
+        now = datetime.now()
+        async with self.session_factory() as session:
+            for message, e in zip(messages, errors):
+                if e is None:
+                    values = {"status": EmailOutbox.SENT, "sent_at": now}
+                elif message.attempts >= self.max_attempts:
+                    values = {"status": EmailOutbox.DEAD, "last_error": repr(e)}
+                    logger.error("Email %s dead-lettered: %r", message.id, e)
+                else:
+                    values = {
+                        "status": EmailOutbox.PENDING,
+                        "last_error": repr(e),
+                        "next_attempt_at": now + self.backoff(message.attempts),
+                    }
+                await session.execute(
+                    update(EmailOutbox)
+                    .where(EmailOutbox.id == message.id)
+                    .values(**values)
+                    .execution_options(synchronize_session=False)
+                )
+            await session.commit()
+
+    async def drain_once(self) -> int:
+        """
+        Claim and deliver one batch of due messages.
+
+        Returns:
+            int: Number of messages processed, successfully or not.
+        """
+        messages = await self.claim()
+        if messages:
+            await self.record(messages, await self.deliver(messages))
+        return len(messages)
+
+    async def deliver(self, messages: List[EmailOutbox]) -> List[Exception | None]:
+        """
+        Render and send `messages`.
+
+        Returns:
+            List[Exception | None]: Per message delivery error.
+        """
+        errors: List[Exception | None] = [None] * len(messages)
+        rendered = []
+        for i, message in enumerate(messages):
+            try:
+                email = Email.render_message(
+                    [message.recipient],
+                    message.subject,
+                    message.template_name,
+                    message.context,
+                )
+            except Exception as e:
+                errors[i] = e
+            else:
+                rendered.append((i, email))
+        if rendered:
+            try:
+                sent = await self.client.send_many([m for _, m in rendered])
+            except Exception as e:
+                sent = [e] * len(rendered)
+            for (i, _), e in zip(rendered, sent):
+                errors[i] = e
+        return errors
+
+    async def run(self) -> None:
+        """
+        Drain the outbox until cancelled.
+        """
+        while True:
+            try:
+                processed = await self.drain_once()
+            except Exception:
+                logger.exception("Email outbox drain failed")
+                processed = 0
+            if processed < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+
+if __name__ == "__main__":
+    # Run the worker as a standalone process: `python -m app.v1.outbox`
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(OutboxWorker().run())
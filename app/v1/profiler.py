@@ -0,0 +1,184 @@
+import logging
+import re
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+from typing import Any, Dict, Iterator, List, Set
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from ..config import _settings
+
+logger = logging.getLogger(__name__)
+
+# Expanded `IN (...)` lists: same statement whatever the number of values.
+_IN_LIST = re.compile(r"\((?:\?|%\(\w+\)s|%s|\$\d+)(?:, (?:\?|%\(\w+\)s|%s|\$\d+))+\)")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(statement: str) -> str:
+    """
+    Pattern of a SQL statement: bound parameters are already placeholders,
+    whitespace and the length of expanded `IN` lists are made uniform.
+    """
+    return _IN_LIST.sub("(...)", _SPACES.sub(" ", statement).strip())
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryProfile:
+    """
+    SQL statements executed within a request or a block of code, grouped
+    by pattern with their durations.
+
+    Args:
+        :repeat_threshold (int): Executions of one pattern flagged as a
+            likely N+1.
+        :slow_threshold (float): Duration, in seconds, over which a statement
+            is flagged as slow.
+    """
+
+    def __init__(
+        self,
+        repeat_threshold: int = _settings.QUERY_PROFILER_REPEAT_THRESHOLD,
+        slow_threshold: float = _settings.QUERY_PROFILER_SLOW_THRESHOLD,
+    ):
+        self.repeat_threshold = repeat_threshold
+        self.slow_threshold = slow_threshold
+        self.statements: Dict[str, List[float]] = defaultdict(list)
+        self._lock = Lock()
+
+    def record(self, statement: str, elapsed: float) -> None:
+        pattern = normalize(statement)
+        with self._lock:
+            self.statements[pattern].append(elapsed)
+
+    @property
+    def count(self) -> int:
+        return sum(len(durations) for durations in self.statements.values())
+
+    @property
+    def duration(self) -> float:
+        return sum(sum(durations) for durations in self.statements.values())
+
+    def repeated(self) -> Dict[str, int]:
+        """
+        Patterns executed at least `repeat_threshold` times: usually a query
+        issued once per row of a previous one.
+        """
+        return {
+            pattern: len(durations)
+            for pattern, durations in self.statements.items()
+            if len(durations) >= self.repeat_threshold
+        }
+
+    def slow(self) -> Dict[str, float]:
+        """
+        Patterns with at least one execution over `slow_threshold`, with the
+        slowest duration.
+        """
+        return {
+            pattern: max(durations)
+            for pattern, durations in self.statements.items()
+            if max(durations) >= self.slow_threshold
+        }
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "queries": self.count,
+            "duration": self.duration,
+            "repeated": self.repeated(),
+            "slow": self.slow(),
+        }
+
+    def log(self, label: str) -> None:
+        for pattern, executions in self.repeated().items():
+            logger.warning(
+                "%s: statement executed %d times, likely N+1: %s",
+                label,
+                executions,
+                pattern,
+            )
+        for pattern, duration in self.slow().items():
+            logger.warning(
+                "%s: slow statement (%.1f ms): %s", label, duration * 1000, pattern
+            )
+
+
+# Profile of the request being served, see `QueryProfilerMiddleware`.
+current_profile: ContextVar[QueryProfile | None] = ContextVar(
+    "current_profile", default=None
+)
+# Profiles recording every statement of the process, see `profile_queries`.
+_active: Set[QueryProfile] = set()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, many):
+    context._profiler_start = perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, many):
+    elapsed = perf_counter() - context._profiler_start
+    profile = current_profile.get()
+    if profile is not None:
+        profile.record(statement, elapsed)
+    for profile in list(_active):
+        profile.record(statement, elapsed)
+
+
+def install() -> None:
+    """
+    Listen to the statements of every engine. Idempotent.
+    """
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def profile_queries(**thresholds: Any) -> Iterator[QueryProfile]:
+    """
+    Profile every statement executed by the process while the block runs,
+    from any thread: the app served by a `TestClient` included.
+    """
+    install()
+    profile = QueryProfile(**thresholds)
+    _active.add(profile)
+    try:
+        yield profile
+    finally:
+        _active.discard(profile)
+
+
+@contextmanager
+def query_budget(
+    max_queries: int, allow_repeated: bool = False, **thresholds: Any
+) -> Iterator[QueryProfile]:
+    """
+    Fail when the block executes more than `max_queries` statements, or, unless
+    `allow_repeated`, repeats one pattern `repeat_threshold` times.
+
+    Args:
+        :max_queries (int): Statements allowed.
+        :allow_repeated (bool): Do not fail on likely N+1 patterns.
+
+    Raises:
+        QueryBudgetExceeded: With the statements executed.
+    """
+    with profile_queries(**thresholds) as profile:
+        yield profile
+    repeated = {} if allow_repeated else profile.repeated()
+    if profile.count > max_queries or repeated:
+        statements = "\n".join(
+            f"  {len(durations)}x {pattern}"
+            for pattern, durations in profile.statements.items()
+        )
+        raise QueryBudgetExceeded(
+            f"{profile.count} statements executed, budget is {max_queries}"
+            f"{', likely N+1' if repeated else ''}:\n{statements}"
+        )
@@ -0,0 +1,252 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from ipaddress import IPv4Network, IPv6Network, ip_address, ip_network
+from typing import Annotated, Callable, Dict, List, Tuple
+
+from fastapi import Depends, Request
+from fastapi.exceptions import HTTPException
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+from ..config import _settings
+from ..core.models.database import RateLimitHit
+from ..core.settings import new_session
+from .utils import dialect_insert
+
+
+class TokenBucketLimiter:
+    """
+    In-process token buckets: each key may spend `limit` requests at once,
+    refilled at `limit` per `window` seconds. The least recently used keys
+    are dropped beyond `maxsize`, which only forgets nearly full buckets.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        window: float,
+        maxsize: int = 100_000,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        self.limit = limit
+        self.rate = limit / window
+        self.maxsize = maxsize
+        self.timer = timer
+        self._buckets: OrderedDict[str, Tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _tokens(self, key: str, now: float) -> float:
+        tokens, last = self._buckets.get(key, (self.limit, now))
+        return min(self.limit, tokens + (now - last) * self.rate)
+
+    async def hit(self, key: str) -> float:
+        """
+        Spend a token of `key`.
+
+        Returns:
+            float: `0` when allowed, else seconds until a token is available.
+        """
+        now = self.timer()
+        with self._lock:
+            tokens = self._tokens(key, now)
+            self._buckets.pop(key, None)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+    async def check(self, key: str) -> float:
+        """
+        Whether `key` has a token left, without spending it.
+
+        Returns:
+            float: `0` when allowed, else seconds until a token is available.
+        """
+        with self._lock:
+            tokens = self._tokens(key, self.timer())
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+
+class SlidingWindowLimiter:
+    """
+    Limiter shared by all the workers through the `rate_limit_hits` table:
+    at most `limit` requests per `window` seconds and key, estimated as the
+    hits of the current window plus the overlapping share of the previous
+    one. Counting is a single upsert, rejected requests count too.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        window: float,
+        session_factory: Callable[[], AsyncSession] = new_session,
+        timer: Callable[[], float] = time.time,
+    ):
+        self.limit = limit
+        self.window = window
+        self.session_factory = session_factory
+        self.timer = timer
+        self._purged_slot = 0
+
+    def _retry_after(self, previous: int, hits: int, elapsed: float) -> float:
+        # seconds until the estimate drops back to `limit`, without new hits
+        if hits < self.limit and previous:
+            share = 1 - (self.limit - hits) / previous
+            return max(0.0, self.window * share - elapsed)
+        return self.window - elapsed + self.window * (1 - self.limit / hits)
+
+    async def hit(self, key: str) -> float:
+        """
+        Count a request of `key`.
+
+        Returns:
+            float: `0` when allowed, else seconds to wait.
+        """
+        now = self.timer()
+        slot = int(now // self.window)
+        elapsed = now - slot * self.window
+        async with self.session_factory() as session:
+            previous = await session.scalar(
+                select(RateLimitHit.hits).where(
+                    RateLimitHit.key == key, RateLimitHit.slot == slot - 1
+                )
+            )
+            insert = dialect_insert(session.bind.dialect.name)
+            statement = insert(RateLimitHit).values(key=key, slot=slot, hits=1)
+            hits = await session.scalar(
+                statement.on_conflict_do_update(
+                    index_elements=[RateLimitHit.key, RateLimitHit.slot],
+                    set_={"hits": RateLimitHit.hits + 1},
+                ).returning(RateLimitHit.hits)
+            )
+            if self._purged_slot < slot:
+                # once per window and worker, drop the windows out of reach
+                self._purged_slot = slot
+                await session.execute(
+                    delete(RateLimitHit).where(RateLimitHit.slot < slot - 1)
+                )
+            await session.commit()
+        previous = previous or 0
+        if previous * (1 - elapsed / self.window) + hits <= self.limit:
+            return 0.0
+        return self._retry_after(previous, hits, elapsed)
+
+    async def check(self, key: str) -> float:
+        """
+        Whether another request of `key` is allowed, without counting it.
+
+        Returns:
+            float: `0` when allowed, else seconds to wait.
+        """
+        now = self.timer()
+        slot = int(now // self.window)
+        elapsed = now - slot * self.window
+        async with self.session_factory() as session:
+            counts = dict(
+                (
+                    await session.execute(
+                        select(RateLimitHit.slot, RateLimitHit.hits).where(
+                            RateLimitHit.key == key,
+                            RateLimitHit.slot.in_([slot - 1, slot]),
+                        )
+                    )
+                ).all()
+            )
+        previous, hits = counts.get(slot - 1, 0), counts.get(slot, 0)
+        if previous * (1 - elapsed / self.window) + hits + 1 <= self.limit:
+            return 0.0
+        return self._retry_after(previous, hits + 1, elapsed)
+
+
+def make_limiter(limit: int) -> TokenBucketLimiter | SlidingWindowLimiter:
+    if _settings.RATE_LIMIT_BACKEND == "database":
+        return SlidingWindowLimiter(limit, _settings.RATE_LIMIT_WINDOW)
+    return TokenBucketLimiter(limit, _settings.RATE_LIMIT_WINDOW)
+
+
+limiters: Dict[str, TokenBucketLimiter | SlidingWindowLimiter] = {
+    "ip": make_limiter(_settings.RATE_LIMIT_PER_IP),
+    "username": make_limiter(_settings.RATE_LIMIT_PER_USERNAME),
+    "register": make_limiter(_settings.RATE_LIMIT_REGISTER_PER_IP),
+}
+
+
+async def _enforce(limiter: str, key: str, count: bool = True) -> None:
+    bucket = limiters[limiter]
+    wait = await (bucket.hit if count else bucket.check)(f"{limiter}:{key}")
+    if wait:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, retry later",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+
+
+@lru_cache(maxsize=None)
+def _networks(proxies: Tuple[str, ...]) -> List[IPv4Network | IPv6Network]:
+    return [ip_network(proxy, strict=False) for proxy in proxies]
+
+
+def _trusted(host: str) -> bool:
+    try:
+        address = ip_address(host)
+    except ValueError:
+        return False
+    return any(address in net for net in _networks(tuple(_settings.TRUSTED_PROXIES)))
+
+
+def _client_ip(request: Request) -> str:
+    """
+    Address of the client. When the peer is a trusted proxy, the nearest
+    `X-Forwarded-For` hop that is not one: the hops further left may be
+    forged by the client.
+    """
+    host = request.client.host if request.client else "unknown"
+    if not _trusted(host):
+        return host
+    header = ",".join(request.headers.getlist("x-forwarded-for"))
+    for hop in reversed([hop.strip() for hop in header.split(",") if hop.strip()]):
+        if not _trusted(hop):
+            return hop
+        host = hop
+    return host
+
+
+async def limit_login(
+    request: Request,
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
+) -> None:
+    """
+    Rate limit `/token` by client IP, and by username once it failed too
+    many logins from any IP, before the password is verified. Only the
+    failures count against a username, see `count_failed_login`.
+    """
+    if _settings.RATE_LIMIT_ENABLED:
+        await _enforce("ip", _client_ip(request))
+        await _enforce("username", form_data.username, count=False)
+
+
+async def count_failed_login(username: str) -> None:
+    """
+    Count a wrong password against `username`.
+    """
+    if _settings.RATE_LIMIT_ENABLED:
+        await limiters["username"].hit(f"username:{username}")
+
+
+async def limit_register(request: Request) -> None:
+    """
+    Rate limit `/register` by client IP, before the password is hashed.
+    """
+    if _settings.RATE_LIMIT_ENABLED:
+        await _enforce("register", _client_ip(request))
@@ -0,0 +1,22 @@
+from fastapi import Request
+
+from ..config import _settings
+from ..core.settings import replica_reads
+
+# Set on the clients that wrote recently, to read their writes from the primary
+PIN_COOKIE = "db_pin"
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+async def read_only(request: Request) -> None:
+    """
+    Route dependency of the read-only endpoints: their sessions are opened on
+    a read replica, unless the client wrote within the last
+    `DB_REPLICA_PIN_SECONDS` and must read its own writes from the primary.
+    Listed before the session dependencies, it runs first.
+
+    Args:
+        :request (Request): FastAPI Request class.
+    """
+    if _settings.DB_REPLICA_URIS and PIN_COOKIE not in request.cookies:
+        replica_reads.set(True)
@@ -0,0 +1,79 @@
+from functools import lru_cache
+from typing import Any, Dict, List, Mapping, Tuple, Type
+
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from pydantic.fields import SHAPE_LIST, SHAPE_SINGLETON
+
+# (alias, attribute, nested model, is a list) per field
+_Fields = Tuple[Tuple[str, str, Type[BaseModel] | None, bool], ...]
+
+
+@lru_cache(maxsize=None)
+def _fields(model: Type[BaseModel]) -> _Fields:
+    fields = []
+    for field in model.__fields__.values():
+        nested = field.type_ if _is_model(field.type_) else None
+        if nested is not None and field.shape not in (SHAPE_SINGLETON, SHAPE_LIST):
+            raise TypeError(f"Unsupported field {model.__name__}.{field.name}")
+        fields.append((field.alias, field.name, nested, field.shape == SHAPE_LIST))
+    return tuple(fields)
+
+
+def _is_model(type_: Any) -> bool:
+    return isinstance(type_, type) and issubclass(type_, BaseModel)
+
+
+def orm_dict(obj: Any, model: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    Read the fields of `model` off a trusted object (e.g. an ORM row), keyed
+    by alias as `response_model` would, without validating them again.
+    Nested models and lists of models are followed.
+
+    Args:
+        :obj (Any): Object exposing the fields as attributes.
+        :model (Type[BaseModel]): Response model.
+
+    Returns:
+        Dict[str, Any]: orjson serializable payload.
+    """
+    payload = {}
+    for alias, name, nested, many in _fields(model):
+        value = getattr(obj, name)
+        if nested is not None and value is not None:
+            value = (
+                [orm_dict(item, nested) for item in value]
+                if many
+                else orm_dict(value, nested)
+            )
+        payload[alias] = value
+    return payload
+
+
+def orm_response(
+    content: Any,
+    model: Type[BaseModel],
+    status_code: int = 200,
+    headers: Mapping[str, str] | None = None,
+) -> ORJSONResponse:
+    """
+    Serialize trusted objects with orjson, skipping the `response_model`
+    round trip (model construction, validation, `jsonable_encoder`).
+    Returning a `Response` makes FastAPI send it as is, the route's
+    `response_model` still documents the payload.
+
+    Args:
+        :content (Any): Object, or list of objects, exposing the fields.
+        :model (Type[BaseModel]): Response model.
+        :status_code (int): Response status code.
+        :headers (Mapping[str, str] | None): Response headers.
+
+    Returns:
+        ORJSONResponse: Serialized response.
+    """
+    payload: Dict[str, Any] | List[Dict[str, Any]] = (
+        [orm_dict(item, model) for item in content]
+        if isinstance(content, list)
+        else orm_dict(content, model)
+    )
+    return ORJSONResponse(payload, status_code=status_code, headers=headers)
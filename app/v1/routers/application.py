@@ -0,0 +1,48 @@
+from typing import Annotated, Literal
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...core.models.database import User
+from ...core.settings import get_session
+from ..dependencies import get_current_admin_user
+from ..export import CSV, MEDIA_TYPES, NDJSON, export_rows
+from ..replicas import read_only
+
+router = APIRouter()
+
+
+@router.get(
+    "/applications/export",
+    response_class=StreamingResponse,
+    description="Export every `application` with its user and company, admins only.",
+    dependencies=[Depends(read_only)],
+)
+async def export_applications(
+    user: Annotated[User, Depends(get_current_admin_user)],
+    session: Annotated[AsyncSession, Depends(get_session)],
+    format: Literal[NDJSON, CSV] = NDJSON,
+) -> StreamingResponse:
+    """
+    Stream the applications join as NDJSON or CSV, straight from a
+    server-side cursor.
+
+    Args:
+        :user (Annotated[User, Depends): Active admin user.
+        :session (AsyncSession, optional): SQLAlchemy transaction session.
+        :format (Literal[NDJSON, CSV]): Export format.
+
+    Raises:
+        HTTPException: The user is not an admin.
+
+    Returns:
+        StreamingResponse: Exported rows.
+    """
+    return StreamingResponse(
+        export_rows(session, format),
+        media_type=MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="applications.{format}"'
+        },
+    )
@@ -0,0 +1,221 @@
+from typing import Annotated, List
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.exceptions import HTTPException
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+from ....core.datamodels.application import CompanyApplicant
+from ....core.datamodels.company import CompanyPage, CompanyStatsSchema
+from ....core.datamodels.user import BaseCompany, CompanySchema
+from ....core.models.database import Company, CompanyStats, User
+from ....core.settings import get_session
+from ... import corefuncs, stats
+from ...dependencies import get_current_active_user
+from ...etag import if_none_match, make_etag, not_modified
+from ...replicas import read_only
+from ...responses import orm_dict, orm_response
+from ...utils import manage_transaction
+
+router = APIRouter()
+
+
+@router.post(
+    "/company",
+    response_model=CompanySchema,
+    status_code=status.HTTP_201_CREATED,
+    description="Create new `company`.",
+)
+@manage_transaction
+async def create_company(
+    company_form: BaseCompany,
+    user: Annotated[User, Depends(get_current_active_user)],
+    session: Annotated[AsyncSession, Depends(get_session)],
+) -> CompanySchema:
+    """
+    Register a new `company`.
+
+    Args:
+        :company_form (BaseCompany): Company content form.
+        :user (Annotated[User, Depends): Active user.
+        :session (AsyncSession, optional): SQLAlchemy transaction session.
+
+    Returns:
+        CompanySchema: Company info.
+    """
+    company = await corefuncs.create_company(company_form, session)
+    return orm_response(company, CompanySchema, status_code=status.HTTP_201_CREATED)
+
+
+@router.get(
+    "/company/{guid}",
+    response_model=CompanySchema,
+    description="Get `company` info.",
+    dependencies=[Depends(read_only)],
+)
+async def get_company(
+    guid: UUID,
+    session: Annotated[AsyncSession, Depends(get_session)],
+    request: Request,
+) -> CompanySchema:
+    """
+    Returns company info, or `304 Not Modified` when the client's
+    `If-None-Match` holds the ETag of the current row version: then only
+    the version is read, not the row.
+
+    Args:
+        :guid (UUID): Company guid.
+        :session (AsyncSession, optional): SQLAlchemy transaction session.
+        :request (Request): FastAPI Request class.
+
+    Raises:
+        HTTPException: Unknown company.
+
+    Returns:
+        CompanySchema: Company info.
+    """
+    if request.headers.get("if-none-match"):
+        version = await session.scalar(
+            select(Company.version).where(Company.guid == guid)
+        )
+        etag = make_etag(guid, version)
+        if version is not None and if_none_match(request, etag):
+            return not_modified(etag)
+    company = await session.get(Company, guid)
+    if company is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Company not found"
+        )
+    return orm_response(
+        company,
+        CompanySchema,
+        headers={"ETag": make_etag(company.guid, company.version)},
+    )
+
+
+@router.get(
+    "/company/{guid}/applicants",
+    response_model=List[CompanyApplicant],
+    description="Get `company` applicants.",
+    dependencies=[Depends(read_only)],
+)
+async def get_company_applicants(
+    guid: UUID,
+    user: Annotated[User, Depends(get_current_active_user)],
+    session: Annotated[AsyncSession, Depends(get_session)],
+) -> List[CompanyApplicant]:
+    """
+    Returns the applications to a company, with the applicants' usernames:
+    their personal data is not shown to the other users.
+
+    Args:
+        :guid (UUID): Company guid.
+        :user (Annotated[User, Depends): Active user.
+        :session (AsyncSession, optional): SQLAlchemy transaction session.
+
+    Raises:
+        HTTPException: Unknown company.
+
+    Returns:
+        List[CompanyApplicant]: Applications with applicant info.
+    """
+    company = await corefuncs.company_applicants(guid, session)
+    if company is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Company not found"
+        )
+    return orm_response(company.applications, CompanyApplicant)
+
+
+@router.get(
+    "/company/{guid}/stats",
+    response_model=CompanyStatsSchema,
+    description="Get `company` hiring process stats.",
+    dependencies=[Depends(read_only)],
+)
+async def get_company_stats(
+    guid: UUID,
+    session: Annotated[AsyncSession, Depends(get_session)],
+) -> CompanyStatsSchema:
+    """
+    Returns the hiring process stats of a company, read from the
+    incrementally maintained `company_stats`.
+
+    Args:
+        :guid (UUID): Company guid.
+        :session (AsyncSession, optional): SQLAlchemy transaction session.
+
+    Raises:
+        HTTPException: Unknown company.
+
+    Returns:
+        CompanyStatsSchema: Company stats.
+    """
+    totals, locations = await stats.company_stats(session, guid)
+    if totals is None:
+        if await session.get(Company, guid) is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Company not found"
+            )
+        totals = CompanyStats(
+            applicants=0, hired=0, total_process_steps=0, total_steps_performed=0
+        )
+    applicants = totals.applicants
+    return CompanyStatsSchema(
+        company_guid=guid,
+        applicants=applicants,
+        hired=totals.hired,
+        hire_rate=totals.hired / applicants if applicants else 0.0,
+        avg_process_steps=(
+            totals.total_process_steps / applicants if applicants else 0.0
+        ),
+        avg_steps_performed=(
+            totals.total_steps_performed / applicants if applicants else 0.0
+        ),
+        steps_completion_rate=(
+            totals.total_steps_performed / totals.total_process_steps
+            if totals.total_process_steps
+            else 0.0
+        ),
+        applicants_by_location=locations,
+    )
+
+
+@router.get(
+    "/companies",
+    response_model=CompanyPage,
+    description="Search `companies` by name and location.",
+    dependencies=[Depends(read_only)],
+)
+async def search_companies(
+    session: Annotated[AsyncSession, Depends(get_session)],
+    name: Annotated[str | None, Query(min_length=1)] = None,
+    location: Annotated[str | None, Query(min_length=1)] = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    cursor: str | None = None,
+) -> CompanyPage:
+    """
+    Page through companies ordered by name.
+
+    Args:
+        :session (AsyncSession, optional): SQLAlchemy transaction session.
+        :name (str | None): Case insensitive substring of the name.
+        :location (str | None): Location.
+        :limit (int): Page size.
+        :cursor (str | None): `next_cursor` of the previous page.
+
+    Returns:
+        CompanyPage: Companies and cursor of the next page.
+    """
+    companies, next_cursor = await corefuncs.search_companies(
+        session, name=name, location=location, limit=limit, cursor=cursor
+    )
+    return ORJSONResponse(
+        {
+            "items": [orm_dict(company, CompanySchema) for company in companies],
+            "next_cursor": next_cursor,
+        }
+    )
@@ -0,0 +1,94 @@
+import hmac
+from typing import Annotated, Any, Dict
+
+from fastapi import APIRouter, Depends, Header
+from fastapi.exceptions import HTTPException
+from fastapi.responses import PlainTextResponse
+from starlette import status
+
+from ...config import _settings
+from ...core.settings import created_engines
+from ..cache import user_cache
+from ..middlware import registry
+
+
+async def internal_token(authorization: Annotated[str | None, Header()] = None) -> None:
+    """
+    Only let through the requests bearing `INTERNAL_TOKEN`. Without one
+    configured the internal endpoints do not exist.
+
+    Args:
+        :authorization (str | None): `Authorization` header.
+
+    Raises:
+        HTTPException: Endpoints disabled, or missing or wrong token.
+    """
+    if not _settings.INTERNAL_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    expected = f"Bearer {_settings.INTERNAL_TOKEN}"
+    if not hmac.compare_digest((authorization or "").encode(), expected.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid internal token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+router = APIRouter(
+    prefix="/internal",
+    include_in_schema=False,
+    dependencies=[Depends(internal_token)],
+)
+
+
+def _pool_stats(engine: Any) -> Dict | None:
+    return None if engine is None else engine.pool.stats()
+
+
+@router.get("/cache", description="Identity cache statistics.")
+async def get_cache_stats() -> Dict:
+    """
+    Returns the hit/miss counters of the authenticated users cache.
+
+    Returns:
+        Dict: Cache statistics.
+    """
+    return {"users": user_cache.stats()}
+
+
+@router.get("/pool", description="Database connection pools statistics.")
+async def get_pool_stats() -> Dict:
+    """
+    Returns checked-out and idle connections, connection wait times and
+    overflow events of the sync and async engines of this worker, primary
+    and read replicas. Engines not created yet are reported as `null`, or
+    left out for the replicas.
+
+    Returns:
+        Dict: Pools statistics.
+    """
+    engines = created_engines()
+    return {
+        "sync": _pool_stats(engines.get("sync")),
+        "async": _pool_stats(engines.get("async")),
+        "replicas": {
+            "sync": [_pool_stats(e) for e in engines.get("sync_replicas", [])],
+            "async": [_pool_stats(e) for e in engines.get("async_replicas", [])],
+        },
+    }
+
+
+@router.get(
+    "/metrics",
+    description="Request and database metrics, in Prometheus text format.",
+    response_class=PlainTextResponse,
+)
+async def get_metrics() -> PlainTextResponse:
+    """
+    Returns the per route latency histograms, status codes, SQL statements
+    count and database time, and the requests in flight of this worker.
+
+    Returns:
+        PlainTextResponse: Prometheus text exposition.
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
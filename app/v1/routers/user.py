@@ -1,24 +1,35 @@
-from datetime import datetime
-from typing import Annotated, Dict
+from typing import Annotated, Any, Dict, List
 
 from fastapi import APIRouter, Depends, Request
 from fastapi.exceptions import HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
+from ...core.datamodels.application import UserApplication
 from ...core.datamodels.user import BaseUser
 from ...core.datamodels.useraccess import Token, UserMe
 from ...core.models.database import User
-from ...core.settings import get_db
+from ...core.settings import get_session
 from .. import corefuncs
+from ..bulk import IMPORT_FORMATS, UserImport
+from ..cache import invalidate_user
 from ..dependencies import (
     Email,
     create_access_token,
     get_current_active_user,
+    get_current_admin_user,
     login_for_access_token,
+    token_digest,
     verify_registered_user,
 )
+from ..etag import if_none_match, make_etag, not_modified
+from ..idempotency import idempotency_keys
+from ..ratelimit import limit_login, limit_register
+from ..replicas import read_only
+from ..responses import orm_response
 from ..utils import manage_transaction
 
 router = APIRouter()
@@ -28,27 +39,63 @@ router = APIRouter()
     "/user",
     response_model=UserMe,
     description="Get logged `user` info.",
+    dependencies=[Depends(read_only)],
 )
-def get_current_user_info(
+async def get_current_user_info(
     current_user: Annotated[User, Depends(get_current_active_user)],
+    request: Request,
 ) -> UserMe:
     """
-    Returns current active user info.
+    Returns current active user info, or `304 Not Modified` when the
+    client's `If-None-Match` holds the ETag of the unchanged user.
 
     Args:
         :current_user (Annotated[User, Depends): Active user.
+        :request (Request): FastAPI Request class.
 
     Returns:
         UserMe: response model.
     """
-    return current_user
+    etag = make_etag(current_user.guid, current_user.updated_at.isoformat())
+    if if_none_match(request, etag):
+        return not_modified(etag)
+    return orm_response(current_user, UserMe, headers={"ETag": etag})
+
+
+@router.get(
+    "/user/applications",
+    response_model=List[UserApplication],
+    description="Get logged `user` applications, with their company.",
+    dependencies=[Depends(read_only)],
+)
+async def get_current_user_applications(
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    session: Annotated[AsyncSession, Depends(get_session)],
+) -> List[UserApplication]:
+    """
+    Returns the applications of the current active user.
+
+    Args:
+        :current_user (Annotated[User, Depends): Active user.
+        :session (AsyncSession, optional): SQLAlchemy transaction session.
+
+    Returns:
+        List[UserApplication]: Applications with company info.
+    """
+    applications = await corefuncs.user_applications(current_user.guid, session)
+    return orm_response(applications, UserApplication)
 
 
-@router.post("/token", response_model=Token, status_code=status.HTTP_202_ACCEPTED)
+@router.post(
+    "/token",
+    response_model=Token,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(limit_login)],
+)
 @manage_transaction
-def login__access_token(
+async def login__access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-    session: Session = Depends(get_db),
+    session: AsyncSession = Depends(get_session),
 ) -> Token:
     """
     Create login access token for the current active `user`.
@@ -56,12 +103,12 @@ def login__access_token(
     Args:
         :form_data (Annotated[OAuth2PasswordRequestForm, Depends): OAuth2 standard
         form data payload.
-        :session (Session, optional): SQLAlchemy transaction session.
+        :session (AsyncSession, optional): SQLAlchemy transaction session.
 
     Returns:
         Token: access token.
     """
-    return login_for_access_token(session, form_data)
+    return await login_for_access_token(session, form_data)
 
 
 @router.delete(
@@ -70,55 +117,129 @@ def login__access_token(
     status_code=status.HTTP_202_ACCEPTED,
 )
 @manage_transaction
-def disable_user(
-    session: Annotated[Session, Depends(get_db)],
+async def disable_user(
+    session: Annotated[AsyncSession, Depends(get_session)],
     user: Annotated[User, Depends(get_current_active_user)],
 ) -> int:
     """
     Disable existing `user`.
 
     Args:
-        :session (Session, optional): SQLAlchemy transaction session.
+        :session (AsyncSession, optional): SQLAlchemy transaction session.
         :user (Annotated[User, Depends): _description_
 
     Returns:
         int: _description_
     """
-    return corefuncs.disable_user(user)
+    return await corefuncs.disable_user(user, session)
+
+
+@router.post(
+    "/logout",
+    description="Revoke every access token of the logged `user`.",
+    status_code=status.HTTP_202_ACCEPTED,
+)
+@manage_transaction
+async def logout(
+    session: Annotated[AsyncSession, Depends(get_session)],
+    user: Annotated[User, Depends(get_current_active_user)],
+) -> int:
+    """
+    Log out the current active `user` from every device.
+
+    Args:
+        :session (AsyncSession, optional): SQLAlchemy transaction session.
+        :user (Annotated[User, Depends): Active user.
+
+    Returns:
+        int: Accepted.
+    """
+    return await corefuncs.logout_user(user, session)
 
 
 @router.post(
     "/register",
+    response_model=UserMe,
     status_code=status.HTTP_201_CREATED,
     description="Create new `user`.",
+    dependencies=[Depends(limit_register)],
 )
 async def create_user(
     user_form: BaseUser,
-    session: Annotated[Session, Depends(get_db)],
+    session: Annotated[AsyncSession, Depends(get_session)],
     request: Request,
 ) -> UserMe:
     """
     Register a new `user`.
 
+    Clients retrying on timeout send the same `Idempotency-Key` header:
+    duplicates get the response of the first request, which is served once.
+
     Args:
         :user_form (BaseUser): User content form.
-        :session (Session, optional): SQLAlchemy transaction session.
+        :session (AsyncSession, optional): SQLAlchemy transaction session.
         :request (Request): FastAPI Request class.
 
     Returns:
         UserMe: Basic user info.
     """
-    try:
-        user = corefuncs.create_new_user(user_form, session)
-        access_token = create_access_token({"sub": user.username})
-        user.auth_x_token = access_token
-        sender = Email(user, request)
-        await sender.send_verification_code()
-        session.commit()
-        return UserMe(**user.dict())
-    except Exception as e:
-        session.rollback()
-        raise HTTPException(status_code=500, detail=e.args)
+    async with idempotency_keys.request(request, "register") as attempt:
+        if attempt.replay is not None:
+            return attempt.replay
+        try:
+            user = await corefuncs.create_new_user(user_form, session)
+            sender = Email(user, request)
+            sender.queue_verification_code(session)
+            response = orm_response(user, UserMe, status_code=status.HTTP_201_CREATED)
+            await attempt.complete(response, session)
+            await session.commit()
+            return response
+        except HTTPException as e:
+            await session.rollback()
+            raise e
+        except IntegrityError:
+            await session.rollback()
+            raise HTTPException(status.HTTP_409_CONFLICT, "Email already registered")
+        except Exception as e:
+            await session.rollback()
+            raise HTTPException(status_code=500, detail=e.args)
+
+
+@router.post(
+    "/users/import",
+    status_code=status.HTTP_200_OK,
+    description="Register `users` in bulk from a CSV or JSON Lines file, admins only.",
+)
+async def import_users(
+    user: Annotated[User, Depends(get_current_admin_user)],
+    session: Annotated[AsyncSession, Depends(get_session)],
+    request: Request,
+) -> Dict[str, Any]:
+    """
+    Import users streamed in the request body, one per line, with the same
+    fields as `/register`. Valid rows are committed batch by batch, the
+    others are reported with their row number.
+
+    Args:
+        :user (Annotated[User, Depends): Active admin user.
+        :session (AsyncSession, optional): SQLAlchemy transaction session.
+        :request (Request): FastAPI Request class.
+
+    Raises:
+        HTTPException: The user is not an admin, or unsupported content type.
+
+    Returns:
+        Dict[str, Any]: Import report.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type not in IMPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Expected one of {', '.join(IMPORT_FORMATS)}",
+        )
+    return await UserImport(session, request).run(
+        request.stream(), IMPORT_FORMATS[content_type]
+    )
 
 
 @router.get(
@@ -127,31 +248,40 @@ async def create_user(
     description="Send a verification email to a registering `user`.",
 )
 @manage_transaction
-def verify_user_by_email_sender(
-    access_token: Annotated[str, Depends(verify_registered_user)],
-    session: Annotated[Session, Depends(get_db)],
+async def verify_user_by_email_sender(
+    access_token_digest: Annotated[bytes, Depends(verify_registered_user)],
+    session: Annotated[AsyncSession, Depends(get_session)],
 ) -> Dict:
     """
     Verify user registration by email.
 
     Args:
-        :access_token (Annotated[str, Depends): Access token.
-        :session (Session, optional): SQLAlchemy transaction session.
+        :access_token_digest (Annotated[bytes, Depends): Access token digest.
+        :session (AsyncSession, optional): SQLAlchemy transaction session.
 
     Raises:
+        HTTPException: Unknown token.
         HTTPException: Account already verified.
 
     Returns:
         Dict: Success response of verification.
     """
-    user = session.query(User).filter(User.auth_x_token == access_token).one_or_none()
-    if user.verified:
+    username = await corefuncs.verify_user(access_token_digest, session)
+    if username is None:
+        verified = await session.scalar(
+            select(User.verified).where(User.auth_x_token_digest == access_token_digest)
+        )
+        if verified is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Could not find existing user or user already verified",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Account already verified",
         )
-    user.verified = True
-    user.updated_at = datetime.now()
+    await invalidate_user(session, username)
     return {"status": status.HTTP_200_OK, "message": "Account successfully verified"}
 
 
@@ -163,7 +293,7 @@ def verify_user_by_email_sender(
 async def resend_email_verification(
     user: Annotated[User, Depends(get_current_active_user)],
     request: Request,
-    session: Session = Depends(get_db),
+    session: AsyncSession = Depends(get_session),
 ) -> int:
     """
     Resend verification email.
@@ -171,16 +301,17 @@ async def resend_email_verification(
     Args:
         :user (Annotated[User, Depends): _description_
         :request (Request): FastAPI Request class.
-        :session (Session, optional): SQLAlchemy transaction session.
+        :session (AsyncSession, optional): SQLAlchemy transaction session.
 
     Returns:
         int: Accepted request.
     """
     acces_token = create_access_token({"sub": user.username})
     user.auth_x_token = acces_token
-    session.flush()
-    session.commit()
-    url = f"{request.url.scheme}://{request.client.host}:{request.url.port}/verifyemail/{user.auth_x_token}"
-    sender = Email(user, url)
-    await sender.send_verification_code()
+    user.auth_x_token_digest = token_digest(acces_token)
+    await invalidate_user(session, user.username)
+    sender = Email(user, request)
+    sender.queue_verification_code(session)
+    await session.flush()
+    await session.commit()
     return status.HTTP_202_ACCEPTED
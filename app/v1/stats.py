@@ -0,0 +1,278 @@
+import asyncio
+import logging
+import sys
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+from uuid import UUID
+
+from sqlalchemy import (
+    Select,
+    case,
+    delete,
+    event,
+    func,
+    insert,
+    inspect,
+    select,
+    text,
+    tuple_,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..core.models.database import (
+    Application,
+    CompanyLocationStats,
+    CompanyStats,
+)
+from ..core.settings import new_session
+from .utils import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+# `company_stats` counters, in the order of the deltas
+COUNTERS = ("applicants", "hired", "total_process_steps", "total_steps_performed")
+
+
+def company_aggregate() -> Select:
+    """
+    `company_stats` computed from scratch over `applications`.
+    """
+    return select(
+        Application.company_guid,
+        func.count(),
+        func.sum(case((Application.hired.is_(True), 1), else_=0)),
+        func.sum(Application.n_process_steps),
+        func.sum(Application.n_steps_performed),
+    ).group_by(Application.company_guid)
+
+
+def location_aggregate() -> Select:
+    """
+    `company_location_stats` computed from scratch over `applications`.
+    """
+    return select(
+        Application.company_guid, Application.joboffer_location, func.count()
+    ).group_by(Application.company_guid, Application.joboffer_location)
+
+
+_KEYS = (
+    "company_guid",
+    "joboffer_location",
+    "hired",
+    "n_process_steps",
+    "n_steps_performed",
+)
+
+
+# `session.info` key of the values the flushed applications had in the database
+_PREVIOUS = "application_previous"
+
+
+def _previous(application: Application) -> Dict[str, Any] | None:
+    # values before the flush, `None` when some were expired or never loaded
+    state = inspect(application)
+    values = {}
+    for key in _KEYS:
+        history = state.attrs[key].history
+        if history.deleted:
+            values[key] = history.deleted[0]
+        elif history.unchanged:
+            values[key] = history.unchanged[0]
+        else:
+            return None
+    return values
+
+
+def _contribution(values: Dict[str, Any]) -> Tuple[int, int, int, int]:
+    return (
+        1,
+        1 if values["hired"] else 0,
+        values["n_process_steps"] or 0,
+        values["n_steps_performed"] or 0,
+    )
+
+
+def _changed(session: Session) -> List[Application]:
+    return [
+        application
+        for application in (*session.dirty, *session.deleted)
+        if isinstance(application, Application)
+        and (application in session.deleted or session.is_modified(application))
+    ]
+
+
+@event.listens_for(Session, "before_flush")
+def _record_previous(session: Session, flush_context: Any, instances: Any) -> None:
+    """
+    Keep the values the changed applications have in the database. After a
+    commit expired them, the attribute history no longer holds the old ones:
+    those are read in a single query, before the flush overwrites them.
+    """
+    previous = {}
+    missing = []
+    for application in _changed(session):
+        identity = inspect(application).identity
+        values = _previous(application)
+        if values is None:
+            missing.append(identity)
+        else:
+            previous[identity] = values
+    if missing:
+        columns = [getattr(Application, key) for key in _KEYS]
+        rows = session.connection().execute(
+            select(Application.user_guid, Application.company_guid, *columns).where(
+                tuple_(Application.user_guid, Application.company_guid).in_(missing)
+            )
+        )
+        for user_guid, company_guid, *values in rows:
+            previous[(user_guid, company_guid)] = dict(zip(_KEYS, values))
+    session.info[_PREVIOUS] = previous
+
+
+def _deltas(
+    session: Session,
+) -> Tuple[Dict[UUID, List[int]], Dict[Tuple[UUID, str], int]]:
+    companies: Dict[UUID, List[int]] = defaultdict(lambda: [0] * len(COUNTERS))
+    locations: Dict[Tuple[UUID, str], int] = defaultdict(int)
+
+    def _apply(values: Dict[str, Any], sign: int) -> None:
+        totals = companies[values["company_guid"]]
+        for i, value in enumerate(_contribution(values)):
+            totals[i] += sign * value
+        locations[values["company_guid"], values["joboffer_location"]] += sign
+
+    for application in session.new:
+        if isinstance(application, Application):
+            _apply({key: getattr(application, key) for key in _KEYS}, 1)
+    previous = session.info.pop(_PREVIOUS, {})
+    for application in _changed(session):
+        values = previous.get(inspect(application).identity)
+        if values is not None:
+            _apply(values, -1)
+        if application not in session.deleted:
+            _apply({key: getattr(application, key) for key in _KEYS}, 1)
+    return (
+        {guid: totals for guid, totals in companies.items() if any(totals)},
+        {key: count for key, count in locations.items() if count},
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _update_company_stats(session: Session, flush_context: Any) -> None:
+    """
+    Add the changes of the flushed applications to the company stats, in the
+    same transaction, with one upsert per table. The increments are applied
+    by the database, so concurrent transactions do not lose updates.
+    """
+    companies, locations = _deltas(session)
+    if not companies and not locations:
+        return
+    connection = session.connection()
+    insert = dialect_insert(connection.dialect.name)
+    if companies:
+        statement = insert(CompanyStats).values(
+            [
+                {"company_guid": guid, **dict(zip(COUNTERS, totals))}
+                for guid, totals in companies.items()
+            ]
+        )
+        connection.execute(
+            statement.on_conflict_do_update(
+                index_elements=[CompanyStats.company_guid],
+                set_={
+                    counter: getattr(CompanyStats, counter)
+                    + statement.excluded[counter]
+                    for counter in COUNTERS
+                },
+            )
+        )
+    if locations:
+        statement = insert(CompanyLocationStats).values(
+            [
+                {
+                    "company_guid": guid,
+                    "joboffer_location": location,
+                    "applicants": count,
+                }
+                for (guid, location), count in locations.items()
+            ]
+        )
+        connection.execute(
+            statement.on_conflict_do_update(
+                index_elements=[
+                    CompanyLocationStats.company_guid,
+                    CompanyLocationStats.joboffer_location,
+                ],
+                set_={
+                    "applicants": CompanyLocationStats.applicants
+                    + statement.excluded.applicants
+                },
+            )
+        )
+
+
+async def company_stats(
+    session: AsyncSession, company_guid: UUID
+) -> Tuple[CompanyStats | None, Dict[str, int]]:
+    """
+    Stats of a company, read by primary key.
+
+    Args:
+        :session (AsyncSession): SQLAlchemy transaction session.
+        :company_guid (UUID): Company guid.
+
+    Returns:
+        Tuple[CompanyStats | None, Dict[str, int]]: Totals, `None` when the
+        company has no application yet, and applicants per job location.
+    """
+    stats = await session.get(CompanyStats, company_guid)
+    locations = await session.execute(
+        select(
+            CompanyLocationStats.joboffer_location, CompanyLocationStats.applicants
+        ).where(
+            CompanyLocationStats.company_guid == company_guid,
+            CompanyLocationStats.applicants > 0,
+        )
+    )
+    return stats, dict(locations.all())
+
+
+async def rebuild(session: AsyncSession) -> None:
+    """
+    Recompute every company stats from `applications`, e.g. to backfill.
+    On PostgreSQL writes to `applications` wait until the rebuild commits.
+
+    Args:
+        :session (AsyncSession): SQLAlchemy transaction session.
+    """
+    if session.bind.dialect.name == "postgresql":
+        await session.execute(text("LOCK TABLE applications IN SHARE MODE"))
+    await session.execute(delete(CompanyLocationStats))
+    await session.execute(delete(CompanyStats))
+    await session.execute(
+        insert(CompanyStats).from_select(
+            ["company_guid", *COUNTERS], company_aggregate()
+        )
+    )
+    await session.execute(
+        insert(CompanyLocationStats).from_select(
+            ["company_guid", "joboffer_location", "applicants"],
+            location_aggregate(),
+        )
+    )
+    await session.commit()
+
+
+async def _rebuild() -> None:
+    async with new_session() as session:
+        await rebuild(session)
+
+
+if __name__ == "__main__":
+    # Backfill the stats: `python -m app.v1.stats rebuild`
+    logging.basicConfig(level=logging.INFO)
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python -m app.v1.stats rebuild")
+    asyncio.run(_rebuild())
+    logger.info("Company stats rebuilt")
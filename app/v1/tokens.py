@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Tuple
+from uuid import UUID
+
+from sqlalchemy import delete, event, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from ..config import _settings
+from ..core.models.database import TokenRevocation, User
+from ..core.settings import new_session
+
+logger = logging.getLogger(__name__)
+
+# `session.info` key of the revocations to apply locally once committed
+_REVOKED = "revoked_tokens"
+
+
+def token_claims(user: User) -> Dict[str, Any]:
+    """
+    Claims of the access token of `user`. In stateless mode they carry
+    everything needed to serve the user without loading it.
+
+    Args:
+        :user (User): Authenticated user.
+
+    Returns:
+        Dict[str, Any]: JWT claims.
+    """
+    claims = {"sub": user.username, "ver": user.token_version}
+    if _settings.STATELESS_TOKENS:
+        claims.update(
+            uid=str(user.guid),
+            disabled=user.disabled,
+            verified=user.verified,
+            admin=user.is_admin,
+            name=user.name,
+            surname=user.surname,
+            email=user.email,
+            upd=user.updated_at.isoformat(),
+        )
+    return claims
+
+
+def user_from_claims(claims: Dict[str, Any]) -> User | None:
+    """
+    Rebuild the detached `User` a stateless token was issued for.
+
+    Returns:
+        User | None: `None` when the token lacks the stateless claims.
+    """
+    try:
+        user = User(
+            guid=UUID(claims["uid"]),
+            username=claims["sub"],
+            token_version=claims["ver"],
+            disabled=claims["disabled"],
+            verified=claims["verified"],
+            # tokens issued before the claim existed are not privileged
+            is_admin=claims.get("admin", False),
+            name=claims["name"],
+            surname=claims["surname"],
+            email=claims["email"],
+            updated_at=datetime.fromisoformat(claims["upd"]),
+        )
+    except (KeyError, TypeError, ValueError):
+        return None
+    make_transient_to_detached(user)
+    return user
+
+
+class RevocationSet:
+    """
+    Lowest valid token version per revoked username, for the tokens that may
+    still be unexpired: an entry is dropped `lifetime` seconds after the
+    revocation.
+
+    Refreshes are incremental, by creation time. Each one re-reads the
+    revocations of the last `overlap` seconds, committed late by a slower
+    transaction; applying a revocation twice is harmless.
+    """
+
+    def __init__(
+        self,
+        lifetime: float,
+        overlap: float = 60.0,
+        timer: Callable[[], float] = time.time,
+    ):
+        self.lifetime = lifetime
+        self.overlap = overlap
+        self.timer = timer
+        self.ready = False
+        self._since: datetime | None = None
+        self._versions: Dict[str, Tuple[int, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._versions)
+
+    def revoke(self, username: str, version: int, at: float) -> None:
+        current = self._versions.get(username)
+        if current is None or current[0] < version:
+            self._versions[username] = (version, at)
+
+    def is_revoked(self, username: str, version: int) -> bool:
+        entry = self._versions.get(username)
+        return entry is not None and version < entry[0]
+
+    def prune(self) -> None:
+        horizon = self.timer() - self.lifetime
+        for username in [u for u, (_, at) in self._versions.items() if at < horizon]:
+            del self._versions[username]
+
+    async def refresh(self, session: AsyncSession) -> int:
+        """
+        Apply the revocations recorded by any worker since the last refresh,
+        or within `lifetime` on the first one.
+
+        Returns:
+            int: Revocations read.
+        """
+        started = datetime.fromtimestamp(self.timer())
+        since = self._since or started - timedelta(seconds=self.lifetime)
+        rows = (
+            await session.execute(
+                select(
+                    TokenRevocation.username,
+                    TokenRevocation.token_version,
+                    TokenRevocation.created_at,
+                ).where(TokenRevocation.created_at >= since)
+            )
+        ).all()
+        for username, version, created_at in rows:
+            self.revoke(username, version, created_at.timestamp())
+        self._since = started - timedelta(seconds=self.overlap)
+        self.prune()
+        self.ready = True
+        return len(rows)
+
+
+revocations = RevocationSet(lifetime=_settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+
+async def revoke_tokens(user: User, session: AsyncSession) -> int:
+    """
+    Revoke every access token issued to `user` so far. Applied to the
+    revocation set of this worker on commit, of the others on refresh.
+
+    Args:
+        :user (User): User whose tokens are revoked.
+        :session (AsyncSession): SQLAlchemy transaction session.
+
+    Returns:
+        int: New token version of the user.
+    """
+    version = await session.scalar(
+        update(User)
+        .where(User.guid == user.guid)
+        .values(token_version=User.token_version + 1)
+        .returning(User.token_version)
+    )
+    session.add(
+        TokenRevocation(
+            username=user.username, token_version=version, created_at=datetime.now()
+        )
+    )
+    session.info.setdefault(_REVOKED, []).append((user.username, version))
+    return version
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_revocations(session: Session) -> None:
+    for username, version in session.info.pop(_REVOKED, ()):
+        revocations.revoke(username, version, time.time())
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_revocations(session: Session) -> None:
+    session.info.pop(_REVOKED, None)
+
+
+class RevocationRefresher:
+    """
+    Keep `revocations` up to date with the ones recorded by every worker,
+    and delete the rows whose tokens have all expired.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession] = new_session,
+        interval: float = _settings.TOKEN_REVOCATION_REFRESH_INTERVAL,
+        revocation_set: RevocationSet = revocations,
+    ):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.revocations = revocation_set
+        self._purged_at = 0.0
+
+    async def refresh_once(self) -> None:
+        async with self.session_factory() as session:
+            await self.revocations.refresh(session)
+            now = time.time()
+            if now - self._purged_at > self.revocations.lifetime:
+                self._purged_at = now
+                horizon = datetime.fromtimestamp(now - self.revocations.lifetime)
+                await session.execute(
+                    delete(TokenRevocation).where(TokenRevocation.created_at < horizon)
+                )
+                await session.commit()
+
+    async def run(self) -> None:
+        """
+        Refresh every `interval` seconds until cancelled.
+        """
+        while True:
+            try:
+                await self.refresh_once()
+            except Exception:
+                logger.exception("Token revocations refresh failed")
+            await asyncio.sleep(self.interval)
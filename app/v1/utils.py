@@ -1,45 +1,288 @@
-from functools import wraps
-from typing import Any
+import asyncio
+import base64
+import inspect
+import json
+import random
+import time
+from contextlib import asynccontextmanager
+from functools import partial, wraps
+from itertools import count
+from typing import Any, AsyncIterator, Callable, List
 
 from fastapi.exceptions import HTTPException
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DBAPIError, IntegrityError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from starlette import status
 
+from ..config import _settings
+from .middlware import Counter, Labels, registry
+
 CONN = "session"
 
+# `insert()` supporting `ON CONFLICT`, per dialect
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def _to_http_exception(e: Exception) -> HTTPException:
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, (ValueError, TypeError)):
+        return HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY, e.args)
+    if isinstance(e, IntegrityError):
+        return HTTPException(status.HTTP_409_CONFLICT, e.args)
+    if isinstance(e, KeyError):
+        return HTTPException(status.HTTP_400_BAD_REQUEST, e.args)
+    return HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, e.args)
+
+
+# SQLSTATEs of the transient conflicts: `serialization_failure`, `deadlock_detected`
+RETRYABLE_SQLSTATES = {"40001": "serialization_failure", "40P01": "deadlock"}
+
+transaction_attempts = registry.register(
+    Counter("db_transaction_attempts_total", "Transaction attempts, per handler.")
+)
+transaction_retries = registry.register(
+    Counter(
+        "db_transaction_retries_total",
+        "Transactions retried after a transient conflict, per handler and reason.",
+    )
+)
+transaction_exhausted = registry.register(
+    Counter(
+        "db_transaction_retries_exhausted_total",
+        "Transactions still conflicting after the last retry, per handler.",
+    )
+)
+
+
+def retry_reason(e: Exception) -> str | None:
+    """
+    Why a failed transaction is worth retrying from scratch.
+
+    Args:
+        :e (Exception): Error raised by the transaction.
+
+    Returns:
+        str | None: `serialization_failure`, `deadlock`, `locked`, or `None`
+        when the error is not transient.
+    """
+    if not isinstance(e, DBAPIError):
+        return None
+    # `pgcode` with psycopg2, `sqlstate` with psycopg and asyncpg
+    code = getattr(e.orig, "sqlstate", None) or getattr(e.orig, "pgcode", None)
+    if code in RETRYABLE_SQLSTATES:
+        return RETRYABLE_SQLSTATES[code]
+    # SQLite serializes the writers, another one holds the lock
+    if isinstance(e, OperationalError) and "database is locked" in str(e.orig):
+        return "locked"
+    return None
+
+
+def backoff(attempt: int, base: float, cap: float) -> float:
+    """
+    Full jitter: uniform up to the exponential delay, so that the
+    conflicting transactions do not retry in lockstep.
+    """
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+def _failed(e: Exception, handler: Labels, reason: str | None) -> HTTPException:
+    if reason is None:
+        return _to_http_exception(e)
+    transaction_exhausted.inc(handler)
+    return HTTPException(
+        status.HTTP_503_SERVICE_UNAVAILABLE,
+        "Concurrent update, retry later",
+        headers={"Retry-After": "1"},
+    )
+
+
+def _begin(_session: Session, isolation_level: str | None, attempt: int) -> None:
+    if isolation_level is not None:
+        # The level is set when the connection is acquired: end the
+        # transaction the dependencies may have started reading
+        if _session.in_transaction():
+            _session.rollback()
+        _session.connection(execution_options={"isolation_level": isolation_level})
+    if attempt or isolation_level is not None:
+        # The instances the handler was given expired on rollback
+        for instance in list(_session.identity_map.values()):
+            _session.refresh(instance)
+
+
+async def _async_begin(
+    _session: AsyncSession, isolation_level: str | None, attempt: int
+) -> None:
+    if isolation_level is not None:
+        if _session.in_transaction():
+            await _session.rollback()
+        await _session.connection(
+            execution_options={"isolation_level": isolation_level}
+        )
+    if attempt or isolation_level is not None:
+        # Reloaded eagerly, lazy loads are not allowed with `asyncio`
+        for instance in list(_session.identity_map.values()):
+            await _session.refresh(instance)
+
+
+@asynccontextmanager
+async def savepoint(_session: AsyncSession) -> AsyncIterator[None]:
+    """
+    Partial rollback: when the block raises, only its statements are rolled
+    back and the exception propagates, the rest of the transaction stands.
+    Sync handlers use `Session.begin_nested()` directly.
+
+    Args:
+        :_session (AsyncSession): Session in a transaction.
+    """
+    nested = await _session.begin_nested()
+    try:
+        yield
+    except Exception:
+        await nested.rollback()
+        raise
+    await nested.commit()
+
 
-def manage_transaction(func) -> Any:
+def manage_transaction(
+    func: Callable | None = None,
+    *,
+    isolation_level: str | None = None,
+    retries: int | None = None,
+    base_delay: float | None = None,
+    max_delay: float | None = None,
+) -> Any:
     """
     Handle session transaction and exceptions
     raised across the running code.
+
+    Sync handlers get a `Session`, `async` handlers an `AsyncSession`
+    (or a `ThreadedSession` when `DB_ASYNC` is disabled).
+
+    Serialization failures and deadlocks roll the transaction back and run
+    the handler again, up to `retries` times after a jittered backoff;
+    past that the client gets a `503`. Usable bare or with arguments:
+
+        @manage_transaction(isolation_level="SERIALIZABLE")
+
+    Args:
+        :func (Callable | None): Handler, when used bare.
+        :isolation_level (str | None): Isolation level of the transaction,
+        the engine's by default.
+        :retries (int | None): `TRANSACTION_MAX_RETRIES` by default.
+        :base_delay (float | None): `TRANSACTION_RETRY_BASE_DELAY` by default.
+        :max_delay (float | None): `TRANSACTION_RETRY_MAX_DELAY` by default.
     """
+    if func is None:
+        return partial(
+            manage_transaction,
+            isolation_level=isolation_level,
+            retries=retries,
+            base_delay=base_delay,
+            max_delay=max_delay,
+        )
+    retries = _settings.TRANSACTION_MAX_RETRIES if retries is None else retries
+    if base_delay is None:
+        base_delay = _settings.TRANSACTION_RETRY_BASE_DELAY
+    if max_delay is None:
+        max_delay = _settings.TRANSACTION_RETRY_MAX_DELAY
+    handler = (("handler", func.__name__),)
+
+    if inspect.iscoroutinefunction(func):
+
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            _session: AsyncSession = kwargs[CONN]
+            try:
+                for attempt in count():
+                    transaction_attempts.inc(handler)
+                    try:
+                        await _async_begin(_session, isolation_level, attempt)
+                        result = await func(*args, **kwargs)
+                        await _session.flush()
+                        await _session.commit()
+                        return result
+                    except Exception as e:
+                        await _session.rollback()
+                        reason = retry_reason(e)
+                        if reason is None or attempt >= retries:
+                            raise _failed(e, handler, reason)
+                        transaction_retries.inc(handler + (("reason", reason),))
+                    await asyncio.sleep(backoff(attempt, base_delay, max_delay))
+            finally:
+                await _session.close()
+
+        return async_wrapper
 
     @wraps(func)
     def wrapper(*args, **kwargs):
         _session: Session = kwargs[CONN]
-        try:
-            with _session:
+        with _session:
+            for attempt in count():
+                transaction_attempts.inc(handler)
                 try:
-                    rv = func(*args, **kwargs)
+                    _begin(_session, isolation_level, attempt)
+                    result = func(*args, **kwargs)
                     _session.flush()
                     _session.commit()
-                    return rv
-                except (ValueError, TypeError) as e:
-                    raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY, e.args)
-                except IntegrityError as e:
-                    raise HTTPException(status.HTTP_409_CONFLICT, e.args)
-                except KeyError as e:
-                    raise HTTPException(status.HTTP_400_BAD_REQUEST, e.args)
-                except HTTPException as e:
-                    raise e
+                    return result
                 except Exception as e:
-                    raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, e.args)
-        except HTTPException as httpexc:
-            _session.rollback()
-            raise httpexc
-        except Exception as exc:
-            _session.rollback()
-            raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, exc.args)
+                    _session.rollback()
+                    reason = retry_reason(e)
+                    if reason is None or attempt >= retries:
+                        raise _failed(e, handler, reason)
+                    transaction_retries.inc(handler + (("reason", reason),))
+                # Sync handlers run on the threadpool
+                time.sleep(backoff(attempt, base_delay, max_delay))
 
     return wrapper
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """
+    Encode the sort key of the last row of a page as an opaque cursor.
+
+    Args:
+        :values (List[Any]): JSON serializable sort key values.
+
+    Returns:
+        str: URL safe cursor.
+    """
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """
+    Decode a cursor made by `encode_cursor`.
+
+    Args:
+        :cursor (str): Cursor received from the client.
+
+    Raises:
+        HTTPException: Malformed cursor.
+
+    Returns:
+        List[Any]: Sort key values.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        values = None
+    if not isinstance(values, list):
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Invalid cursor")
+    return values
+
+
+def dialect_insert(dialect_name: str) -> Callable:
+    """
+    `insert()` construct of the dialect, for `ON CONFLICT` clauses.
+
+    Args:
+        :dialect_name (str): `postgresql` or `sqlite`.
+
+    Returns:
+        Callable: Dialect specific `insert`.
+    """
+    return _INSERTS[dialect_name]
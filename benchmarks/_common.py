@@ -0,0 +1,55 @@
+import json
+import statistics
+import time
+from typing import Any, Dict, List
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of `samples`.
+
+    Args:
+        :samples (List[float]): Measured values.
+        :pct (float): Percentile in the `0-100` range.
+
+    Returns:
+        float: Percentile value, `0.0` when there are no samples.
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(latencies: List[float], elapsed: float | None = None) -> Dict[str, Any]:
+    """
+    Summarize request latencies (in seconds) as milliseconds.
+    """
+    summary = {
+        "count": len(latencies),
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies, default=0.0) * 1000,
+    }
+    if elapsed:
+        summary["throughput_rps"] = len(latencies) / elapsed
+    return summary
+
+
+def report(results: Dict[str, Any]) -> None:
+    """
+    Print benchmark results as JSON, so that runs can be diffed.
+    """
+    print(json.dumps(results, indent=2, default=str))
+
+
+class Timer:
+    def __enter__(self) -> "Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.elapsed = time.perf_counter() - self.start
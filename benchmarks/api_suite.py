@@ -0,0 +1,318 @@
+"""
+Throughput and latency of the main API endpoints against a real PostgreSQL.
+
+A throwaway server is started with pytest-postgresql's executor (`pg_ctl`
+must be installed), migrated to `head` and seeded in SQL with `--users`
+users (`BENCH<n>`, all sharing one password and a `bench-token-<n>`
+verification token), `--companies` companies and `--applications`
+applications per user. Then `--requests` calls per endpoint are sent through
+an ASGI client, `--concurrency` at a time, in this order:
+
+- `POST /register`, a new user each time;
+- `POST /token`, logging in the seeded users round-robin;
+- `GET /user`, with the bearer tokens of the seeded users;
+- `GET /verifyemail/{token}`, verifying the first seeded users;
+- `DELETE /user/disable`, disabling the last seeded users.
+
+Rate limiting is turned off for the run. Results are printed as JSON, so that
+runs of successive releases can be diffed:
+
+    python -m benchmarks.api_suite --users 100000 --requests 2000 --concurrency 32
+    python -m benchmarks.api_suite --dsn postgresql://... # existing empty database
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List
+
+import httpx
+from alembic import command
+from alembic.config import Config
+from port_for import get_port
+from pytest_postgresql.executor import PostgreSQLExecutor
+from pytest_postgresql.janitor import DatabaseJanitor
+from sqlalchemy import create_engine, text
+
+from app.tests.postgres_binaries import find_pg_ctl
+
+from ._common import report, summarize
+
+ROOT = Path(__file__).parents[1]
+PASSWORD = "benchmark-password"
+CITIES = ["MILAN", "ROME", "TURIN", "NAPLES", "BOLOGNA"]
+
+SEED_USERS = text(
+    """
+    INSERT INTO users (
+        guid, name, surname, email, hashed_psw, disabled, username,
+        auth_x_token, auth_x_token_digest, updated_at, created_at, verified
+    )
+    SELECT
+        gen_random_uuid(), 'BENCH', 'BENCH', 'bench' || i || '@worthtrust.io',
+        :hashed_psw, false, 'BENCH' || i, 'bench-token-' || i,
+        sha256(convert_to('bench-token-' || i, 'UTF8')), now(), now(), false
+    FROM generate_series(1, :users) AS i
+    """
+)
+SEED_COMPANIES = text(
+    """
+    INSERT INTO companies (guid, name, location, linkedin_link)
+    SELECT
+        gen_random_uuid(), 'Bench company ' || i,
+        (:cities)[1 + i % cardinality(:cities)],
+        'https://linkedin.com/company/bench-' || i
+    FROM generate_series(1, :companies) AS i
+    """
+)
+# Every user applies to `:applications` distinct companies.
+SEED_APPLICATIONS = text(
+    """
+    INSERT INTO applications (
+        user_guid, company_guid, n_process_steps, n_steps_performed,
+        joboffer_location, hired
+    )
+    SELECT u.guid, c.guid, 5, (u.n + j) % 6, c.location, (u.n + j) % 10 = 0
+    FROM (SELECT guid, substr(username, 6)::int AS n FROM users) AS u
+    CROSS JOIN generate_series(0, :applications - 1) AS j
+    JOIN (SELECT guid, location, substr(name, 15)::int AS n FROM companies) AS c
+        ON c.n = (u.n * 7 + j) % :companies + 1
+    """
+)
+
+
+@contextmanager
+def postgres(pg_ctl: str, dbname: str = "worthtrust_bench") -> Iterator[str]:
+    """
+    Start a throwaway PostgreSQL server with an empty `dbname` database.
+
+    Returns:
+        str: URL of the database.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        port = get_port(None)
+        executor = PostgreSQLExecutor(
+            executable=pg_ctl,
+            host="127.0.0.1",
+            port=port,
+            datadir=str(Path(tmpdir) / "data"),
+            unixsocketdir=tmpdir,
+            logfile=str(Path(tmpdir) / "postgresql.log"),
+            startparams="-w",
+            dbname=dbname,
+        )
+        with executor:
+            executor.wait_for_postgres()
+            with DatabaseJanitor(
+                user=executor.user,
+                host=executor.host,
+                port=executor.port,
+                dbname=dbname,
+                version=executor.version,
+                password=executor.password,
+            ):
+                yield (
+                    f"postgresql://{executor.user}@{executor.host}:"
+                    f"{executor.port}/{dbname}"
+                )
+
+
+def prepare(dsn: str, users: int, companies: int, applications: int) -> None:
+    """
+    Migrate the database to `head` and seed it.
+    """
+    from app.v1.hashing import pwd_context
+
+    engine = create_engine(dsn)
+    config = Config(str(ROOT / "alembic.ini"))
+    config.set_main_option("script_location", str(ROOT / "migrations"))
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, "head")
+    with engine.begin() as connection:
+        connection.execute(
+            SEED_USERS, {"users": users, "hashed_psw": pwd_context.hash(PASSWORD)}
+        )
+        connection.execute(SEED_COMPANIES, {"companies": companies, "cities": CITIES})
+        connection.execute(
+            SEED_APPLICATIONS,
+            {"applications": min(applications, companies), "companies": companies},
+        )
+        connection.execute(text("ANALYZE"))
+    engine.dispose()
+
+
+Scenario = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+def scenarios(users: int, requests: int) -> Dict[str, tuple[Scenario, int]]:
+    """
+    Request to send for the `i`-th call of each endpoint, with the expected
+    status code.
+    """
+    from app.v1.dependencies import create_access_token
+
+    run = uuid.uuid4().hex[:8]
+    headers: Dict[int, Dict[str, str]] = {}
+
+    def bearer(n: int) -> Dict[str, str]:
+        if n not in headers:
+            token = create_access_token({"sub": f"BENCH{n}"})
+            headers[n] = {"Authorization": f"Bearer {token}"}
+        return headers[n]
+
+    # Tokens are signed up front, out of the measured requests
+    for i in range(min(users, requests)):
+        bearer(i % users + 1)
+        bearer(users - i % users)
+
+    async def register(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        return await client.post(
+            "/v1/register",
+            json={
+                "user_name": "suite",
+                "user_surname": "suite",
+                "user_email": f"suite-{run}-{i}@worthtrust.io",
+                "user_psw": PASSWORD,
+            },
+        )
+
+    async def token(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        return await client.post(
+            "/v1/token",
+            data={"username": f"BENCH{i % users + 1}", "password": PASSWORD},
+        )
+
+    async def get_user(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        return await client.get("/v1/user", headers=bearer(i % users + 1))
+
+    async def verify_email(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        return await client.get(f"/v1/verifyemail/bench-token-{i % users + 1}")
+
+    async def disable(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        return await client.delete(
+            "/v1/user/disable", headers=bearer(users - i % users)
+        )
+
+    return {
+        "register": (register, 201),
+        "token": (token, 202),
+        "get_user": (get_user, 200),
+        "verify_email": (verify_email, 200),
+        "disable_user": (disable, 202),
+    }
+
+
+async def drive(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    expected: int,
+    requests: int,
+    concurrency: int,
+) -> Dict[str, Any]:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _one(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            response = await scenario(client, i)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(_one(i) for i in range(requests)))
+    summary = summarize(latencies, time.perf_counter() - start)
+    summary["status_codes"] = dict(statuses)
+    summary["errors"] = requests - statuses[expected]
+    return summary
+
+
+async def run(
+    users: int, requests: int, concurrency: int, **scale: int
+) -> Dict[str, Any]:
+    """
+    Drive every endpoint against the database the app is configured with,
+    already prepared. The engines are disposed when done.
+    """
+    from app.config import _settings
+    from app.core.settings import dispose_engines, get_async_engine, get_engine
+    from app.main import worthtrust
+
+    _settings.RATE_LIMIT_ENABLED = False
+    get_engine().echo = get_async_engine().sync_engine.echo = False
+    results: Dict[str, Any] = {}
+    transport = httpx.ASGITransport(app=worthtrust)
+    try:
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            for name, (scenario, expected) in scenarios(users, requests).items():
+                results[name] = await drive(
+                    client, scenario, expected, requests, concurrency
+                )
+    finally:
+        await dispose_engines()
+    return {
+        "scale": {"users": users, **scale},
+        "requests": requests,
+        "concurrency": concurrency,
+        "endpoints": results,
+    }
+
+
+@contextmanager
+def database(args: argparse.Namespace) -> Iterator[str]:
+    if args.dsn:
+        yield args.dsn
+        return
+    pg_ctl = args.pg_ctl or find_pg_ctl()
+    if pg_ctl is None:
+        raise SystemExit("pg_ctl not found: pass --pg-ctl or --dsn")
+    with postgres(pg_ctl) as dsn:
+        yield dsn
+
+
+def main(args: argparse.Namespace) -> None:
+    with database(args) as dsn:
+        # Read by the settings when `app` is first imported
+        os.environ["DB_URI"] = dsn
+        prepare(dsn, args.users, args.companies, args.applications)
+        results = asyncio.run(
+            run(
+                args.users,
+                args.requests,
+                args.concurrency,
+                companies=args.companies,
+                applications=args.applications,
+            )
+        )
+        from app.v1.hashing import hasher
+
+        hasher.shutdown()
+    report(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--dsn", help="Existing empty database, instead of pg_ctl")
+    parser.add_argument("--pg-ctl", help="pg_ctl executable")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--companies", type=int, default=1_000)
+    parser.add_argument("--applications", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=1_000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    if args.requests > args.users:
+        parser.error(
+            "each verification and disable needs its own user: --users >= --requests"
+        )
+    main(args)
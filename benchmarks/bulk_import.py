@@ -0,0 +1,96 @@
+"""
+Throughput of `POST /users/import` against one `/register` call per user.
+
+A JSON Lines upload of `--rows` users is streamed to the import endpoint,
+then `--register-rows` users are registered one by one; both are reported
+in rows per second. The import runs as an admin user. Hashing runs on the
+hasher process pool (`HASHER_WORKERS`) and rows are inserted
+`USER_IMPORT_BATCH_SIZE` at a time:
+
+    python -m benchmarks.bulk_import --rows 20000
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from typing import AsyncIterator
+
+import httpx
+from sqlalchemy import update
+
+from app.core.models.database import User
+from app.core.settings import new_session
+from app.main import worthtrust
+from app.v1.hashing import hasher
+
+from ._common import report
+from .hashing_latency import login, register
+
+
+async def upload(rows: int, chunk_rows: int = 1000) -> AsyncIterator[bytes]:
+    run = uuid.uuid4().hex[:8]
+    for start in range(0, rows, chunk_rows):
+        yield "".join(
+            json.dumps(
+                {
+                    "user_name": "bulk",
+                    "user_surname": "bulk",
+                    "user_email": f"bulk-{run}-{n}@worthtrust.io",
+                    "user_psw": "benchmark-password",
+                }
+            )
+            + "\n"
+            for n in range(start, min(rows, start + chunk_rows))
+        ).encode()
+
+
+async def main(args: argparse.Namespace) -> None:
+    transport = httpx.ASGITransport(app=worthtrust)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as client:
+        username = (await register(client)).json()["username"]
+        async with new_session() as session:
+            await session.execute(
+                update(User).where(User.username == username).values(is_admin=True)
+            )
+            await session.commit()
+        token = (await login(client, username)).json()["access_token"]
+
+        response = await client.post(
+            "/v1/users/import",
+            content=upload(args.rows),
+            headers={
+                "Authorization": f"Bearer {token}",
+                "Content-Type": "application/x-ndjson",
+            },
+        )
+        response.raise_for_status()
+        imported = response.json()
+        imported.pop("errors")
+
+        start = time.perf_counter()
+        for _ in range(args.register_rows):
+            (await register(client)).raise_for_status()
+        elapsed = time.perf_counter() - start
+
+    hasher.shutdown()
+    report(
+        {
+            "hasher_workers": hasher.max_workers,
+            "import": imported,
+            "register": {
+                "rows": args.register_rows,
+                "elapsed_seconds": elapsed,
+                "rows_per_second": args.register_rows / elapsed,
+            },
+        }
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--register-rows", type=int, default=500)
+    asyncio.run(main(parser.parse_args()))
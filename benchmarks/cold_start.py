@@ -0,0 +1,87 @@
+"""
+Cold start of a worker: time to import the app, and time from spawning a
+`uvicorn` process to its first response.
+
+Importing the app creates no engine nor table anymore, so neither depends on
+the database being reachable; the schema is migrated beforehand with
+`alembic upgrade head`. Each run spawns a fresh interpreter:
+
+    python -m benchmarks.cold_start --runs 10
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from ._common import report, summarize
+
+IMPORT = (
+    "import time; start = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def import_time() -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT], check=True, capture_output=True, text=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def first_response(timeout: float) -> float:
+    port = free_port()
+    start = time.perf_counter()
+    worker = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:worthtrust",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        env={**os.environ, "OUTBOX_WORKER_ENABLED": "false"},
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                response = httpx.get(f"http://127.0.0.1:{port}/v1/openapi.json")
+            except httpx.TransportError:
+                time.sleep(0.005)
+                continue
+            response.raise_for_status()
+            return time.perf_counter() - start
+        raise TimeoutError(f"No response within {timeout}s")
+    finally:
+        worker.terminate()
+        worker.wait()
+
+
+def main(args: argparse.Namespace) -> None:
+    report(
+        {
+            "import": summarize([import_time() for _ in range(args.runs)]),
+            "spawn_to_first_response": summarize(
+                [first_response(args.timeout) for _ in range(args.runs)]
+            ),
+        }
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    main(parser.parse_args())
@@ -0,0 +1,126 @@
+"""
+Latency of `GET /companies` pages at increasing depths over a large
+`companies` table.
+
+Companies are seeded straight in SQL (schema from `alembic upgrade head`).
+For every depth the cursor of that page is computed once, then the page is
+requested repeatedly through the API. With keyset pagination on the
+`(name, guid)` and `(location, name, guid)` indexes the latency should not
+grow with the depth, unlike `OFFSET`:
+
+    python -m benchmarks.company_search --companies 1000000
+"""
+import argparse
+import asyncio
+import time
+from typing import Any, Dict
+
+import httpx
+from sqlalchemy import text
+
+from app.core.settings import get_async_engine, get_engine
+from app.main import worthtrust
+from app.v1.utils import encode_cursor
+
+from ._common import report, summarize
+
+LOCATIONS = ["MILAN", "ROME", "TURIN", "NAPLES", "BOLOGNA", "FLORENCE", "GENOA"]
+
+SEED = text(
+    """
+    INSERT INTO companies (guid, name, location, linkedin_link)
+    SELECT
+        gen_random_uuid(),
+        'Company ' || md5(i::text),
+        (:locations)[1 + i % :n_locations],
+        'https://linkedin.com/company/bench-' || i
+    FROM generate_series(:start, :stop) AS i
+    ON CONFLICT DO NOTHING
+    """
+)
+
+# Position of a page, only used to build its cursor: not timed
+POSITION = text(
+    """
+    SELECT name, guid FROM companies
+    WHERE (CAST(:name AS varchar) IS NULL OR name ILIKE '%' || :name || '%')
+    AND (CAST(:location AS varchar) IS NULL OR location = :location)
+    ORDER BY name, guid OFFSET :offset LIMIT 1
+    """
+)
+
+SEARCHES = {
+    "all": {},
+    "location": {"location": LOCATIONS[0]},
+    "name_and_location": {"name": "a1", "location": LOCATIONS[0]},
+}
+
+
+def seed(total: int, chunk: int = 100_000) -> None:
+    with get_engine().begin() as connection:
+        for offset in range(1, total + 1, chunk):
+            connection.execute(
+                SEED,
+                {
+                    "locations": LOCATIONS,
+                    "n_locations": len(LOCATIONS),
+                    "start": offset,
+                    "stop": min(total, offset + chunk - 1),
+                },
+            )
+        connection.execute(text("ANALYZE companies"))
+
+
+def cursor_at(offset: int, params: Dict[str, str]) -> str | None:
+    """
+    Cursor of the page starting at `offset`, `""` for the first page and
+    `None` past the last one.
+    """
+    if offset == 0:
+        return ""
+    with get_engine().connect() as connection:
+        row = connection.execute(
+            POSITION,
+            {
+                "name": params.get("name"),
+                "location": params.get("location"),
+                "offset": offset - 1,
+            },
+        ).first()
+    return None if row is None else encode_cursor([row.name, str(row.guid)])
+
+
+async def main(args: argparse.Namespace) -> None:
+    get_engine().echo = get_async_engine().sync_engine.echo = False
+    seed(args.companies)
+    transport = httpx.ASGITransport(app=worthtrust)
+    results: Dict[str, Any] = {}
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        for search, params in SEARCHES.items():
+            results[search] = {}
+            for page in args.pages:
+                cursor = cursor_at(page * args.limit, params)
+                if cursor is None:
+                    break
+                query = {**params, "limit": args.limit, "cursor": cursor}
+                latencies = []
+                for _ in range(args.samples):
+                    start = time.perf_counter()
+                    response = await client.get("/v1/companies", params=query)
+                    latencies.append(time.perf_counter() - start)
+                    assert response.status_code == 200, response.text
+                results[search][str(page)] = summarize(latencies)
+    report({"companies": args.companies, "search_pages": results})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--companies", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument(
+        "--pages", type=int, nargs="+", default=[0, 10, 100, 1_000, 10_000]
+    )
+    parser.add_argument("--samples", type=int, default=100)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,96 @@
+"""
+Bytes and CPU per polled request on `GET /user` and `GET /company/{guid}`,
+unconditional against `If-None-Match` with the current ETag (`304`).
+
+The app runs in-process behind an ASGI transport, so the CPU time covers
+both the client and the server side of every request: the difference
+between the two modes is what the conditional request saves.
+
+    python -m benchmarks.conditional_get --requests 2000
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from typing import Any, Dict
+
+import httpx
+
+from app.main import worthtrust
+from app.v1.hashing import hasher
+
+from ._common import report, summarize
+from .hashing_latency import login, register
+
+
+async def poll(
+    client: httpx.AsyncClient, url: str, headers: Dict[str, str], requests: int
+) -> Dict[str, Any]:
+    latencies = []
+    body_bytes = 0
+    cpu = time.process_time()
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = await client.get(url, headers=headers)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code in (200, 304), response.text
+        body_bytes += len(response.content)
+    cpu = time.process_time() - cpu
+    return {
+        "status": response.status_code,
+        "body_bytes_per_request": body_bytes / requests,
+        "cpu_us_per_request": cpu / requests * 1e6,
+        "latency": summarize(latencies),
+    }
+
+
+async def compare(
+    client: httpx.AsyncClient, url: str, headers: Dict[str, str], requests: int
+) -> Dict[str, Any]:
+    etag = (await client.get(url, headers=headers)).headers["ETag"]
+    full = await poll(client, url, headers, requests)
+    cached = await poll(client, url, {**headers, "If-None-Match": etag}, requests)
+    return {
+        "full": full,
+        "not_modified": cached,
+        "bytes_saved_per_request": full["body_bytes_per_request"]
+        - cached["body_bytes_per_request"],
+        "cpu_us_saved_per_request": full["cpu_us_per_request"]
+        - cached["cpu_us_per_request"],
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    transport = httpx.ASGITransport(app=worthtrust)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        username = (await register(client)).json()["username"]
+        token = (await login(client, username)).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        company = await client.post(
+            "/v1/company",
+            headers=headers,
+            json={
+                "company_name": "Bench",
+                "company_location": "MILAN",
+                "company_linkedin_link": f"https://linkedin.com/{uuid.uuid4()}",
+            },
+        )
+        company.raise_for_status()
+        guid = company.json()["company_guid"]
+
+        results = {
+            "get_user": await compare(client, "/v1/user", headers, args.requests),
+            "get_company": await compare(
+                client, f"/v1/company/{guid}", {}, args.requests
+            ),
+        }
+    hasher.shutdown()
+    report(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,46 @@
+"""
+Throughput and latency of DB-bound endpoints at increasing concurrency.
+
+`GET /user` resolves the bearer token against the `users` table on each
+call, so it isolates the session path. Compare the two drivers with:
+
+    DB_ASYNC=true  python -m benchmarks.db_concurrency   # asyncpg
+    DB_ASYNC=false python -m benchmarks.db_concurrency   # sync driver, threadpool
+"""
+import argparse
+import asyncio
+
+import httpx
+
+from app.config import _settings
+from app.main import worthtrust
+from app.v1.hashing import hasher
+
+from ._common import report, summarize
+from .hashing_latency import login, poll_user, register
+
+
+async def main(args: argparse.Namespace) -> None:
+    transport = httpx.ASGITransport(app=worthtrust)
+    results = {}
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        username = (await register(client)).json()["username"]
+        token = (await login(client, username)).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        for concurrency in args.concurrency:
+            latencies, elapsed = await poll_user(
+                client, headers, args.requests, concurrency
+            )
+            results[f"c{concurrency}"] = summarize(latencies, elapsed)
+
+    hasher.shutdown()
+    report({"db_async": _settings.DB_ASYNC, "get_user": results})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50, 100])
+    asyncio.run(main(parser.parse_args()))
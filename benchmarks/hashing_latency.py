@@ -0,0 +1,118 @@
+"""
+Latency of `GET /user` while `/register` and `/token` are being hammered.
+
+The app runs in-process behind an ASGI transport, so a handler that blocks
+the event loop (e.g. inline `bcrypt`) shows up directly in the `GET /user`
+percentiles. The ASGI transport does not run the lifespan, so the email
+outbox worker stays off and no verification email is sent. The rate
+limiter would turn most of the load into `429`, disable it to measure
+hashing. Compare runs with:
+
+    export RATE_LIMIT_ENABLED=false
+    HASHER_WORKERS=0 python -m benchmarks.hashing_latency   # inline bcrypt
+    HASHER_WORKERS=4 python -m benchmarks.hashing_latency   # process pool
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from typing import Dict, List, Tuple
+
+import httpx
+
+from app.main import worthtrust
+from app.v1.hashing import hasher
+
+from ._common import report, summarize
+
+PASSWORD = "benchmark-password"
+
+
+async def register(client: httpx.AsyncClient) -> httpx.Response:
+    suffix = uuid.uuid4().hex
+    return await client.post(
+        "/v1/register",
+        json={
+            "user_name": "bench",
+            "user_surname": "bench",
+            "user_email": f"bench-{suffix}@worthtrust.io",
+            "user_psw": PASSWORD,
+        },
+    )
+
+
+async def login(client: httpx.AsyncClient, username: str) -> httpx.Response:
+    return await client.post(
+        "/v1/token", data={"username": username, "password": PASSWORD}
+    )
+
+
+async def poll_user(
+    client: httpx.AsyncClient, headers: Dict, requests: int, concurrency: int
+) -> Tuple[List[float], float]:
+    latencies: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _one() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.get("/v1/user", headers=headers)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(_one() for _ in range(requests)))
+    return latencies, time.perf_counter() - start
+
+
+async def hammer(
+    client: httpx.AsyncClient, username: str, stop: asyncio.Event, counters: Dict
+) -> None:
+    while not stop.is_set():
+        for response in await asyncio.gather(register(client), login(client, username)):
+            counters[response.status_code] = counters.get(response.status_code, 0) + 1
+
+
+async def main(args: argparse.Namespace) -> None:
+    transport = httpx.ASGITransport(app=worthtrust)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        username = (await register(client)).json()["username"]
+        token = (await login(client, username)).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        idle, idle_elapsed = await poll_user(
+            client, headers, args.requests, args.concurrency
+        )
+
+        stop = asyncio.Event()
+        counters: Dict[int, int] = {}
+        load = [
+            asyncio.create_task(hammer(client, username, stop, counters))
+            for _ in range(args.load_concurrency)
+        ]
+        loaded, loaded_elapsed = await poll_user(
+            client, headers, args.requests, args.concurrency
+        )
+        stop.set()
+        await asyncio.gather(*load)
+
+    hasher.shutdown()
+    report(
+        {
+            "hasher_workers": hasher.max_workers,
+            "hasher_max_pending": hasher.max_pending,
+            "get_user_idle": summarize(idle, idle_elapsed),
+            "get_user_under_load": summarize(loaded, loaded_elapsed),
+            "load_status_codes": counters,
+        }
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--load-concurrency", type=int, default=8)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,87 @@
+"""
+Verification emails per second, one connection per email vs. pooled client.
+
+`per_message` reproduces the previous `Email.send_email`: a new
+`ConnectionConfig` and `FastMail` (hence a TCP connect and an SMTP login)
+per email. `pooled` sends the same messages through `MailClient.send_many`,
+in batches as the outbox worker does. Both target a local SMTP stand-in:
+
+    python -m benchmarks.mail_throughput --messages 500
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("ENVIRON", "TEST")
+
+from fastapi_mail import FastMail, MessageSchema  # noqa: E402
+
+from app.config import _settings  # noqa: E402
+from app.templates import templates  # noqa: E402
+from app.tests.smtp_standin import SMTPStandIn  # noqa: E402
+from app.v1.dependencies import Email  # noqa: E402
+from app.v1.mailer import MailClient, mail_config  # noqa: E402
+
+from ._common import report  # noqa: E402
+
+CONTEXT = {"url": "http://bench/verifyemail/token", "first_name": "BENCH"}
+
+
+async def per_message(n: int) -> float:
+    start = time.perf_counter()
+    for i in range(n):
+        html = templates["verification"].render(subject=Email._MSG, **CONTEXT)
+        message = MessageSchema(
+            subject=Email._MSG,
+            recipients=[f"user{i}@worthtrust.io"],
+            body=html,
+            subtype="html",
+        )
+        await FastMail(mail_config()).send_message(message)
+    return time.perf_counter() - start
+
+
+async def pooled(n: int, batch_size: int) -> float:
+    client = MailClient(mail_config())
+    start = time.perf_counter()
+    for offset in range(0, n, batch_size):
+        await client.send_many(
+            [
+                Email.render_message(
+                    [f"user{i}@worthtrust.io"], Email._MSG, "verification", CONTEXT
+                )
+                for i in range(offset, min(n, offset + batch_size))
+            ]
+        )
+    elapsed = time.perf_counter() - start
+    await client.close()
+    return elapsed
+
+
+async def main(args: argparse.Namespace) -> None:
+    server = SMTPStandIn().start()
+    _settings.EMAIL_HOST, _settings.EMAIL_PORT = server.host, server.port
+    try:
+        before = await per_message(args.messages)
+        after = await pooled(args.messages, args.batch_size)
+    finally:
+        server.stop()
+    report(
+        {
+            "messages": args.messages,
+            "per_message": {
+                "elapsed_s": before,
+                "messages_per_s": args.messages / before,
+            },
+            "pooled": {"elapsed_s": after, "messages_per_s": args.messages / after},
+            "smtp_connections": server.connections,
+        }
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
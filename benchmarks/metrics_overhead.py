@@ -0,0 +1,98 @@
+"""
+Overhead of `MetricsMiddleware` and of the SQL statement timing hooks.
+
+The same two endpoints are served by a bare FastAPI app, then by one wrapped
+in `MetricsMiddleware` with `instrument_engines()` active:
+
+- `/ping` returns a constant, isolating the per request cost;
+- `/query/{n}` runs `n` statements on an in-memory SQLite database on the
+  threadpool, adding the per statement cost of the engine event hooks.
+
+The baseline runs first: engine listeners cannot be scoped to one app.
+
+    python -m benchmarks.metrics_overhead --requests 5000 --statements 10
+"""
+import argparse
+import asyncio
+import time
+from typing import Any, Dict, List
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+from starlette.concurrency import run_in_threadpool
+
+from app.v1.middlware import MetricsMiddleware, instrument_engines
+
+from ._common import report, summarize
+
+engine = create_engine(
+    "sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}
+)
+
+
+def _query(statements: int) -> int:
+    with engine.connect() as connection:
+        for _ in range(statements):
+            connection.execute(text("SELECT 1")).scalar()
+    return statements
+
+
+def build(instrumented: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping() -> Dict[str, Any]:
+        return {"ok": True}
+
+    @app.get("/query/{statements}")
+    async def query(statements: int) -> Dict[str, Any]:
+        return {"statements": await run_in_threadpool(_query, statements)}
+
+    if instrumented:
+        instrument_engines()
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+
+async def measure(app: FastAPI, path: str, requests: int) -> Dict[str, Any]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+        for _ in range(100):
+            await c.get(path)
+        latencies: List[float] = []
+        start = time.perf_counter()
+        for _ in range(requests):
+            sent = time.perf_counter()
+            response = await c.get(path)
+            latencies.append(time.perf_counter() - sent)
+            assert response.status_code == 200, response.text
+        return summarize(latencies, time.perf_counter() - start)
+
+
+async def main(args: argparse.Namespace) -> None:
+    paths = {"ping": "/ping", "query": f"/query/{args.statements}"}
+    results: Dict[str, Any] = {}
+    for name, instrumented in (("baseline", False), ("metrics", True)):
+        app = build(instrumented)
+        results[name] = {
+            endpoint: await measure(app, path, args.requests)
+            for endpoint, path in paths.items()
+        }
+    results["overhead_us"] = {
+        endpoint: (
+            results["metrics"][endpoint]["mean_ms"]
+            - results["baseline"][endpoint]["mean_ms"]
+        )
+        * 1000
+        for endpoint in paths
+    }
+    report(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--statements", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,122 @@
+"""
+Serialization cost of the `/register` and `/user` payloads, through the
+`response_model` path against the orjson fast path of `app.v1.responses`.
+
+- `/register` before: `BaseUserUsername` built from the form, converted to
+  an ORM `User`, then `UserMe(**user.dict())` validated again by FastAPI's
+  `response_model` and encoded by `JSONResponse`. After: the ORM `User`
+  built from the form, serialized by `orm_response`.
+- `/user` before: the ORM `User` validated through `response_model` and
+  encoded by `JSONResponse`. After: `orm_response`.
+
+Hashing and database work are left out:
+
+    python -m benchmarks.serialization --iterations 20000
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.core.datamodels.user import BaseUser, BaseUserUsername
+from app.core.datamodels.useraccess import UserMe
+from app.core.models.database import User
+from app.v1.responses import orm_response
+
+from ._common import report
+
+FORM = BaseUser(
+    user_name="Jo",
+    user_surname="Doe",
+    user_email="jo@worthtrust.io",
+    user_psw="hashed",
+)
+FIELD = create_response_field(name="Response_UserMe", type_=UserMe)
+
+
+def _orm_user() -> User:
+    now = datetime.now()
+    return User(
+        name=FORM.name.upper(),
+        surname=FORM.surname.upper(),
+        email=FORM.email,
+        hashed_psw=FORM.hashed_psw,
+        disabled=False,
+        username="JODOE12345",
+        auth_x_token="token",
+        updated_at=now,
+        created_at=now,
+        verified=False,
+    )
+
+
+async def _response_model(content: Any) -> bytes:
+    payload = await serialize_response(
+        field=FIELD, response_content=content, is_coroutine=True
+    )
+    return JSONResponse(payload).body
+
+
+async def register_before() -> bytes:
+    user = BaseUserUsername(
+        **dict(FORM),
+        username="JODOE12345",
+        updated_at=datetime.now(),
+        created_at=datetime.now(),
+        auth_x_token="token",
+        verified=False,
+    )
+    User(**dict(user))
+    return await _response_model(UserMe(**user.dict()))
+
+
+async def register_after() -> bytes:
+    return orm_response(_orm_user(), UserMe, status_code=201).body
+
+
+USER = _orm_user()
+
+
+async def user_before() -> bytes:
+    return await _response_model(USER)
+
+
+async def user_after() -> bytes:
+    return orm_response(USER, UserMe).body
+
+
+async def measure(fn: Callable, iterations: int) -> Dict[str, float]:
+    body = await fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await fn()
+    elapsed = time.perf_counter() - start
+    return {"us_per_payload": elapsed / iterations * 1e6, "bytes": len(body)}
+
+
+async def main(args: argparse.Namespace) -> None:
+    results = {}
+    for payload, before, after in (
+        ("register", register_before, register_after),
+        ("user", user_before, user_after),
+    ):
+        results[payload] = {
+            "response_model": await measure(before, args.iterations),
+            "orjson_fast_path": await measure(after, args.iterations),
+        }
+        results[payload]["speedup"] = (
+            results[payload]["response_model"]["us_per_payload"]
+            / results[payload]["orjson_fast_path"]["us_per_payload"]
+        )
+    report(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20_000)
+    asyncio.run(main(parser.parse_args()))
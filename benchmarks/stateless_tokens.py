@@ -0,0 +1,79 @@
+"""
+`GET /user` with database-backed against stateless access tokens.
+
+The same user is polled three ways:
+
+- `database`: the user row is loaded on every request;
+- `cached`: the user comes from the identity cache (`USER_CACHE_ENABLED`);
+- `stateless`: the user is rebuilt from the token claims and checked against
+  the in-memory revocation set (`STATELESS_TOKENS`).
+
+SQL statements per request are counted alongside the latencies. The schema
+must be up to date (`alembic upgrade head`):
+
+    python -m benchmarks.stateless_tokens --requests 5000 --concurrency 16
+"""
+import argparse
+import asyncio
+from typing import Any, Dict
+
+import httpx
+
+from app.config import _settings
+from app.core.settings import new_session
+from app.main import worthtrust
+from app.v1.cache import user_cache
+from app.v1.hashing import hasher
+from app.v1.profiler import profile_queries
+from app.v1.tokens import revocations
+
+from ._common import report, summarize
+from .hashing_latency import login, poll_user, register
+
+
+async def measure(
+    client: httpx.AsyncClient, username: str, requests: int, concurrency: int
+) -> Dict[str, Any]:
+    # The claims of the token depend on the mode it is issued in
+    token = (await login(client, username)).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    await poll_user(client, headers, concurrency, concurrency)
+    with profile_queries() as profile:
+        latencies, elapsed = await poll_user(client, headers, requests, concurrency)
+    summary = summarize(latencies, elapsed)
+    summary["queries_per_request"] = profile.count / requests
+    return summary
+
+
+async def main(args: argparse.Namespace) -> None:
+    _settings.RATE_LIMIT_ENABLED = False
+    transport = httpx.ASGITransport(app=worthtrust)
+    results = {}
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        username = (await register(client)).json()["username"]
+        for mode, cache, stateless in (
+            ("database", False, False),
+            ("cached", True, False),
+            ("stateless", False, True),
+        ):
+            _settings.USER_CACHE_ENABLED = cache
+            _settings.STATELESS_TOKENS = stateless
+            user_cache.clear()
+            if stateless:
+                async with new_session() as session:
+                    await revocations.refresh(session)
+            results[mode] = await measure(
+                client, username, args.requests, args.concurrency
+            )
+
+    hasher.shutdown()
+    report({"get_user": results})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,63 @@
+"""
+Verification email renders per second.
+
+`jinja` is the previous path (`get_template` and a full render per email),
+`precompiled` splices the per user fields into the pre-rendered template,
+and `bulk_send` builds whole `EmailMessage`s as the outbox worker does:
+
+    python -m benchmarks.template_render --renders 20000
+"""
+import argparse
+import os
+import time
+from typing import Callable
+
+os.environ.setdefault("ENVIRON", "TEST")
+
+from app.templates import env, templates  # noqa: E402
+from app.v1.dependencies import Email  # noqa: E402
+
+from ._common import report  # noqa: E402
+
+
+def _rate(fn: Callable[[int], object], n: int) -> float:
+    start = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return n / (time.perf_counter() - start)
+
+
+def _context(i: int) -> dict:
+    return {"url": f"http://bench/verifyemail/{i}", "first_name": f"USER{i}"}
+
+
+def main(args: argparse.Namespace) -> None:
+    report(
+        {
+            "renders": args.renders,
+            "jinja_renders_per_s": _rate(
+                lambda i: env.get_template("verification.html").render(
+                    subject=Email._MSG, **_context(i)
+                ),
+                args.renders,
+            ),
+            "precompiled_renders_per_s": _rate(
+                lambda i: templates["verification"].render(
+                    subject=Email._MSG, **_context(i)
+                ),
+                args.renders,
+            ),
+            "bulk_send_messages_per_s": _rate(
+                lambda i: Email.render_message(
+                    [f"user{i}@worthtrust.io"], Email._MSG, "verification", _context(i)
+                ),
+                args.renders,
+            ),
+        }
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--renders", type=int, default=20000)
+    main(parser.parse_args())
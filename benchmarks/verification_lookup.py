@@ -0,0 +1,77 @@
+"""
+Latency of `GET /verifyemail/{token}` as the `users` table grows.
+
+Users are seeded straight in SQL with `bench-token-<n>` verification tokens,
+up to each of the requested scales; at every scale a sample of those links
+is verified through the API. With the indexed `auth_x_token_digest` the
+latency should stay flat from thousands to millions of rows. The schema
+must be up to date (`alembic upgrade head`):
+
+    python -m benchmarks.verification_lookup --scales 10000 100000 1000000
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+from sqlalchemy import text
+
+from app.core.settings import get_async_engine, get_engine
+from app.main import worthtrust
+
+from ._common import report, summarize
+
+SEED = text(
+    """
+    INSERT INTO users (
+        guid, name, surname, email, hashed_psw, disabled, username,
+        auth_x_token, auth_x_token_digest, updated_at, created_at, verified
+    )
+    SELECT
+        gen_random_uuid(), 'BENCH', 'BENCH', 'bench' || i || '@worthtrust.io',
+        'unused', false, 'BENCH' || i, 'bench-token-' || i,
+        sha256(convert_to('bench-token-' || i, 'UTF8')), now(), now(), false
+    FROM generate_series(:start, :stop) AS i
+    ON CONFLICT DO NOTHING
+    """
+)
+
+
+def seed(start: int, stop: int, chunk: int = 100_000) -> None:
+    with get_engine().begin() as connection:
+        for offset in range(start, stop + 1, chunk):
+            connection.execute(
+                SEED, {"start": offset, "stop": min(stop, offset + chunk - 1)}
+            )
+        connection.execute(text("ANALYZE users"))
+
+
+async def main(args: argparse.Namespace) -> None:
+    get_engine().echo = get_async_engine().sync_engine.echo = False
+    transport = httpx.ASGITransport(app=worthtrust)
+    results = {}
+    seeded = 0
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        for scale in sorted(args.scales):
+            seed(seeded + 1, scale)
+            seeded = scale
+            latencies = []
+            for n in random.sample(range(1, scale + 1), args.samples):
+                start = time.perf_counter()
+                response = await client.get(f"/v1/verifyemail/bench-token-{n}")
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code in (200, 403), response.text
+            results[str(scale)] = summarize(latencies)
+    report({"verify_email": results})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--scales", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--samples", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,68 @@
+"""initial schema
+
+The tables as created by `Base.metadata.create_all` before the schema was
+managed by Alembic. Databases created that way already hold them: mark them
+at this revision with `alembic stamp 0001`, then `alembic upgrade head`.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("guid", sa.Uuid(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("surname", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("hashed_psw", sa.String(), nullable=False),
+        sa.Column("disabled", sa.Boolean(), nullable=False),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("auth_x_token", sa.String(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("verified", sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint("guid"),
+        sa.UniqueConstraint("email"),
+        sa.UniqueConstraint("username"),
+    )
+    op.create_index("ix_users_guid", "users", ["guid"], unique=True)
+    op.create_table(
+        "companies",
+        sa.Column("guid", sa.Uuid(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("location", sa.String(), nullable=False),
+        sa.Column("linkedin_link", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("guid"),
+        sa.UniqueConstraint("linkedin_link"),
+    )
+    op.create_index("ix_companies_guid", "companies", ["guid"], unique=True)
+    op.create_table(
+        "applications",
+        sa.Column("user_guid", sa.Uuid(), nullable=False),
+        sa.Column("company_guid", sa.Uuid(), nullable=False),
+        sa.Column("n_process_steps", sa.Integer(), nullable=False),
+        sa.Column("n_steps_performed", sa.Integer(), nullable=False),
+        sa.Column("joboffer_location", sa.String(), nullable=False),
+        sa.Column("hired", sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(["company_guid"], ["companies.guid"]),
+        sa.ForeignKeyConstraint(["user_guid"], ["users.guid"]),
+        sa.PrimaryKeyConstraint("user_guid", "company_guid"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("applications")
+    op.drop_index("ix_companies_guid", table_name="companies")
+    op.drop_table("companies")
+    op.drop_index("ix_users_guid", table_name="users")
+    op.drop_table("users")
@@ -0,0 +1,55 @@
+"""verification token digest
+
+The digest of the pending verification tokens is backfilled, so that the
+links already sent keep working.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+import hashlib
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("users") as batch:
+        batch.add_column(
+            sa.Column("auth_x_token_digest", sa.LargeBinary(length=32), nullable=True)
+        )
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute(
+            "UPDATE users SET auth_x_token_digest = "
+            "sha256(convert_to(auth_x_token, 'UTF8'))"
+        )
+    else:
+        users = sa.table(
+            "users",
+            sa.column("guid", sa.Uuid()),
+            sa.column("auth_x_token", sa.String()),
+            sa.column("auth_x_token_digest", sa.LargeBinary()),
+        )
+        rows = bind.execute(sa.select(users.c.guid, users.c.auth_x_token)).all()
+        for guid, token in rows:
+            bind.execute(
+                users.update()
+                .where(users.c.guid == guid)
+                .values(auth_x_token_digest=hashlib.sha256(token.encode()).digest())
+            )
+    with op.batch_alter_table("users") as batch:
+        batch.create_unique_constraint(
+            "users_auth_x_token_digest_key", ["auth_x_token_digest"]
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("users") as batch:
+        batch.drop_constraint("users_auth_x_token_digest_key", type_="unique")
+        batch.drop_column("auth_x_token_digest")
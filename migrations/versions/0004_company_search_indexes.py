@@ -0,0 +1,36 @@
+"""company search indexes
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        "ix_companies_name_trgm",
+        "companies",
+        ["name"],
+        postgresql_using="gin",
+        postgresql_ops={"name": "gin_trgm_ops"},
+    )
+    op.create_index("ix_companies_name_guid", "companies", ["name", "guid"])
+    op.create_index(
+        "ix_companies_location_name_guid",
+        "companies",
+        ["location", "name", "guid"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_companies_location_name_guid", table_name="companies")
+    op.drop_index("ix_companies_name_guid", table_name="companies")
+    op.drop_index("ix_companies_name_trgm", table_name="companies")
@@ -0,0 +1,58 @@
+"""company stats
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "company_stats",
+        sa.Column("company_guid", sa.Uuid(), nullable=False),
+        sa.Column("applicants", sa.Integer(), nullable=False),
+        sa.Column("hired", sa.Integer(), nullable=False),
+        sa.Column("total_process_steps", sa.Integer(), nullable=False),
+        sa.Column("total_steps_performed", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["company_guid"], ["companies.guid"]),
+        sa.PrimaryKeyConstraint("company_guid"),
+    )
+    op.create_table(
+        "company_location_stats",
+        sa.Column("company_guid", sa.Uuid(), nullable=False),
+        sa.Column("joboffer_location", sa.String(), nullable=False),
+        sa.Column("applicants", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["company_guid"], ["companies.guid"]),
+        sa.PrimaryKeyConstraint("company_guid", "joboffer_location"),
+    )
+    # backfill, `python -m app.v1.stats rebuild` does the same afterwards
+    op.execute(
+        """
+        INSERT INTO company_stats (company_guid, applicants, hired,
+            total_process_steps, total_steps_performed)
+        SELECT company_guid, count(*),
+            sum(CASE WHEN hired THEN 1 ELSE 0 END),
+            sum(n_process_steps), sum(n_steps_performed)
+        FROM applications GROUP BY company_guid
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO company_location_stats (company_guid, joboffer_location,
+            applicants)
+        SELECT company_guid, joboffer_location, count(*)
+        FROM applications GROUP BY company_guid, joboffer_location
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("company_location_stats")
+    op.drop_table("company_stats")
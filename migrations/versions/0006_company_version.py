@@ -0,0 +1,25 @@
+"""company version
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("companies") as batch:
+        batch.add_column(
+            sa.Column("version", sa.Integer(), nullable=False, server_default="1")
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("companies") as batch:
+        batch.drop_column("version")
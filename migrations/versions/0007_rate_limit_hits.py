@@ -0,0 +1,29 @@
+"""rate limit hits
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "rate_limit_hits",
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("slot", sa.BigInteger(), nullable=False),
+        sa.Column("hits", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("key", "slot"),
+    )
+    op.create_index("ix_rate_limit_hits_slot", "rate_limit_hits", ["slot"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_rate_limit_hits_slot", table_name="rate_limit_hits")
+    op.drop_table("rate_limit_hits")
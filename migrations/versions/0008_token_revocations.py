@@ -0,0 +1,38 @@
+"""token revocations
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("users") as batch:
+        batch.add_column(
+            sa.Column("token_version", sa.Integer(), nullable=False, server_default="0")
+        )
+    op.create_table(
+        "token_revocations",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("token_version", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_token_revocations_created_at", "token_revocations", ["created_at"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_token_revocations_created_at", table_name="token_revocations")
+    op.drop_table("token_revocations")
+    with op.batch_alter_table("users") as batch:
+        batch.drop_column("token_version")
@@ -0,0 +1,34 @@
+"""email outbox leases
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_index("ix_email_outbox_pending", table_name="email_outbox")
+    op.create_index(
+        "ix_email_outbox_pending",
+        "email_outbox",
+        ["next_attempt_at"],
+        postgresql_where=sa.text("status IN ('pending', 'sending')"),
+    )
+
+
+def downgrade() -> None:
+    op.execute("UPDATE email_outbox SET status = 'pending' WHERE status = 'sending'")
+    op.drop_index("ix_email_outbox_pending", table_name="email_outbox")
+    op.create_index(
+        "ix_email_outbox_pending",
+        "email_outbox",
+        ["next_attempt_at"],
+        postgresql_where=sa.text("status = 'pending'"),
+    )
@@ -0,0 +1,7 @@
+#! /usr/bin/env bash
+# Run by the tiangolo/uvicorn-gunicorn image before starting the workers
+
+alembic upgrade head
+
+# With HASH_CALIBRATE, pick the password hash rounds once for all the workers
+python -m app.v1.hashing --prestart